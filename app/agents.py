@@ -1,14 +1,26 @@
 import os
 import json
 import datetime as dt
+import hashlib
 from dotenv import load_dotenv
 from google import genai
 import json
 import pathlib
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from json_stream import IncrementalJSONParser
+from llm_cache import cached_agenerate_content_stream, cached_generate_content
+from parallel import run_ordered
 
 # --- Setup ---
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+CHECKLIST_PARALLEL = os.getenv("CHECKLIST_PARALLEL", "1") != "0"
+# Steps expanded at once per checklist, so wall time follows the slowest step.
+# Concurrent checklists share parallel.AGENT_FANOUT_LIMIT, which caps the
+# model calls in flight across all of them (and drafting and computation).
+CHECKLIST_EXPANSION_WORKERS = int(os.getenv("CHECKLIST_EXPANSION_WORKERS", "16"))
 
 # Initialize the client with explicit API key (optional)
 gemini_client = None
@@ -20,23 +32,16 @@ if GEMINI_API_KEY:
 else:
     print("Warning: GEMINI_API_KEY not set. AI features will be disabled.")
 
-# --- Master Prompt Template ---
+# --- Prompt Sections ---
 # NOTE: All literal braces in the schema are doubled {{ }} so .format(...) does not treat them as placeholders.
-MASTER_PROMPT_TEMPLATE = """
-You are an expert AI workflow architect that outputs ONLY valid JSON (UTF-8, no comments).
-Your job is to generate a detailed, chronological, step-by-step checklist for what to do after a death.
-
-## Context
+CHECKLIST_CONTEXT = """## Context
 - Location: {location}
 - Jurisdiction terms: {jurisdiction_terms}
 - Relationship: {relationship}
 - Additional context: {additional_context}
+"""
 
-## Output Format
-Return a single JSON object matching this schema:
-
-{{
-  "meta": {{
+META_SCHEMA = """  "meta": {{
     "version": "1.4",
     "generated_at": "<ISO8601 UTC timestamp>",
     "location": "<string>",
@@ -44,8 +49,9 @@ Return a single JSON object matching this schema:
     "assumptions": ["<string>", "..."],
     "disclaimer": "<brief note>"
   }},
-  "steps": [
-    {{
+"""
+
+STEP_SCHEMA = """    {{
       "id": "S001",
       "order": 1,
       "title": "<short label>",
@@ -91,11 +97,9 @@ Return a single JSON object matching this schema:
           "upload_notes": "<what should be uploaded (if applicable)>"
         }}
       ]
-    }}
-  ]
-}}
+    }}"""
 
-## Agent Type Guidelines
+AGENT_TYPE_GUIDELINES = """## Agent Type Guidelines
 Assign `"automation_agent_type"` according to substep purpose:
 
 - **FormAgent** → filling or pre-filling official forms or online submissions.
@@ -104,7 +108,33 @@ Assign `"automation_agent_type"` according to substep purpose:
 - **ComputationAgent** → computing estate values, tax amounts, thresholds.
 
 Substeps marked `"party": "human"` do not need `"automation_agent_type"` unless `"automatable": true`, in which case it indicates **which agent assists** in generating or pre-filling required materials.
+"""
+
+# --- Master Prompt Template ---
+MASTER_PROMPT_TEMPLATE = (
+    """
+You are an expert AI workflow architect that outputs ONLY valid JSON (UTF-8, no comments).
+Your job is to generate a detailed, chronological, step-by-step checklist for what to do after a death.
+
+"""
+    + CHECKLIST_CONTEXT
+    + """
+## Output Format
+Return a single JSON object matching this schema:
 
+{{
+"""
+    + META_SCHEMA
+    + """  "steps": [
+"""
+    + STEP_SCHEMA
+    + """
+  ]
+}}
+
+"""
+    + AGENT_TYPE_GUIDELINES
+    + """
 ## Content Requirements
 1. Steps must be chronological (earliest first).
 2. Each step must include at least one substep.
@@ -118,6 +148,109 @@ Substeps marked `"party": "human"` do not need `"automation_agent_type"` unless
 
 Now generate the JSON.
 """
+)
+
+# --- Two-Phase Prompt Templates ---
+# Phase 1 plans the steps only, which is a short response.
+SKELETON_PROMPT_TEMPLATE = (
+    """
+You are an expert AI workflow architect that outputs ONLY valid JSON (UTF-8, no comments).
+Your job is to plan the chronological steps to take after a death. Only list the steps; their details and substeps are written separately.
+
+"""
+    + CHECKLIST_CONTEXT
+    + """
+## Output Format
+Return a single JSON object matching this schema:
+
+{{
+"""
+    + META_SCHEMA
+    + """  "steps": [
+    {{
+      "id": "S001",
+      "order": 1,
+      "title": "<short label>",
+      "summary": "<concise description>",
+      "responsible_party": "<spouse/executor/etc.>",
+      "prerequisites": ["<step-id>", "..."]
+    }}
+  ]
+}}
+
+## Content Requirements
+1. Steps must be chronological (earliest first), with ids S001, S002, ... and a matching "order".
+2. "prerequisites" may only name earlier steps.
+3. Cover everything from the death itself to distributing the estate.
+4. Must be valid JSON. No trailing commas or text outside JSON.
+
+Now generate the JSON.
+"""
+)
+
+# Phase 2 writes one step of the skeleton in full; one call per step, run concurrently.
+STEP_PROMPT_TEMPLATE = (
+    """
+You are an expert AI workflow architect that outputs ONLY valid JSON (UTF-8, no comments).
+Your job is to write one step, in full detail, of a chronological checklist for what to do after a death.
+
+"""
+    + CHECKLIST_CONTEXT
+    + """
+## Checklist Outline
+{outline}
+
+## Step To Write
+{step}
+
+## Output Format
+Return a single JSON object for this step only, matching this schema. Keep its "id", "order", "title" and "prerequisites" as given.
+
+"""
+    + STEP_SCHEMA
+    + """
+
+"""
+    + AGENT_TYPE_GUIDELINES
+    + """
+## Content Requirements
+1. The step must include at least one substep, with ids "<step id>-1", "<step id>-2", ...
+2. Each substep = single-action task done by exactly one party.
+3. "automation_level" derived from its substeps:
+   - full → all substeps automatable
+   - partial → mix of automatable/non
+   - none → none automatable
+4. Only cover this step; the other steps in the outline are written separately.
+5. Use concise bulletable text; full sentences in "details".
+6. Must be valid JSON. No trailing commas or text outside JSON.
+
+Now generate the JSON.
+"""
+)
+
+
+# Fields every step and substep must carry, from the schema in MASTER_PROMPT_TEMPLATE
+STEP_REQUIRED_FIELDS = (
+    "id",
+    "order",
+    "title",
+    "summary",
+    "details",
+    "deadline",
+    "responsible_party",
+    "prerequisites",
+    "automation_level",
+    "substeps",
+)
+SUBSTEP_REQUIRED_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "party",
+    "automatable",
+    "automation_agent_type",
+)
+AGENT_TYPES = ("FormAgent", "DraftingAgent", "SearchAgent", "ComputationAgent")
 
 
 def build_master_prompt(
@@ -139,6 +272,44 @@ def build_master_prompt(
     )
 
 
+def checklist_fingerprint(
+    location: str,
+    relationship: str,
+    jurisdiction_terms: str = "",
+    additional_context: str = "",
+    parallel: bool = False,
+) -> str:
+    """
+    Hashes everything that shapes a checklist (the inputs, the generation
+    mode and its prompts), so a stored checklist can be reused until one of
+    them changes.
+    """
+    prompts = (
+        [SKELETON_PROMPT_TEMPLATE, STEP_PROMPT_TEMPLATE] if parallel else [MASTER_PROMPT_TEMPLATE]
+    )
+    payload = json.dumps(
+        [
+            location or "",
+            relationship or "",
+            jurisdiction_terms or "",
+            additional_context or "",
+            "parallel" if parallel else "single",
+            *prompts,
+        ]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_checklist(result: str) -> dict:
+    """Parses the raw model output for a checklist, tolerating a ```json fence."""
+    result = result.strip()
+    if result.startswith("```json"):
+        result = result[len("```json") :]
+    if result.endswith("```"):
+        result = result[: -len("```")]
+    return json.loads(result.strip())  # parse to Python dict
+
+
 def get_post_death_checklist(
     location: str,
     relationship: str,
@@ -161,20 +332,309 @@ def get_post_death_checklist(
     )
 
 
-    result = gemini_client.models.generate_content(
+    return validate_checklist(
+        cached_generate_content(
+            gemini_client,
+            model="gemini-2.5-flash",
+            contents=prompt,
+            parse=parse_checklist,
+        )
+    )
+
+
+def build_step_prompt(
+    step: dict,
+    skeleton: dict,
+    location: str,
+    relationship: str,
+    jurisdiction_terms: str = "",
+    additional_context: str = "",
+) -> str:
+    outline = "\n".join(
+        f"- {s['id']}: {s['title']}"
+        + (f" (after {', '.join(s['prerequisites'])})" if s.get("prerequisites") else "")
+        for s in skeleton["steps"]
+    )
+    return STEP_PROMPT_TEMPLATE.format(
+        location=location or "",
+        jurisdiction_terms=jurisdiction_terms or "",
+        relationship=relationship or "",
+        additional_context=additional_context or "",
+        outline=outline,
+        step=json.dumps(step, indent=2),
+    )
+
+
+def _automation_level(substeps: list) -> str:
+    automatable = [bool(substep.get("automatable")) for substep in substeps]
+    if all(automatable):
+        return "full"
+    return "partial" if any(automatable) else "none"
+
+
+def _repair_step(step: Any, seen: set, order: int, repairs: List[str]) -> Optional[dict]:
+    """
+    Applies validate_checklist's checks to one step, given the ids of the
+    steps kept before it. Returns the repaired step numbered ``order`` (and
+    adds its id to ``seen``), or None if it is dropped; repairs are appended
+    to ``repairs``.
+    """
+    if not isinstance(step, dict):
+        repairs.append("dropped a step that is not an object")
+        return None
+    step_id = step.get("id", "?")
+    # order and automation_level are re-derived below, so they may be missing
+    missing = [
+        field
+        for field in STEP_REQUIRED_FIELDS
+        if field not in step and field not in ("order", "automation_level")
+    ]
+    if missing:
+        repairs.append(f"dropped {step_id}: missing {', '.join(missing)}")
+        return None
+    if step_id in seen:
+        repairs.append(f"dropped {step_id}: appears more than once")
+        return None
+
+    substeps = []
+    for substep in step.get("substeps") or []:
+        if not isinstance(substep, dict):
+            repairs.append(f"dropped a substep of {step_id} that is not an object")
+            continue
+        substep_id = substep.get("id", f"{step_id}-?")
+        missing = [field for field in SUBSTEP_REQUIRED_FIELDS if field not in substep]
+        if missing:
+            repairs.append(f"dropped {substep_id}: missing {', '.join(missing)}")
+            continue
+        agent_type = substep.get("automation_agent_type")
+        if agent_type not in AGENT_TYPES + (None, "null"):
+            repairs.append(f"made {substep_id} manual: unknown automation_agent_type {agent_type!r}")
+            substep["automation_agent_type"] = None
+            substep["automatable"] = False
+        substeps.append(substep)
+    if not substeps:
+        repairs.append(f"dropped {step_id}: no usable substeps")
+        return None
+
+    prerequisites = step.get("prerequisites") or []
+    later = [p for p in prerequisites if p not in seen]
+    if later:
+        repairs.append(f"removed prerequisites of {step_id} that are not earlier steps: {', '.join(later)}")
+        step["prerequisites"] = [p for p in prerequisites if p in seen]
+    seen.add(step_id)
+    step["order"] = order
+    step["substeps"] = substeps
+    step["automation_level"] = _automation_level(substeps)
+    return step
+
+
+def validate_checklist(checklist: dict) -> dict:
+    """
+    Checks a checklist against the schema in MASTER_PROMPT_TEMPLATE and
+    repairs it rather than rejecting it: steps or substeps missing required
+    fields, duplicate steps and steps left without substeps are dropped,
+    prerequisites that are not earlier (kept) steps are removed, and unknown
+    agent types become manual. Each repair is listed in meta["repairs"], and
+    every step's automation_level is re-derived from its substeps.
+    Raises ValueError only if no usable step is left.
+    """
+    repairs = []
+    meta = checklist.get("meta")
+    if not isinstance(meta, dict):
+        repairs.append("meta was missing")
+        meta = {}
+    steps = checklist.get("steps")
+    if not isinstance(steps, list):
+        steps = []
+
+    kept = []
+    seen = set()
+    for step in steps:
+        repaired = _repair_step(step, seen, len(kept) + 1, repairs)
+        if repaired is not None:
+            kept.append(repaired)
+
+    if not kept:
+        raise ValueError("Invalid checklist: " + "; ".join(repairs + ["no usable steps"]))
+    if repairs:
+        print(f"⚠️ Repaired checklist: {'; '.join(repairs)}")
+        meta["repairs"] = meta.get("repairs", []) + repairs
+    checklist["meta"] = meta
+    checklist["steps"] = kept
+    return checklist
+
+
+def merge_step(skeleton_step: dict, expanded: dict) -> dict:
+    """
+    Combines a skeleton step with its expansion. The skeleton's id, order,
+    title and prerequisites win, and substeps are renumbered under the step id.
+    """
+    step = {**skeleton_step, **expanded}
+    for field in ("id", "order", "title", "prerequisites"):
+        if field in skeleton_step:
+            step[field] = skeleton_step[field]
+    for n, substep in enumerate(step.get("substeps") or [], start=1):
+        substep["id"] = f"{step['id']}-{n}"
+    return step
+
+
+def get_post_death_checklist_parallel(
+    location: str,
+    relationship: str,
+    jurisdiction_terms: str = "",
+    additional_context: str = "",
+    max_workers: int = CHECKLIST_EXPANSION_WORKERS,
+    ) -> dict:
+    """
+    Builds the same checklist as get_post_death_checklist in two phases: one
+    short call plans the step skeleton (ids, titles, prerequisites), then every
+    step's details and substeps are written concurrently and merged back in
+    order. Output tokens dominate generation time, so wall time follows the
+    longest step instead of the whole document.
+    The skeleton's ids and prerequisites are checked before any step is
+    expanded; a step whose expansion fails is dropped (and listed in
+    meta["repairs"]) rather than failing the checklist.
+    Raises ValueError if the skeleton call fails or no usable step is left.
+    """
+    if gemini_client is None:
+        raise ValueError(
+            "Gemini API client not initialized. Please set GEMINI_API_KEY in .env file"
+        )
+
+    started = time.perf_counter()
+    skeleton = cached_generate_content(
+        gemini_client,
         model="gemini-2.5-flash",
-        contents=prompt,
-    ).text
+        contents=SKELETON_PROMPT_TEMPLATE.format(
+            location=location or "",
+            jurisdiction_terms=jurisdiction_terms or "",
+            relationship=relationship or "",
+            additional_context=additional_context or "",
+        ),
+        parse=parse_checklist,
+    )
+    if not isinstance(skeleton.get("steps"), list) or not skeleton["steps"]:
+        raise ValueError("Checklist skeleton has no steps")
+    # Fix ids and ordering now, before a call is paid for per step
+    repairs = []
+    skeleton_steps = []
+    seen = set()
+    for step in skeleton["steps"]:
+        step_id = step.get("id") if isinstance(step, dict) else None
+        if not step_id or step_id in seen:
+            repairs.append(f"dropped skeleton step {step_id or '?'}: missing or duplicate id")
+            continue
+        prerequisites = step.get("prerequisites") or []
+        if any(p not in seen for p in prerequisites):
+            repairs.append(f"removed prerequisites of {step_id} that are not earlier steps")
+            step["prerequisites"] = [p for p in prerequisites if p in seen]
+        seen.add(step_id)
+        step["order"] = len(skeleton_steps) + 1
+        skeleton_steps.append(step)
+    skeleton["steps"] = skeleton_steps
+    if not skeleton_steps:
+        raise ValueError("Checklist skeleton has no usable steps")
+    skeleton_s = time.perf_counter() - started
+    print(f"📋 Checklist skeleton: {len(skeleton_steps)} steps in {skeleton_s:.2f}s")
+
+    outcomes = run_ordered(
+        lambda step: cached_generate_content(
+            gemini_client,
+            model="gemini-2.5-flash",
+            contents=build_step_prompt(
+                step,
+                skeleton,
+                location,
+                relationship,
+                jurisdiction_terms,
+                additional_context,
+            ),
+            parse=parse_checklist,
+        ),
+        skeleton_steps,
+        max_workers=max_workers,
+    )
+    repairs += [
+        f"dropped {step['id']}: expansion failed ({outcome['error']})"
+        for step, outcome in zip(skeleton_steps, outcomes)
+        if not outcome["ok"]
+    ]
+
+    print(
+        f"📋 Checklist steps expanded in {time.perf_counter() - started - skeleton_s:.2f}s "
+        f"(longest step {max(outcome['elapsed_s'] for outcome in outcomes):.2f}s)"
+    )
+    meta = skeleton.get("meta") if isinstance(skeleton.get("meta"), dict) else {}
+    if repairs:
+        meta["repairs"] = repairs
+    return validate_checklist(
+        {
+            "meta": meta,
+            "steps": [
+                merge_step(step, outcome["result"])
+                for step, outcome in zip(skeleton_steps, outcomes)
+                if outcome["ok"]
+            ],
+        }
+    )
 
-    if not isinstance(result, str):
-        raise ValueError(f"Gemini API did not return a string. Got: {type(result)} - {result}")
 
-    if result.startswith("```json"):
-        result = result[len("```json\n") : -len("```")].strip()
+async def stream_post_death_checklist(
+    location: str,
+    relationship: str,
+    jurisdiction_terms: str = "",
+    additional_context: str = "",
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams the checklist from Gemini, yielding each part as soon as the model
+    closes it rather than waiting for the whole document:
+
+    - {"event": "meta", "meta", "elapsed_s"} once the meta block is complete
+    - {"event": "step", "step", "elapsed_s"} for each step, in order, already
+      repaired as validate_checklist repairs it (steps it drops are not sent)
+    - {"event": "complete", "checklist", "elapsed_s"} with the full checklist,
+      validated and repaired as get_post_death_checklist returns it
+
+    Raises ValueError if the model does not return valid JSON.
+    """
+    if gemini_client is None:
+        raise ValueError(
+            "Gemini API client not initialized. Please set GEMINI_API_KEY in .env file"
+        )
 
-    data = json.loads(result.strip())        # parse to Python dict
-    # output = json.dumps(data, indent=2, ensure_ascii=False)
-    return data
+    prompt = build_master_prompt(
+        location, relationship, jurisdiction_terms, additional_context
+    )
+    started = time.perf_counter()
+    parser = IncrementalJSONParser(item_keys={"steps"})
+    # Same per-step checks as validate_checklist, so "complete" matches what was streamed
+    seen: set = set()
+    streamed = 0
+    async for chunk in cached_agenerate_content_stream(
+        gemini_client,
+        model="gemini-2.5-flash",
+        contents=prompt,
+        parse=parse_checklist,
+    ):
+        for key, value in parser.feed(chunk):
+            if key == "steps":
+                value = _repair_step(value, seen, streamed + 1, [])
+                if value is None:
+                    continue
+                streamed += 1
+            if key in ("meta", "steps"):
+                event = "step" if key == "steps" else "meta"
+                yield {
+                    "event": event,
+                    event: value,
+                    "elapsed_s": round(time.perf_counter() - started, 3),
+                }
+
+    yield {
+        "event": "complete",
+        "checklist": validate_checklist(parse_checklist(parser.text)),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
 
 
 # # --- Example call ---
@@ -0,0 +1,545 @@
+"""
+Pool of Playwright browser contexts for the navigation agents.
+
+A single Chromium runs on a dedicated driver thread with its own event
+loop, so it can be launched once (pre-warmed at startup) and shared by
+every caller regardless of which thread a tool happens to run on. Each
+agent run leases its own isolated context and page for the duration of
+the run, so concurrent runs navigate in parallel instead of fighting over
+one page. A leased context is closed when its run ends and a fresh one is
+parked in its place, so no cookies, storage, cache, permissions or service
+workers carry over from one run to the next. Idle contexts are
+health-checked before they are handed out.
+
+Contexts run headless under a navigation profile: the default "fast"
+profile aborts images, fonts, media and known analytics hosts, which an
+agent reading links and form fields never looks at. Stylesheets still
+load, since they decide which elements are visible.
+What is loaded can be recorded to and replayed from disk (http_replay).
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import urlparse
+
+from playwright.async_api import Browser, BrowserContext, Page, Request, Route, async_playwright
+
+from http_replay import HttpReplay
+
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "4"))
+# Only the shared context used outside any lease lives long enough to wear out
+BROWSER_POOL_MAX_NAVIGATIONS = int(os.environ.get("BROWSER_POOL_MAX_NAVIGATIONS", "50"))
+BROWSER_POOL_LEASE_TIMEOUT_S = float(os.environ.get("BROWSER_POOL_LEASE_TIMEOUT_S", "60"))
+BROWSER_POOL_WARM = os.environ.get("BROWSER_POOL_WARM", "1") != "0"
+BROWSER_HEADLESS = os.environ.get("BROWSER_HEADLESS", "1") != "0"
+BROWSER_VIEWPORT = {"width": 1280, "height": 900}
+HEALTH_CHECK_TIMEOUT_S = 5
+# Longest a navigation report waits for the sizes of the responses it counted
+SIZES_TIMEOUT_S = 2
+
+# "fast" skips what an agent reading links and form fields never needs; "full" loads everything
+BROWSER_NAVIGATION_PROFILE = os.environ.get("BROWSER_NAVIGATION_PROFILE", "fast")
+# Stylesheets are not blocked: visibility checks and role clicks depend on them
+BROWSER_BLOCK_RESOURCE_TYPES = os.environ.get("BROWSER_BLOCK_RESOURCE_TYPES", "image,media,font")
+# Analytics, tag managers and embeds common on gov.uk and council sites
+BROWSER_BLOCK_HOSTS = os.environ.get(
+    "BROWSER_BLOCK_HOSTS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,googlesyndication.com,"
+    "facebook.net,hotjar.com,clarity.ms,siteimproveanalytics.com,siteimprove.com,"
+    "nr-data.net,newrelic.com,youtube.com,ytimg.com,browsealoud.com",
+)
+# Rough transfer size of one response of each type, used to estimate what blocking saved
+TYPICAL_RESOURCE_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 25_000,
+    "script": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_RESOURCE_BYTES = 10_000
+
+
+def _split(value: str) -> Tuple[str, ...]:
+    return tuple(item.strip().lower() for item in value.split(",") if item.strip())
+
+
+class NavigationProfile:
+    """Decides which requests a pooled context aborts instead of loading."""
+
+    def __init__(
+        self,
+        name: str,
+        blocked_types: Iterable[str] = (),
+        blocked_hosts: Iterable[str] = (),
+    ) -> None:
+        self.name = name
+        self.blocked_types = frozenset(blocked_types)
+        self.blocked_hosts = tuple(blocked_hosts)
+
+    @property
+    def blocks_anything(self) -> bool:
+        return bool(self.blocked_types or self.blocked_hosts)
+
+    def blocks(self, url: str, resource_type: str) -> bool:
+        """True if a request should be aborted. Documents are always loaded."""
+        if resource_type == "document":
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == blocked or host.endswith("." + blocked) for blocked in self.blocked_hosts)
+
+
+NAVIGATION_PROFILES = {
+    "fast": NavigationProfile(
+        "fast", _split(BROWSER_BLOCK_RESOURCE_TYPES), _split(BROWSER_BLOCK_HOSTS)
+    ),
+    "full": NavigationProfile("full"),
+}
+
+
+class BrowserPoolExhausted(RuntimeError):
+    """Raised when no context frees up within the lease timeout."""
+
+
+class PooledContext:
+    """An isolated browser context with one page, leased to one run at a time."""
+
+    def __init__(self, context: BrowserContext, page: Page) -> None:
+        self.context = context
+        self.page = page
+        self.navigations = 0
+        self.leases = 0
+        self.created_at = time.time()
+        page.on("framenavigated", self._on_navigated)
+
+    def _on_navigated(self, frame: Any) -> None:
+        if frame == self.page.main_frame:
+            self.navigations += 1
+
+    async def healthy(self) -> bool:
+        """True if the page is open and still answers a trivial script."""
+        if self.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(self.page.evaluate("1"), HEALTH_CHECK_TIMEOUT_S)
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        with suppress(Exception):
+            await self.context.close()
+
+
+# The context leased by the current agent run. Strands awaits async tools in
+# the run's own context, so tools see their run's lease.
+_current_lease: ContextVar[Optional[PooledContext]] = ContextVar(
+    "browser_lease", default=None
+)
+
+
+class BrowserPool:
+    """Leases isolated Playwright contexts from one shared browser.
+
+    At most ``size`` contexts exist at once; a caller that finds them all
+    leased waits up to ``lease_timeout_s`` and then gets
+    BrowserPoolExhausted. Everything that touches Playwright runs on the
+    pool's driver loop: callers on any thread go through ``run``/``call``,
+    and callers on any event loop through ``arun``/``acall``, which only
+    await a future.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_navigations: int = BROWSER_POOL_MAX_NAVIGATIONS,
+        headless: bool = BROWSER_HEADLESS,
+        lease_timeout_s: float = BROWSER_POOL_LEASE_TIMEOUT_S,
+        profile: str = BROWSER_NAVIGATION_PROFILE,
+        replay: Optional[HttpReplay] = None,
+    ) -> None:
+        if profile not in NAVIGATION_PROFILES:
+            raise ValueError(
+                f"Unknown navigation profile {profile!r}; use one of {', '.join(NAVIGATION_PROFILES)}"
+            )
+        self.size = max(1, size)
+        self.max_navigations = max(1, max_navigations)
+        self.headless = headless
+        self.lease_timeout_s = lease_timeout_s
+        self.profile = NAVIGATION_PROFILES[profile]
+        self.replay = replay if replay is not None else HttpReplay()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # Only touched on the driver loop, so no further locking is needed
+        self._playwright: Any = None
+        self._browser: Optional[Browser] = None
+        self._launching: Optional[asyncio.Lock] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: List[PooledContext] = []
+        # Shared by tools called outside any lease; kept outside the ``size`` slots
+        self._default: Optional[PooledContext] = None
+        self._default_lock: Optional[asyncio.Lock] = None
+        self._in_use = 0
+        self._created = 0
+        self._recycled = 0
+        self._unhealthy = 0
+        self._leases = 0
+        self._timeouts = 0
+        self._navigations_measured = 0
+        self._blocked_requests = 0
+        self._bytes_loaded = 0
+        self._bytes_saved_est = 0
+        self._time_saved_est_s = 0.0
+
+    # ------------------------------------------------------------------
+    # Driver thread
+    # ------------------------------------------------------------------
+    def _driver_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="browser-pool", daemon=True
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedules a coroutine on the driver loop and returns its future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._driver_loop())
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """Runs a coroutine on the driver loop and blocks for its result."""
+        return self.submit(coro).result(timeout)
+
+    async def arun(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Runs a coroutine on the driver loop and awaits it without blocking a thread."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    # ------------------------------------------------------------------
+    # On the driver loop
+    # ------------------------------------------------------------------
+    async def _ensure_browser(self) -> Browser:
+        if self._launching is None:
+            self._launching = asyncio.Lock()
+        async with self._launching:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+                # Contexts from a crashed browser are gone with it
+                self._idle.clear()
+                await self._drop_default()
+        return self._browser
+
+    async def _drop_default(self) -> None:
+        if self._default is not None:
+            await self._default.close()
+            self._default = None
+
+    async def _apply_profile(self, route: Route) -> None:
+        request = route.request
+        if self.profile.blocks(request.url, request.resource_type):
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    async def _new_context(self) -> PooledContext:
+        browser = await self._ensure_browser()
+        context = await browser.new_context(viewport=BROWSER_VIEWPORT)
+        # Later routes run first: the profile drops what it blocks before
+        # anything reaches record/replay, which sees only what is loaded
+        if self.replay.enabled:
+            await context.route("**/*", self.replay.handle)
+        if self.profile.blocks_anything:
+            await context.route("**/*", self._apply_profile)
+        page = await context.new_page()
+        self._created += 1
+        return PooledContext(context, page)
+
+    async def acquire(self) -> PooledContext:
+        """Leases a healthy context, creating one if none is idle.
+
+        Raises:
+            BrowserPoolExhausted: if every context stays leased for ``lease_timeout_s``
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.lease_timeout_s)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise BrowserPoolExhausted(
+                f"All {self.size} browser contexts stayed leased for {self.lease_timeout_s}s"
+            )
+
+        try:
+            while self._idle:
+                pooled = self._idle.pop()
+                if await pooled.healthy():
+                    break
+                self._unhealthy += 1
+                await pooled.close()
+            else:
+                pooled = await self._new_context()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        pooled.leases += 1
+        self._leases += 1
+        self._in_use += 1
+        return pooled
+
+    async def navigate(
+        self, page: Page, url: str, timeout_ms: int, wait_until: str = "domcontentloaded"
+    ) -> Dict[str, Any]:
+        """Opens ``url`` and reports what the navigation profile saved.
+
+        Blocked responses are never fetched, so bytes saved are estimated
+        from TYPICAL_RESOURCE_BYTES and time saved from the throughput of
+        what did load.
+
+        Returns:
+            dict: {"profile", "elapsed_s", "requests", "bytes_loaded",
+                "blocked", "blocked_by_type", "bytes_saved_est",
+                "time_saved_est_s"}
+        """
+        loaded = {"requests": 0, "bytes": 0}
+        blocked: Dict[str, int] = {}
+        measuring: List[asyncio.Task] = []
+
+        async def measure(request: Request) -> None:
+            with suppress(Exception):
+                sizes = await request.sizes()
+                loaded["bytes"] += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+
+        def on_finished(request: Request) -> None:
+            loaded["requests"] += 1
+            # Sizes arrive asynchronously; keep the task so the report can wait for it
+            measuring.append(asyncio.ensure_future(measure(request)))
+
+        def on_failed(request: Request) -> None:
+            if "ERR_BLOCKED_BY_CLIENT" in (request.failure or ""):
+                blocked[request.resource_type] = blocked.get(request.resource_type, 0) + 1
+
+        page.on("requestfinished", on_finished)
+        page.on("requestfailed", on_failed)
+        started = time.perf_counter()
+        try:
+            await page.goto(url, timeout=timeout_ms, wait_until=wait_until)
+        finally:
+            elapsed_s = time.perf_counter() - started
+            page.remove_listener("requestfinished", on_finished)
+            page.remove_listener("requestfailed", on_failed)
+        if measuring:
+            _, late = await asyncio.wait(measuring, timeout=SIZES_TIMEOUT_S)
+            for task in late:
+                task.cancel()
+
+        bytes_saved = sum(
+            TYPICAL_RESOURCE_BYTES.get(kind, DEFAULT_RESOURCE_BYTES) * count
+            for kind, count in blocked.items()
+        )
+        throughput = loaded["bytes"] / elapsed_s if loaded["bytes"] and elapsed_s > 0 else 0
+        time_saved_s = bytes_saved / throughput if throughput else 0.0
+
+        self._navigations_measured += 1
+        self._blocked_requests += sum(blocked.values())
+        self._bytes_loaded += loaded["bytes"]
+        self._bytes_saved_est += bytes_saved
+        self._time_saved_est_s += time_saved_s
+        return {
+            "profile": self.profile.name,
+            "elapsed_s": round(elapsed_s, 3),
+            "requests": loaded["requests"],
+            "bytes_loaded": loaded["bytes"],
+            "blocked": sum(blocked.values()),
+            "blocked_by_type": blocked,
+            "bytes_saved_est": bytes_saved,
+            "time_saved_est_s": round(time_saved_s, 3),
+        }
+
+    async def _park_fresh(self) -> None:
+        self._idle.append(await self._new_context())
+
+    async def release(self, pooled: PooledContext) -> None:
+        """Closes a leased context and parks a fresh one in its place.
+
+        Nothing from the last run leaks into the next one, and the next
+        lease still starts hot: on the running browser a new context takes
+        milliseconds, spent here rather than when the next run leases.
+        """
+        try:
+            await pooled.close()
+            if self._browser is not None and self._browser.is_connected():
+                try:
+                    await self._park_fresh()
+                except Exception as e:
+                    print(f"⚠️ Could not park a fresh browser context: {e}")
+        finally:
+            self._in_use -= 1
+            self._slots.release()
+
+    async def _shutdown(self) -> None:
+        for pooled in self._idle:
+            await pooled.close()
+        self._idle.clear()
+        await self._drop_default()
+        if self._browser is not None:
+            with suppress(Exception):
+                await self._browser.close()
+        if self._playwright is not None:
+            with suppress(Exception):
+                await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+
+    # ------------------------------------------------------------------
+    # Leases and page calls for agent runs
+    # ------------------------------------------------------------------
+    def start(self) -> Future:
+        """Launches the browser in the background and parks one idle context,
+        so the first agent run starts hot. Returns without waiting."""
+
+        async def warm() -> None:
+            await self._park_fresh()
+
+        def report(future: Future) -> None:
+            if future.exception() is not None:
+                print(f"⚠️ Could not pre-warm the browser pool: {future.exception()}")
+
+        future = self.submit(warm())
+        future.add_done_callback(report)
+        return future
+
+    @contextmanager
+    def lease(self) -> Iterator[PooledContext]:
+        """Leases a context for the block; browser tools called inside use its page.
+
+        A lease taken inside another (e.g. a nested agent) reuses the outer one.
+        """
+        current = _current_lease.get()
+        if current is not None:
+            yield current
+            return
+
+        pooled = self.run(self.acquire())
+        token = _current_lease.set(pooled)
+        try:
+            yield pooled
+        finally:
+            _current_lease.reset(token)
+            self.run(self.release(pooled))
+
+    @asynccontextmanager
+    async def alease(self) -> AsyncIterator[PooledContext]:
+        """Async form of ``lease`` for runs on an event loop."""
+        current = _current_lease.get()
+        if current is not None:
+            yield current
+            return
+
+        pooled = await self.arun(self.acquire())
+        token = _current_lease.set(pooled)
+        try:
+            yield pooled
+        finally:
+            _current_lease.reset(token)
+            await self.arun(self.release(pooled))
+
+    async def _unleased_context(self) -> PooledContext:
+        # Tools called outside any lease share one long-lived context, like the
+        # single page this pool replaced. It takes no slot, so leases always get
+        # all ``size`` contexts; unlike a leased one it outlives runs, so it is recycled once worn out.
+        if self._default_lock is None:
+            self._default_lock = asyncio.Lock()
+        async with self._default_lock:
+            if self._default is not None and self._default.navigations >= self.max_navigations:
+                self._recycled += 1
+                await self._drop_default()
+            if self._default is not None and not await self._default.healthy():
+                self._unhealthy += 1
+                await self._drop_default()
+            if self._default is None:
+                self._default = await self._new_context()
+            return self._default
+
+    async def acall(self, func: Callable[[Page], Awaitable[Any]]) -> Any:
+        """Runs ``func(page)`` on the driver loop against the current run's page,
+        leaving the caller's thread free while the page works."""
+        pooled = _current_lease.get() or await self.arun(self._unleased_context())
+        return await self.arun(func(pooled.page))
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns current pool figures for health checks."""
+        return {
+            "size": self.size,
+            "max_navigations": self.max_navigations,
+            "headless": self.headless,
+            "browser_connected": bool(self._browser and self._browser.is_connected()),
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "unleased_context": self._default is not None,
+            "created": self._created,
+            "recycled": self._recycled,
+            "unhealthy": self._unhealthy,
+            "leases": self._leases,
+            "timeouts": self._timeouts,
+            "profile": self.profile.name,
+            "navigations_measured": self._navigations_measured,
+            "blocked_requests": self._blocked_requests,
+            "bytes_loaded": self._bytes_loaded,
+            "bytes_saved_est": self._bytes_saved_est,
+            "time_saved_est_s": round(self._time_saved_est_s, 3),
+            "replay": self.replay.stats() if self.replay.enabled else {"mode": "off"},
+        }
+
+    def close(self) -> None:
+        """Closes every context and the browser, then stops the driver thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(30)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(5)
+            self._launching = None
+            self._default_lock = None
+            self._slots = None
+            self._in_use = 0
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,164 @@
+"""
+LangGraph checkpoint saver backed by the app's SQLite database.
+
+Checkpoints and pending writes live in the ``workflow_checkpoints`` and
+``workflow_checkpoint_writes`` tables of ``database.db`` and go through the
+shared connection pool. Only the async API is implemented; the workflow is
+always run with ``astream``.
+"""
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from database import (
+    delete_workflow_checkpoints,
+    list_workflow_checkpoints,
+    save_workflow_checkpoint,
+    save_workflow_writes,
+)
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """Persists LangGraph checkpoints so a failed run can resume where it stopped."""
+
+    def _to_tuple(self, row: Dict[str, Any]) -> CheckpointTuple:
+        thread_id = row["thread_id"]
+        checkpoint_ns = row["checkpoint_ns"]
+        writes = sorted(
+            row["writes"],
+            key=lambda write: writes_sort_key(write[5], write[0], write[1]),
+        )
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": row["checkpoint_id"],
+                }
+            },
+            checkpoint=self.serde.loads_typed((row["type"], row["checkpoint"])),
+            metadata=self.serde.loads_typed((row["type"], row["metadata"])),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": row["parent_checkpoint_id"],
+                    }
+                }
+                if row["parent_checkpoint_id"]
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, _, channel, type_, value, _ in writes
+            ],
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Fetch the checkpoint named in ``config``, or the thread's latest one."""
+        rows = await list_workflow_checkpoints(
+            thread_id=config["configurable"]["thread_id"],
+            checkpoint_ns=config["configurable"].get("checkpoint_ns", ""),
+            checkpoint_id=get_checkpoint_id(config),
+            limit=1,
+        )
+        return self._to_tuple(rows[0]) if rows else None
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List checkpoints newest first, optionally filtered by metadata."""
+        configurable = config["configurable"] if config else {}
+        rows = await list_workflow_checkpoints(
+            thread_id=configurable.get("thread_id"),
+            checkpoint_ns=configurable.get("checkpoint_ns"),
+            checkpoint_id=get_checkpoint_id(config) if config else None,
+            before_checkpoint_id=get_checkpoint_id(before) if before else None,
+            # Metadata filtering happens after decoding, so only push the limit down without one
+            limit=None if filter else limit,
+        )
+        returned = 0
+        for row in rows:
+            checkpoint_tuple = self._to_tuple(row)
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+            if limit is not None and returned >= limit:
+                break
+            returned += 1
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint and return the config that points at it."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        _, serialized_metadata = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        await save_workflow_checkpoint(
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            serialized_checkpoint,
+            serialized_metadata,
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store the writes a task made, so they survive a failure elsewhere in its step."""
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append(
+                (task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, serialized, task_path)
+            )
+        await save_workflow_writes(
+            config["configurable"]["thread_id"],
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+            rows,
+            replace=all(channel in WRITES_IDX_MAP for channel, _ in writes),
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint for a workflow thread."""
+        await delete_workflow_checkpoints(thread_id)
@@ -6,6 +6,9 @@ from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 from pprint import pprint
+from estate_tax import calculate_substep
+from llm_cache import cached_generate_content
+from parallel import DEFAULT_MAX_WORKERS, run_ordered
 from random_data import generate_random_financial_data
 
 # --- Setup ---
@@ -66,22 +69,7 @@ def format_general_report(result: dict) -> str:
         return f"--- ERROR: Failed to format report ---\n{json.dumps(result, indent=2)}\nError: {e}"
 
 
-def compute_figures(data: dict, user_data: dict) -> list:
-    """Computes necessary mathematical computation.
-
-    Args:
-        data (dict): the tasks dictionary
-        user_data (dict): a dictionary containing personalised information about the deceased
-
-    Returns:
-        list: a list of results
-    """
-    
-    # Check if Gemini client is available
-    if gemini_client is None:
-        raise ValueError("Gemini API client not initialized. Please set GEMINI_API_KEY in .env file")
-    
-    system_prompt = r"""
+COMPUTATION_SYSTEM_PROMPT = r"""
 You are a "ComputationAgent," an expert AI accountant specializing in UK estate administration and probate. Your role is to perform complex financial calculations and logical assessments.
 
 You will be provided with a JSON payload containing two main keys:
@@ -122,58 +110,203 @@ Your response MUST be a JSON object `{}` with the following keys:
 * **The raw text of your response must start with `{` and end with `}`.**
 """
 
+
+def _computation_substeps(data: dict) -> list:
+    """Returns every ComputationAgent substep in checklist order."""
+    return [
+        substep
+        for steps in data["steps"]
+        for substep in steps.get("substeps", [])
+        if substep.get("automation_agent_type") == "ComputationAgent"
+    ]
+
+
+def parse_computation(response_text: str) -> dict:
+    """Decodes a ComputationAgent response, tolerating a ```json fence."""
+    # First, strip any potential whitespace or newlines from the start/end
+    cleaned_response = response_text.strip()
+
+    # Optional: A simple check to remove markdown if it *still* appears
+    if cleaned_response.startswith("```json"):
+        cleaned_response = cleaned_response[7:].strip()  # Remove ```json
+    if cleaned_response.endswith("```"):
+        cleaned_response = cleaned_response[:-3].strip()  # Remove ```
+
+    return json.loads(cleaned_response)
+
+
+NARRATIVE_SYSTEM_PROMPT = r"""
+You are a "ComputationAgent" explaining an estate calculation to an Executor with no accounting background.
+
+You will be given a finished calculation as JSON. Write 2-4 plain-English sentences saying what the result means and what the Executor should do next.
+
+**Rules:**
+* Every figure has already been calculated. Quote figures exactly as given; never calculate, round or introduce a number of your own.
+* Respond with the plain text only: no headings, lists, Markdown or JSON.
+"""
+
+
+def narrate(result: dict) -> str:
+    """Explains a finished calculation in plain English.
+
+    The model only writes prose around figures it is given; it never
+    calculates them.
+
+    Raises:
+        ValueError: if the Gemini client is not initialised
+
+    Returns:
+        str: a short narrative for the report
+    """
+    if gemini_client is None:
+        raise ValueError("Gemini API client not initialized. Please set GEMINI_API_KEY in .env file")
+
+    return cached_generate_content(
+        gemini_client,
+        model="gemini-2.5-flash",
+        system_instruction=NARRATIVE_SYSTEM_PROMPT,
+        contents=[json.dumps(result, indent=2)],
+    ).strip()
+
+
+def compute_substep(substep: dict, user_data: dict, narrative: bool = False) -> dict:
+    """Runs a single ComputationAgent substep.
+
+    Estate value and probate, Inheritance Tax, Capital Gains Tax and estate
+    accounts substeps are calculated by ``estate_tax`` in-process; anything
+    else goes to the model.
+
+    Args:
+        substep (dict): the substep definition from the checklist
+        user_data (dict): a dictionary containing personalised information about the deceased
+        narrative (bool, optional): add a model-written "Summary" section to
+            calculated results; left out if the model cannot be reached
+
+    Raises:
+        json.JSONDecodeError: if the model does not return valid JSON
+
+    Returns:
+        dict: the computation in the generalized report format
+    """
+    result = calculate_substep(substep, user_data)
+    if result is None:
+        return model_compute_substep(substep, user_data)
+
+    if narrative:
+        try:
+            summary = narrate(result)
+        except Exception as e:
+            # The figures are already calculated; only the optional prose is lost
+            print(f"⚠️ Could not narrate {substep.get('id')}: {e}")
+        else:
+            result["report_sections"].insert(
+                0, {"title": "Summary", "type": "text", "content": summary}
+            )
+    return result
+
+
+def model_compute_substep(substep: dict, user_data: dict) -> dict:
+    """Runs a single ComputationAgent substep through the model.
+
+    Args:
+        substep (dict): the substep definition from the checklist
+        user_data (dict): a dictionary containing personalised information about the deceased
+
+    Raises:
+        ValueError: if the Gemini client is not initialised
+        json.JSONDecodeError: if the model does not return valid JSON
+
+    Returns:
+        dict: the parsed computation in the generalized report format
+    """
+    if gemini_client is None:
+        raise ValueError("Gemini API client not initialized. Please set GEMINI_API_KEY in .env file")
+
+    payload = {
+        "task_definition": {
+            "id": substep["id"],
+            "title": substep["title"],
+            "description": substep["description"],
+            "inputs_required": substep["inputs_required"],
+        },
+        "user_data": user_data,
+    }
+    contents_for_api = [
+        f"Please execute the task defined in `task_definition` using the complete `user_data` record. \n\n {json.dumps(payload, indent=2)}"
+    ]
+    return cached_generate_content(
+        gemini_client,
+        model="gemini-2.5-flash",
+        system_instruction=COMPUTATION_SYSTEM_PROMPT,
+        contents=contents_for_api,
+        parse=parse_computation,
+    )
+
+
+def compute_figures(
+    data: dict,
+    user_data: dict,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    narrative: bool = False,
+) -> list:
+    """Computes necessary mathematical computation.
+
+    Every ComputationAgent substep runs independently, at most ``max_workers``
+    at a time. A substep that fails yields an error record instead of
+    aborting the others.
+
+    Args:
+        data (dict): the tasks dictionary
+        user_data (dict): a dictionary containing personalised information about the deceased
+        max_workers (int, optional): the number of model calls in flight at once
+        narrative (bool, optional): add a model-written summary to calculated results
+
+    Returns:
+        list: a list of results in checklist order. Successful entries are
+            {"id", "body", "status": "ok", "elapsed_s"}; failed entries are
+            {"id", "body", "status": "failed", "elapsed_s", "error": {"type", "message"}}
+    """
+    substeps_list = _computation_substeps(data)
+    outcomes = run_ordered(
+        lambda substep: compute_substep(substep, user_data, narrative),
+        substeps_list,
+        max_workers=max_workers,
+    )
+
     results = []
+    for substep, outcome in zip(substeps_list, outcomes):
+        print(f"\n===== PROCESSING TASK: {substep['title']} =====")
+        if outcome["ok"]:
+            print(f"--- Result for {substep['id']} ---")
+
+            # Use our NEW general printer for ALL tasks
+            output = format_general_report(outcome["result"])
+            print(output)
+            results.append(
+                {
+                    "id": substep["id"],
+                    "body": output,
+                    "status": "ok",
+                    "elapsed_s": outcome["elapsed_s"],
+                }
+            )
 
-    for steps in data["steps"]:
-        if "substeps" in steps.keys():
-            for substeps in steps["substeps"]:
-                if substeps.get("automation_agent_type") == "ComputationAgent":
-                    payload = {
-                        "task_definition": {
-                            "id": substeps["id"],
-                            "title": substeps["title"],
-                            "description": substeps["description"],
-                            "inputs_required": substeps["inputs_required"],
-                        },
-                        "user_data": user_data,
-                    }
-                    contents_for_api = [
-                        f"Please execute the task defined in `task_definition` using the complete `user_data` record. \n\n {json.dumps(payload, indent=2)}"
-                    ]
-                    response = gemini_client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        config=types.GenerateContentConfig(
-                            system_instruction=system_prompt
-                        ),
-                        contents=contents_for_api,
-                    )
-
-                    # First, strip any potential whitespace or newlines from the start/end
-                    cleaned_response = response.text.strip()
-
-                    # Optional: A simple check to remove markdown if it *still* appears
-                    if cleaned_response.startswith("```json"):
-                        cleaned_response = cleaned_response[
-                            7:
-                        ].strip()  # Remove ```json
-                    if cleaned_response.endswith("```"):
-                        cleaned_response = cleaned_response[:-3].strip()  # Remove ```
-
-                    computations = json.loads(cleaned_response)
-                    print(f"\n===== PROCESSING TASK: {substeps['title']} =====")
-                    try:
-                        print(f"--- Result for {substeps['id']} ---")
-
-                        # Use our NEW general printer for ALL tasks
-                        output = format_general_report(computations)
-                        print(output)
-                        results.append({"id": substeps["id"], "body": output})
-
-                        print("-----------------------------------")
-
-                    except Exception as e:
-                        print(f"--- ERROR: Failed to process task {substeps['id']} ---")
-                        print(f"Details: {e}")
+            print("-----------------------------------")
+        else:
+            print(f"--- ERROR: Failed to process task {substep['id']} ---")
+            print(f"Details: {outcome['error']}")
+            results.append(
+                {
+                    "id": substep["id"],
+                    "body": f"--- {substep['title']} ---\nFailed: {outcome['error']}",
+                    "status": "failed",
+                    "elapsed_s": outcome["elapsed_s"],
+                    "error": {
+                        "type": outcome["error_type"],
+                        "message": outcome["error"],
+                    },
+                }
+            )
     return results
 
 
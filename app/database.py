@@ -1,12 +1,131 @@
+import asyncio
 import json
+import os
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional, Literal
+from typing import Any, AsyncIterator, Dict, List, Optional, Literal, Tuple
 
 import aiosqlite
 import bcrypt
 
 DB_PATH = Path(__file__).with_name("database.db")
+TaskStatus = Literal["completed", "in_progress", "pending"]
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Applied once to every pooled connection when it is opened. WAL lets readers
+# proceed while a writer holds the lock, and NORMAL sync is safe under WAL.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class ConnectionPool:
+    """A bounded pool of long-lived aiosqlite connections.
+
+    Connections are opened lazily up to ``size`` and handed back to the idle
+    queue on release, so each request reuses an open file handle and worker
+    thread instead of paying for ``aiosqlite.connect`` every time.
+    """
+
+    def __init__(self, path: Path, size: int = DB_POOL_SIZE) -> None:
+        self.path = path
+        self.size = max(1, size)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._connections: List[aiosqlite.Connection] = []
+        self._slots = asyncio.Semaphore(self.size)
+        self._closed = False
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(str(self.path))
+        conn.row_factory = aiosqlite.Row
+        for pragma in _CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        self._connections.append(conn)
+        return conn
+
+    async def acquire(self) -> aiosqlite.Connection:
+        """Borrow a connection, waiting if all ``size`` connections are in use."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        await self._slots.acquire()
+        try:
+            try:
+                return self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, conn: aiosqlite.Connection) -> None:
+        """Return a borrowed connection, rolling back anything left uncommitted."""
+        try:
+            if self._closed:
+                await conn.close()
+                return
+            try:
+                if conn.in_transaction:
+                    await conn.rollback()
+            except Exception:
+                # A broken connection is dropped; the next acquire opens a new one.
+                if conn in self._connections:
+                    self._connections.remove(conn)
+                await conn.close()
+                return
+            self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        """Close every connection owned by the pool."""
+        self._closed = True
+        connections, self._connections = self._connections, []
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for conn in connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"Warning: Failed to close database connection: {e}")
+
+
+_pool: Optional[ConnectionPool] = None
+
+
+async def open_pool(size: int = DB_POOL_SIZE) -> ConnectionPool:
+    """Create the process-wide connection pool. Call once at application startup."""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(DB_PATH, size)
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the process-wide connection pool. Call once at application shutdown."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[aiosqlite.Connection]:
+    """Borrow a pooled connection for the duration of the ``async with`` block."""
+    pool = await open_pool()
+    conn = await pool.acquire()
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
 
 
 def _utc_now() -> str:
@@ -16,7 +135,7 @@ def _utc_now() -> str:
 
 async def init_db() -> None:
     """Ensure all required tables exist."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connection() as db:
         await db.execute(
             """
             CREATE TABLE IF NOT EXISTS survey_sessions (
@@ -28,12 +147,154 @@ async def init_db() -> None:
             )
             """
         )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS task_statuses (
+                session_id INTEGER NOT NULL,
+                task_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                results TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (session_id, task_id),
+                FOREIGN KEY (session_id) REFERENCES survey_sessions(id) ON DELETE CASCADE
+            )
+            """
+        )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                session_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                FOREIGN KEY (session_id) REFERENCES survey_sessions(id) ON DELETE CASCADE
+            )
+            """
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)"
+        )
+        # LangGraph checkpoints; thread_id is "<session_id>:<workflow_id>"
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workflow_checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB NOT NULL,
+                metadata BLOB,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            )
+            """
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_workflow_checkpoints_thread_created"
+            " ON workflow_checkpoints(thread_id, created_at)"
+        )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workflow_checkpoint_writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            )
+            """
+        )
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workflow_metrics (
+                session_id INTEGER NOT NULL,
+                workflow_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                node TEXT NOT NULL,
+                step INTEGER,
+                started_at REAL,
+                elapsed_s REAL,
+                metrics TEXT NOT NULL,
+                recorded_at TEXT NOT NULL,
+                PRIMARY KEY (session_id, workflow_id, task_id)
+            )
+            """
+        )
+        # Generated checklists; a new version is stored only when its inputs change
+        await db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checklists (
+                session_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL,
+                checklist TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (session_id, version),
+                FOREIGN KEY (session_id) REFERENCES survey_sessions(id) ON DELETE CASCADE
+            )
+            """
+        )
+        await _migrate_task_statuses(db)
         await db.commit()
 
 
+async def _migrate_task_statuses(db: aiosqlite.Connection) -> None:
+    """Move task statuses embedded in ``survey_data`` blobs into ``task_statuses``.
+
+    Older rows stored statuses under ``survey_data["task_statuses"]``. Each one
+    is copied into the table (existing rows win) and the key is stripped from
+    the blob. ``completed_at`` and ``updated_at`` are left untouched.
+    """
+    cursor = await db.execute(
+        """
+        SELECT id, survey_data FROM survey_sessions
+        WHERE survey_data LIKE '%"task_statuses"%'
+        """
+    )
+    rows = await cursor.fetchall()
+    for row in rows:
+        survey_data = json.loads(row["survey_data"])
+        task_statuses = survey_data.pop("task_statuses", None) or {}
+        await db.executemany(
+            """
+            INSERT OR IGNORE INTO task_statuses (session_id, task_id, status, results, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    row["id"],
+                    task_id,
+                    entry.get("status", "pending"),
+                    json.dumps(entry.get("results") or {}),
+                    entry.get("updated_at") or _utc_now(),
+                )
+                for task_id, entry in task_statuses.items()
+            ],
+        )
+        await db.execute(
+            "UPDATE survey_sessions SET survey_data = ? WHERE id = ?",
+            (json.dumps(survey_data), row["id"]),
+        )
+    if rows:
+        print(f"Migrated task statuses for {len(rows)} session(s)")
+
+
 async def create_session() -> int:
     """Create a new survey session and return its identifier."""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connection() as db:
         cursor = await db.execute(
             "INSERT INTO survey_sessions (survey_data, completed_at, updated_at) VALUES (?, ?, ?)",
             (None, None, _utc_now()),
@@ -44,8 +305,7 @@ async def create_session() -> int:
 
 async def get_session(session_id: int) -> Optional[Dict[str, Any]]:
     """Retrieve a session record by id."""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with connection() as db:
         cursor = await db.execute(
             """
             SELECT id, survey_data, completed_at, created_at, updated_at
@@ -72,7 +332,7 @@ async def save_survey_data(session_id: int, survey_payload: Dict[str, Any]) -> b
     """Persist survey data for a session. Returns True if a row was updated."""
     serialized = json.dumps(survey_payload)
     timestamp = _utc_now()
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connection() as db:
         cursor = await db.execute(
             """
             UPDATE survey_sessions
@@ -85,10 +345,21 @@ async def save_survey_data(session_id: int, survey_payload: Dict[str, Any]) -> b
         return cursor.rowcount > 0
 
 
+_UPSERT_TASK_STATUS_SQL = """
+    INSERT INTO task_statuses (session_id, task_id, status, results, updated_at)
+    SELECT ?, ?, ?, ?, ?
+    WHERE EXISTS (SELECT 1 FROM survey_sessions WHERE id = ?)
+    ON CONFLICT (session_id, task_id) DO UPDATE SET
+        status = excluded.status,
+        results = excluded.results,
+        updated_at = excluded.updated_at
+"""
+
+
 async def update_task_status(
     session_id: int, 
     task_id: str, 
-    status: Literal["completed", "in_progress", "pending"],
+    status: TaskStatus,
     results: Optional[Dict[str, Any]] = None
 ) -> bool:
     """Update the status of a specific task in the session.
@@ -102,44 +373,481 @@ async def update_task_status(
     Returns:
         True if the update was successful
     """
-    # Get current session data
-    session = await get_session(session_id)
-    if not session:
-        return False
-    
-    survey_data = session.get("survey_data", {})
-    
-    # Initialize task_statuses if it doesn't exist
-    if "task_statuses" not in survey_data:
-        survey_data["task_statuses"] = {}
-    
-    # Update the task status
-    survey_data["task_statuses"][task_id] = {
-        "status": status,
-        "updated_at": _utc_now(),
-        "results": results or {}
+    async with connection() as db:
+        cursor = await db.execute(
+            _UPSERT_TASK_STATUS_SQL,
+            (session_id, task_id, status, json.dumps(results or {}), _utc_now(), session_id),
+        )
+        await db.commit()
+        return cursor.rowcount > 0
+
+
+async def update_task_statuses(
+    session_id: int,
+    updates: Dict[str, Tuple[TaskStatus, Optional[Dict[str, Any]]]],
+) -> bool:
+    """Update several task statuses for a session in a single transaction.
+
+    Args:
+        session_id: The session identifier
+        updates: Mapping of task_id -> (status, results)
+
+    Returns:
+        True if the session exists and the updates were applied
+    """
+    timestamp = _utc_now()
+    async with connection() as db:
+        cursor = await db.execute(
+            "SELECT 1 FROM survey_sessions WHERE id = ?", (session_id,)
+        )
+        if not await cursor.fetchone():
+            return False
+        if updates:
+            await db.executemany(
+                _UPSERT_TASK_STATUS_SQL,
+                [
+                    (session_id, task_id, status, json.dumps(results or {}), timestamp, session_id)
+                    for task_id, (status, results) in updates.items()
+                ],
+            )
+            await db.commit()
+        return True
+
+
+async def list_task_statuses(session_id: int) -> Optional[Dict[str, Any]]:
+    """Return every task status for a session keyed by task id.
+
+    Returns:
+        None if the session does not exist, otherwise a mapping of
+        task_id -> {"status", "updated_at", "results"}
+    """
+    async with connection() as db:
+        cursor = await db.execute(
+            "SELECT 1 FROM survey_sessions WHERE id = ?", (session_id,)
+        )
+        if not await cursor.fetchone():
+            return None
+        cursor = await db.execute(
+            """
+            SELECT task_id, status, results, updated_at
+            FROM task_statuses
+            WHERE session_id = ?
+            """,
+            (session_id,),
+        )
+        rows = await cursor.fetchall()
+
+    return {
+        row["task_id"]: {
+            "status": row["status"],
+            "updated_at": row["updated_at"],
+            "results": json.loads(row["results"]) if row["results"] else {},
+        }
+        for row in rows
     }
-    
-    # Save back to database
-    return await save_survey_data(session_id, survey_data)
+
+
+def _job_from_row(row: aiosqlite.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["job_id"] = job.pop("id")
+    job["payload"] = json.loads(job["payload"]) if job["payload"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+async def create_job(session_id: int, kind: str, payload: Dict[str, Any]) -> str:
+    """Queue a background job and return its identifier."""
+    job_id = uuid.uuid4().hex
+    async with connection() as db:
+        await db.execute(
+            """
+            INSERT INTO jobs (id, session_id, kind, status, payload, created_at)
+            VALUES (?, ?, ?, 'queued', ?, ?)
+            """,
+            (job_id, session_id, kind, json.dumps(payload), _utc_now()),
+        )
+        await db.commit()
+    return job_id
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieve a job record by id."""
+    async with connection() as db:
+        cursor = await db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = await cursor.fetchone()
+    return _job_from_row(row) if row else None
+
+
+async def claim_next_job() -> Optional[Dict[str, Any]]:
+    """Mark the oldest queued job as running and return it, or None if the queue is empty."""
+    async with connection() as db:
+        while True:
+            cursor = await db.execute(
+                """
+                SELECT id FROM jobs WHERE status = 'queued'
+                ORDER BY created_at LIMIT 1
+                """
+            )
+            row = await cursor.fetchone()
+            if not row:
+                return None
+            cursor = await db.execute(
+                """
+                UPDATE jobs
+                SET status = 'running', started_at = ?, attempts = attempts + 1
+                WHERE id = ? AND status = 'queued'
+                """,
+                (_utc_now(), row["id"]),
+            )
+            await db.commit()
+            # Another worker may have claimed it between the SELECT and UPDATE
+            if cursor.rowcount > 0:
+                cursor = await db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],))
+                return _job_from_row(await cursor.fetchone())
+
+
+async def finish_job(
+    job_id: str,
+    status: JobStatus,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Record the outcome of a job. A status of "queued" puts it back on the queue."""
+    async with connection() as db:
+        await db.execute(
+            """
+            UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?
+            WHERE id = ?
+            """,
+            (
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                _utc_now() if status in ("succeeded", "failed") else None,
+                job_id,
+            ),
+        )
+        await db.commit()
+
+
+async def requeue_interrupted_jobs(max_attempts: int) -> Tuple[int, int]:
+    """Put jobs left running by a previous process back on the queue.
+
+    A job that has already been started ``max_attempts`` times is marked
+    failed instead, so one that crashes the process is not retried forever.
+
+    Returns:
+        tuple: (jobs requeued, jobs failed)
+    """
+    async with connection() as db:
+        failed = await db.execute(
+            """
+            UPDATE jobs
+            SET status = 'failed', error = ?, finished_at = ?
+            WHERE status = 'running' AND attempts >= ?
+            """,
+            (f"Interrupted after {max_attempts} attempt(s)", _utc_now(), max_attempts),
+        )
+        requeued = await db.execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+        )
+        await db.commit()
+        return requeued.rowcount, failed.rowcount
+
+
+async def save_workflow_checkpoint(
+    thread_id: str,
+    checkpoint_ns: str,
+    checkpoint_id: str,
+    parent_checkpoint_id: Optional[str],
+    type_: str,
+    checkpoint: bytes,
+    metadata: bytes,
+) -> None:
+    """Store a serialized workflow checkpoint."""
+    async with connection() as db:
+        await db.execute(
+            """
+            INSERT OR REPLACE INTO workflow_checkpoints
+                (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                 type, checkpoint, metadata, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                parent_checkpoint_id,
+                type_,
+                checkpoint,
+                metadata,
+                _utc_now(),
+            ),
+        )
+        await db.commit()
+
+
+async def save_workflow_writes(
+    thread_id: str,
+    checkpoint_ns: str,
+    checkpoint_id: str,
+    writes: List[Tuple[str, int, str, str, bytes, str]],
+    replace: bool,
+) -> None:
+    """Store the pending writes a workflow task produced after a checkpoint.
+
+    Args:
+        writes: (task_id, idx, channel, type, value, task_path) rows
+        replace: overwrite existing rows (special channels) rather than keep the first write
+    """
+    verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+    async with connection() as db:
+        await db.executemany(
+            f"""
+            {verb} INTO workflow_checkpoint_writes
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx,
+                 channel, type, value, task_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(thread_id, checkpoint_ns, checkpoint_id, *write) for write in writes],
+        )
+        await db.commit()
+
+
+async def list_workflow_checkpoints(
+    thread_id: Optional[str] = None,
+    checkpoint_ns: Optional[str] = None,
+    checkpoint_id: Optional[str] = None,
+    before_checkpoint_id: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """List stored checkpoints newest first, each with its pending writes.
+
+    Returns:
+        List[Dict[str, Any]]: checkpoint rows with a "writes" list of
+            (task_id, idx, channel, type, value, task_path) rows
+    """
+    clauses = []
+    params: List[Any] = []
+    for column, value in (
+        ("thread_id", thread_id),
+        ("checkpoint_ns", checkpoint_ns),
+        ("checkpoint_id", checkpoint_id),
+    ):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if before_checkpoint_id is not None:
+        clauses.append("checkpoint_id < ?")
+        params.append(before_checkpoint_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    limit_sql = f"LIMIT {int(limit)}" if limit is not None else ""
+
+    async with connection() as db:
+        cursor = await db.execute(
+            f"""
+            SELECT * FROM workflow_checkpoints {where}
+            ORDER BY checkpoint_id DESC {limit_sql}
+            """,
+            params,
+        )
+        checkpoints = [dict(row) for row in await cursor.fetchall()]
+        for checkpoint in checkpoints:
+            cursor = await db.execute(
+                """
+                SELECT task_id, idx, channel, type, value, task_path
+                FROM workflow_checkpoint_writes
+                WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+                """,
+                (
+                    checkpoint["thread_id"],
+                    checkpoint["checkpoint_ns"],
+                    checkpoint["checkpoint_id"],
+                ),
+            )
+            checkpoint["writes"] = [tuple(row) for row in await cursor.fetchall()]
+    return checkpoints
+
+
+async def delete_workflow_checkpoints(thread_id: str) -> None:
+    """Delete every checkpoint and pending write for a workflow thread."""
+    async with connection() as db:
+        await db.execute(
+            "DELETE FROM workflow_checkpoint_writes WHERE thread_id = ?", (thread_id,)
+        )
+        await db.execute(
+            "DELETE FROM workflow_checkpoints WHERE thread_id = ?", (thread_id,)
+        )
+        await db.commit()
+
+
+async def prune_workflow_checkpoints(older_than: str) -> int:
+    """Delete the checkpoints of every workflow thread last checkpointed before ``older_than``.
+
+    Args:
+        older_than (str): ISO 8601 UTC timestamp
+
+    Returns:
+        int: how many threads were deleted
+    """
+    expired = """
+        SELECT thread_id FROM workflow_checkpoints
+        GROUP BY thread_id HAVING MAX(created_at) < ?
+    """
+    async with connection() as db:
+        cursor = await db.execute(f"SELECT COUNT(*) FROM ({expired})", (older_than,))
+        (threads,) = await cursor.fetchone()
+        if threads:
+            await db.execute(
+                f"DELETE FROM workflow_checkpoint_writes WHERE thread_id IN ({expired})",
+                (older_than,),
+            )
+            await db.execute(
+                f"DELETE FROM workflow_checkpoints WHERE thread_id IN ({expired})",
+                (older_than,),
+            )
+            await db.commit()
+    return threads
+
+
+async def save_workflow_metrics(
+    session_id: int, workflow_id: str, node_metrics: List[Dict[str, Any]]
+) -> None:
+    """Store per-node metrics for a workflow run, replacing earlier records of the same task."""
+    recorded_at = _utc_now()
+    async with connection() as db:
+        await db.executemany(
+            """
+            INSERT OR REPLACE INTO workflow_metrics
+                (session_id, workflow_id, task_id, node, step, started_at,
+                 elapsed_s, metrics, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    session_id,
+                    workflow_id,
+                    metrics["task_id"],
+                    metrics["node"],
+                    metrics.get("step"),
+                    metrics.get("started_at"),
+                    metrics.get("elapsed_s"),
+                    json.dumps(metrics),
+                    recorded_at,
+                )
+                for metrics in node_metrics
+            ],
+        )
+        await db.commit()
+
+
+async def list_workflow_metrics(
+    session_id: int, workflow_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Return the stored per-node metrics for a session, oldest first."""
+    query = "SELECT workflow_id, metrics FROM workflow_metrics WHERE session_id = ?"
+    params: List[Any] = [session_id]
+    if workflow_id is not None:
+        query += " AND workflow_id = ?"
+        params.append(workflow_id)
+    async with connection() as db:
+        cursor = await db.execute(query + " ORDER BY started_at, step", params)
+        rows = await cursor.fetchall()
+    return [
+        {"workflow_id": row["workflow_id"], **json.loads(row["metrics"])} for row in rows
+    ]
+
+
+def _checklist_from_row(row: aiosqlite.Row) -> Dict[str, Any]:
+    data = dict(row)
+    data["checklist"] = json.loads(data["checklist"])
+    return data
+
+
+async def save_checklist(
+    session_id: int, fingerprint: str, checklist: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Store a checklist as the session's next version.
+
+    Returns the stored record, or None if the session does not exist.
+    """
+    async with connection() as db:
+        cursor = await db.execute(
+            """
+            INSERT INTO checklists (session_id, version, fingerprint, checklist, created_at)
+            SELECT ?, (
+                SELECT COALESCE(MAX(version), 0) + 1 FROM checklists WHERE session_id = ?
+            ), ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM survey_sessions WHERE id = ?)
+            """,
+            (session_id, session_id, fingerprint, json.dumps(checklist), _utc_now(), session_id),
+        )
+        await db.commit()
+        if cursor.rowcount == 0:
+            return None
+        cursor = await db.execute(
+            """
+            SELECT session_id, version, fingerprint, checklist, created_at
+            FROM checklists WHERE rowid = ?
+            """,
+            (cursor.lastrowid,),
+        )
+        row = await cursor.fetchone()
+    return _checklist_from_row(row)
+
+
+async def get_checklist(
+    session_id: int, version: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """Return a stored checklist record, the latest version unless one is given."""
+    query = """
+        SELECT session_id, version, fingerprint, checklist, created_at
+        FROM checklists WHERE session_id = ?
+    """
+    params: List[Any] = [session_id]
+    if version is not None:
+        query += " AND version = ?"
+        params.append(version)
+    async with connection() as db:
+        cursor = await db.execute(query + " ORDER BY version DESC LIMIT 1", params)
+        row = await cursor.fetchone()
+    return _checklist_from_row(row) if row else None
+
+
+async def list_checklist_versions(session_id: int) -> List[Dict[str, Any]]:
+    """Return every stored version of a session's checklist, without the JSON, oldest first."""
+    async with connection() as db:
+        cursor = await db.execute(
+            """
+            SELECT version, fingerprint, created_at FROM checklists
+            WHERE session_id = ? ORDER BY version
+            """,
+            (session_id,),
+        )
+        rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
+
 
 async def get_db() -> aiosqlite.Connection:
-    """Returns a database connection
+    """Borrows a database connection from the pool
 
     Returns:
         aiosqlite.Connection: the database connection
     """
-    conn = await aiosqlite.connect(str(DB_PATH))
-    return conn
+    pool = await open_pool()
+    return await pool.acquire()
 
 
 async def close_db(conn: aiosqlite.Connection) -> None:
-    """Closes the database connection
+    """Returns a borrowed database connection to the pool
 
     Args:
         conn (aiosqlite.Connection): the database connection object
     """
-    await conn.close()
+    if _pool is None:
+        await conn.close()
+        return
+    await _pool.release(conn)
 
 
 async def load_schema(
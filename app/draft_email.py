@@ -7,6 +7,8 @@ from google import genai
 from google.genai import types
 from pprint import pprint
 
+from llm_cache import cached_generate_content
+from parallel import DEFAULT_MAX_WORKERS, run_ordered
 from random_data import generate_random_estate_data
 from send_emails import send_emails
 
@@ -34,17 +36,7 @@ def extract_json_from_text(text: str) -> str | None:
     return None
 
 
-def draft_emails(data: dict, user_data: dict) -> list:
-    """Drafts the emails to be sent.
-
-    Args:
-        data (dict): the tasks dictionary
-        user_data (dict): a dictionary containing personalised information about the deceased
-
-    Returns:
-        list: a list of drafted emails
-    """
-    system_prompt = r"""
+DRAFTING_SYSTEM_PROMPT = r"""
 You are a "DraftingAgent," an expert AI assistant for estate administration. Your role is to help an Executor by drafting necessary documents.
 
 You will be provided with a JSON payload containing two main keys:
@@ -69,103 +61,142 @@ You will be provided with a JSON payload containing two main keys:
 * **The raw text of your response must start with `[` and end with `]`.**
 """
 
+
+def _drafting_substeps(data: dict) -> list:
+    """Returns every DraftingAgent substep in checklist order."""
+    return [
+        substep
+        for steps in data["steps"]
+        for substep in steps.get("substeps", [])
+        if substep.get("automation_agent_type") == "DraftingAgent"
+    ]
+
+
+def parse_drafts(raw_response: str) -> list:
+    """Extracts and decodes the JSON array of drafts from a model response.
+
+    Raises:
+        ValueError: if the response does not contain valid JSON
+    """
+    # Use the helper to clean the response
+    json_string = extract_json_from_text(raw_response)
+    if not json_string:
+        raise ValueError(
+            f"Could not find any JSON in the model's response: {raw_response}"
+        )
+
+    try:
+        return json.loads(json_string)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to decode the extracted JSON: {e}") from e
+
+
+def draft_substep(substep: dict, user_data: dict) -> list:
+    """Drafts the documents for a single DraftingAgent substep.
+
+    Args:
+        substep (dict): the substep definition from the checklist
+        user_data (dict): a dictionary containing personalised information about the deceased
+
+    Raises:
+        ValueError: if the model response does not contain valid JSON
+
+    Returns:
+        list: the drafts as {"heading", "body"} dicts
+    """
+    payload = {
+        "task_definition": {
+            "id": substep["id"],
+            "title": substep["title"],
+            "description": substep["description"],
+            "inputs_required": substep["inputs_required"],
+        },
+        "user_data": user_data,
+    }
+    contents_for_api = [
+        f"Please execute the task defined in `task_definition` using the complete `user_data` record. \n\n {json.dumps(payload, indent=2)}"
+    ]
+    drafts = cached_generate_content(
+        gemini_client,
+        model="gemini-2.5-flash",
+        system_instruction=DRAFTING_SYSTEM_PROMPT,
+        contents=contents_for_api,
+        parse=parse_drafts,
+    )
+
+    return [
+        {
+            "heading": draft.get("document_name"),
+            "body": draft.get("draft"),
+        }
+        for draft in drafts
+    ]
+
+
+def draft_emails_with_report(
+    data: dict, user_data: dict, max_workers: int = DEFAULT_MAX_WORKERS
+) -> tuple[list, list]:
+    """Drafts the emails for every DraftingAgent substep concurrently.
+
+    Args:
+        data (dict): the tasks dictionary
+        user_data (dict): a dictionary containing personalised information about the deceased
+        max_workers (int, optional): the number of model calls in flight at once
+
+    Returns:
+        tuple[list, list]: the drafted emails in checklist order, and one
+            {"task_id", "title", "status", "elapsed_s", "drafts", "error"}
+            record per substep
+    """
+    substeps_list = _drafting_substeps(data)
+    outcomes = run_ordered(
+        lambda substep: draft_substep(substep, user_data),
+        substeps_list,
+        max_workers=max_workers,
+    )
+
     results = []
+    report = []
+    for substep, outcome in zip(substeps_list, outcomes):
+        drafts = outcome["result"] or []
+        if outcome["ok"]:
+            for draft in drafts:
+                print(f"--- Generated Draft: {draft['heading'] or 'Untitled'} ---")
+                print(draft["body"] or "No draft content.")
+                print("-----------------------------------")
+            results.extend(drafts)
+        else:
+            print(f"--- ERROR: Failed to draft task {substep['id']} ---")
+            print(f"Details: {outcome['error']}")
 
-    for steps in data["steps"]:
-        if "substeps" in steps.keys():
-            for substeps in steps["substeps"]:
-                if substeps.get("automation_agent_type") == "DraftingAgent":
-                    payload = {
-                        "task_definition": {
-                            "id": substeps["id"],
-                            "title": substeps["title"],
-                            "description": substeps["description"],
-                            "inputs_required": substeps["inputs_required"],
-                        },
-                        "user_data": user_data,
-                    }
-                    contents_for_api = [
-                        f"Please execute the task defined in `task_definition` using the complete `user_data` record. \n\n {json.dumps(payload, indent=2)}"
-                    ]
-                    response = gemini_client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        config=types.GenerateContentConfig(
-                            system_instruction=system_prompt
-                        ),
-                        contents=contents_for_api,
-                    )
-
-                    try:
-                        raw_response = response.text
-
-                        # Use the new helper to clean the response
-                        json_string = extract_json_from_text(raw_response)
-
-                        if not json_string:
-                            print(
-                                "--- ERROR: Could not find any JSON in the model's response ---"
-                            )
-                            print(f"Raw response: {raw_response}")
-                            continue  # Skip to the next task
-
-                        # Now, parse the *clean* string
-                        drafts = json.loads(json_string)
-
-                        # ... rest of your code for printing drafts ...
-                        for draft in drafts:
-                            print(
-                                f"--- Generated Draft: {draft.get('document_name', 'Untitled')} ---"
-                            )
-                            print(draft.get("draft", "No draft content."))
-                            print("-----------------------------------")
-                            results.append(
-                                {
-                                    "heading": draft.get("document_name"),
-                                    "body": draft.get("draft"),
-                                }
-                            )
-
-                    except json.JSONDecodeError:
-                        print("--- ERROR: Failed to decode the extracted JSON ---")
-                        print(f"Extracted string was: {json_string}")
-                    except Exception as e:
-                        print(f"An unexpected error occurred: {e}")
-                    # try:
-                    #     # First, strip any potential whitespace or newlines from the start/end
-                    #     cleaned_response = response.text.strip()
-
-                    #     # Optional: A simple check to remove markdown if it *still* appears
-                    #     if cleaned_response.startswith("```json"):
-                    #         cleaned_response = cleaned_response[
-                    #             7:
-                    #         ].strip()  # Remove ```json
-                    #     if cleaned_response.endswith("```"):
-                    #         cleaned_response = cleaned_response[
-                    #             :-3
-                    #         ].strip()  # Remove ```
-
-                    #     generated_drafts = json.loads(cleaned_response)
-                    #     for draft in generated_drafts:
-                    #         print(
-                    #             f"--- Generated Draft: {draft.get('document_name')} ---"
-                    #         )
-                    #         print(draft.get("draft"))
-                    #         print("-----------------------------------")
-
-                    #         results.append(
-                    #             {
-                    #                 "heading": draft.get("document_name"),
-                    #                 "body": draft.get("draft"),
-                    #             }
-                    #         )
-
-                    # except json.JSONDecodeError:
-                    #     print("--- ERROR: Model did not return valid JSON ---")
-                    #     print(f"Raw response: {response.text}")
-
-                    # except Exception as e:
-                    #     print(f"An unexpected error occurred: {e}")
+        report.append(
+            {
+                "task_id": substep["id"],
+                "title": substep["title"],
+                "status": "ok" if outcome["ok"] else "failed",
+                "elapsed_s": outcome["elapsed_s"],
+                "drafts": len(drafts),
+                "error": outcome["error"],
+            }
+        )
+
+    return results, report
+
+
+def draft_emails(
+    data: dict, user_data: dict, max_workers: int = DEFAULT_MAX_WORKERS
+) -> list:
+    """Drafts the emails to be sent.
+
+    Args:
+        data (dict): the tasks dictionary
+        user_data (dict): a dictionary containing personalised information about the deceased
+        max_workers (int, optional): the number of model calls in flight at once
 
+    Returns:
+        list: a list of drafted emails
+    """
+    results, _ = draft_emails_with_report(data, user_data, max_workers)
     return results
 
 
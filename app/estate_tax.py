@@ -0,0 +1,563 @@
+"""
+Deterministic UK (England & Wales) estate calculations.
+
+Works over the financial inventory produced by
+``random_data.generate_random_financial_data`` and answers the
+ComputationAgent's questions (estate value and probate need, Inheritance
+Tax, Capital Gains Tax on post-death sales, estate accounts) without a
+model call. Every result uses the same {"task_id", "task_title",
+"final_decision", "report_sections"} format the model is asked for, so
+``compute_agent.format_general_report`` renders either.
+
+Thresholds in ``tax_and_will_details`` override the defaults below.
+"""
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 2025/26 figures
+NIL_RATE_BAND = 325000
+RESIDENCE_NIL_RATE_BAND = 175000
+# The residence nil-rate band is withdrawn by £1 for every £2 of net estate above this
+RNRB_TAPER_THRESHOLD = 2000000
+IHT_RATE_PERCENT = 40
+# A spouse who died first can pass on at most one extra band (200% in total)
+MAX_TRANSFERRED_BAND_PERCENT = 100
+PROBATE_THRESHOLD = 5000
+# Personal representatives' annual exempt amount
+CGT_ANNUAL_EXEMPT_AMOUNT = 3000
+CGT_RATE_PERCENT = 24
+
+ASSET_CATEGORIES = ("real_estate", "bank_accounts", "investments", "personal_chattels")
+
+
+def _gbp(amount: float) -> str:
+    return f"£{amount:,.2f}"
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def _iter_assets(user_data: dict) -> Iterator[Tuple[str, dict]]:
+    """Yields (category, asset) for every asset valued at the date of death."""
+    assets = user_data.get("assets", {})
+    for category in ASSET_CATEGORIES:
+        items = assets.get(category) or []
+        for item in items if isinstance(items, list) else [items]:
+            if "value_at_death" in item:
+                yield category, item
+
+
+def _spouse_name(user_data: dict) -> Optional[str]:
+    return user_data.get("tax_and_will_details", {}).get("will_summary", {}).get("spouse_name")
+
+
+def _is_joint(asset: dict) -> bool:
+    return asset.get("ownership", "").lower().startswith("joint")
+
+
+def _joint_with_spouse(asset: dict, spouse_name: Optional[str]) -> bool:
+    return bool(spouse_name) and _is_joint(asset) and spouse_name in asset.get("ownership", "")
+
+
+def calculate_iht(
+    net_estate: float,
+    exempt: float = 0.0,
+    residence_value: float = 0.0,
+    residence_to_descendants: bool = False,
+    nil_rate_band: float = NIL_RATE_BAND,
+    residence_nil_rate_band: float = RESIDENCE_NIL_RATE_BAND,
+    rate_percent: float = IHT_RATE_PERCENT,
+    transferred_nrb_percent: float = 0,
+    transferred_rnrb_percent: float = 0,
+) -> Dict[str, Any]:
+    """Calculates the Inheritance Tax on a death estate.
+
+    Args:
+        net_estate (float): the estate after debts and funeral costs
+        exempt (float, optional): the part passing to a spouse or charity
+        residence_value (float, optional): the deceased's net interest in their home
+        residence_to_descendants (bool, optional): whether the home is closely
+            inherited, which is what unlocks the residence nil-rate band
+        nil_rate_band (float, optional): the nil-rate band
+        residence_nil_rate_band (float, optional): the residence nil-rate band
+        rate_percent (float, optional): the IHT rate
+        transferred_nrb_percent (float, optional): unused nil-rate band claimed
+            from a spouse who died first
+        transferred_rnrb_percent (float, optional): as above for the residence band
+
+    Returns:
+        dict: the bands available and used, the taxable estate, the tax due,
+            and the percentage of each band left for a surviving spouse to claim
+    """
+    transferred_nrb_percent = min(transferred_nrb_percent, MAX_TRANSFERRED_BAND_PERCENT)
+    transferred_rnrb_percent = min(transferred_rnrb_percent, MAX_TRANSFERRED_BAND_PERCENT)
+    nrb_available = nil_rate_band * (1 + transferred_nrb_percent / 100)
+
+    rnrb_before_taper = residence_nil_rate_band * (1 + transferred_rnrb_percent / 100)
+    rnrb_taper = max(0.0, (net_estate - RNRB_TAPER_THRESHOLD) / 2)
+    rnrb_after_taper = max(0.0, rnrb_before_taper - rnrb_taper)
+    rnrb_available = min(rnrb_after_taper, residence_value) if residence_to_descendants else 0.0
+
+    chargeable_estate = max(0.0, net_estate - exempt)
+    rnrb_used = min(rnrb_available, chargeable_estate)
+    nrb_used = min(nrb_available, chargeable_estate - rnrb_used)
+    taxable_estate = chargeable_estate - rnrb_used - nrb_used
+    iht_due = round(taxable_estate * rate_percent / 100, 2)
+
+    return {
+        "net_estate": net_estate,
+        "exempt": exempt,
+        "chargeable_estate": chargeable_estate,
+        "nil_rate_band": nrb_available,
+        "nil_rate_band_used": nrb_used,
+        "residence_nil_rate_band": rnrb_available,
+        "residence_nil_rate_band_taper": min(rnrb_taper, rnrb_before_taper),
+        "residence_nil_rate_band_used": rnrb_used,
+        "taxable_estate": taxable_estate,
+        "iht_rate_percent": rate_percent,
+        "iht_due": iht_due,
+        "unused_nil_rate_band_percent": round(100 * (nrb_available - nrb_used) / nil_rate_band, 2),
+        "unused_residence_nil_rate_band_percent": (
+            round(100 * (rnrb_after_taper - rnrb_used) / residence_nil_rate_band, 2)
+            if residence_nil_rate_band
+            else 0.0
+        ),
+    }
+
+
+def value_estate(user_data: dict) -> Dict[str, Any]:
+    """Values the estate at the date of death.
+
+    The IHT estate includes the deceased's share of joint assets (half,
+    unless the asset records a ``share``); the probate estate only holds
+    what does not pass automatically to a surviving joint owner. Pensions
+    paid to a nominee are outside both.
+
+    Returns:
+        dict: per-asset values, gross and net IHT and probate estates, and
+            the liabilities deducted
+    """
+    spouse_name = _spouse_name(user_data)
+    assets = []
+    for category, asset in _iter_assets(user_data):
+        value = asset["value_at_death"]
+        share = asset.get("share", 0.5) if _is_joint(asset) else 1.0
+        assets.append(
+            {
+                "id": asset.get("id"),
+                "category": category,
+                "description": (
+                    asset.get("address")
+                    or " ".join(filter(None, [asset.get("institution"), asset.get("type")]))
+                    or asset.get("description")
+                    or asset.get("id")
+                ),
+                "institution": asset.get("institution"),
+                "value_at_death": value,
+                "iht_value": value * share,
+                "is_main_residence": asset.get("is_main_residence", False),
+                "in_probate_estate": not asset.get("passes_to_survivor", False),
+                "passes_to_spouse": asset.get("passes_to_survivor", False)
+                and _joint_with_spouse(asset, spouse_name),
+            }
+        )
+
+    liabilities = user_data.get("liabilities", {})
+    deductions = {
+        "mortgages": sum(m.get("outstanding_balance", 0) for m in liabilities.get("mortgages", [])),
+        "credit_cards": sum(c.get("outstanding_balance", 0) for c in liabilities.get("credit_cards", [])),
+        "utility_bills": liabilities.get("utility_bills", 0),
+        "funeral_costs": liabilities.get("funeral_costs", 0),
+    }
+    total_liabilities = sum(deductions.values())
+
+    gross_estate = sum(asset["iht_value"] for asset in assets)
+    gross_probate_estate = sum(asset["value_at_death"] for asset in assets if asset["in_probate_estate"])
+    return {
+        "assets": assets,
+        "gross_estate": gross_estate,
+        "liabilities": deductions,
+        "total_liabilities": total_liabilities,
+        "net_estate": max(0.0, gross_estate - total_liabilities),
+        "gross_probate_estate": gross_probate_estate,
+        "net_probate_estate": max(0.0, gross_probate_estate - total_liabilities),
+    }
+
+
+def assess_probate(user_data: dict, valuation: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Decides whether a grant of probate is needed.
+
+    A grant is needed when the probate estate exceeds the HMCTS threshold,
+    when any institution holds more in the deceased's sole name than it
+    will release without one, or when land is held in the sole name.
+
+    Returns:
+        dict: {"required", "reasons", "institutions"} where "institutions"
+            maps each institution with a known threshold to its holding
+    """
+    valuation = valuation or value_estate(user_data)
+    thresholds = dict(user_data.get("tax_and_will_details", {}).get("probate_thresholds", {}))
+    hmcts_threshold = thresholds.pop("hmcts", PROBATE_THRESHOLD)
+
+    reasons = []
+    if valuation["gross_probate_estate"] > hmcts_threshold:
+        reasons.append(
+            f"Probate estate of {_gbp(valuation['gross_probate_estate'])} exceeds the "
+            f"HMCTS threshold of {_gbp(hmcts_threshold)}"
+        )
+
+    holdings: Dict[str, float] = {}
+    for asset in valuation["assets"]:
+        if asset["in_probate_estate"] and asset["institution"]:
+            key = _slug(asset["institution"])
+            holdings[key] = holdings.get(key, 0) + asset["value_at_death"]
+    institutions = {}
+    for key, threshold in thresholds.items():
+        holding = holdings.get(key, 0)
+        institutions[key] = {"holding": holding, "threshold": threshold, "exceeded": holding > threshold}
+        if holding > threshold:
+            reasons.append(
+                f"{key.replace('_', ' ').title()} holds {_gbp(holding)} in the sole name, "
+                f"above its {_gbp(threshold)} limit"
+            )
+
+    for asset in valuation["assets"]:
+        if asset["category"] == "real_estate" and asset["in_probate_estate"]:
+            reasons.append(f"Property in the sole name ({asset['description']}) can only be sold or transferred with a grant")
+
+    return {"required": bool(reasons), "reasons": reasons, "institutions": institutions}
+
+
+def assess_iht(user_data: dict, valuation: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Calculates Inheritance Tax for the estate in ``user_data``.
+
+    Everything left to the spouse is exempt: the whole estate when the will
+    leaves everything to them, otherwise joint assets passing to them by
+    survivorship. The residence nil-rate band is only given when
+    ``will_summary.residence_to_direct_descendants`` is set and a property
+    is flagged ``is_main_residence``.
+
+    Returns:
+        dict: the ``calculate_iht`` result plus the residence used and
+            "notes" on any relief that could not be applied
+    """
+    valuation = valuation or value_estate(user_data)
+    details = user_data.get("tax_and_will_details", {})
+    bands = details.get("iht_thresholds", {})
+    will = details.get("will_summary", {})
+
+    if will.get("leaves_everything_to_spouse"):
+        exempt = valuation["net_estate"]
+    else:
+        exempt = min(
+            valuation["net_estate"],
+            sum(asset["iht_value"] for asset in valuation["assets"] if asset["passes_to_spouse"]),
+        )
+
+    # Only a property flagged as the home qualifies; its mortgage comes off its value
+    residence = next(
+        (
+            asset
+            for asset in valuation["assets"]
+            if asset["category"] == "real_estate" and asset["is_main_residence"]
+        ),
+        None,
+    )
+    notes = []
+    residence_to_descendants = bool(will.get("residence_to_direct_descendants"))
+    if residence_to_descendants and residence is None:
+        notes.append(
+            "The home passes to direct descendants, but no property is flagged as the main "
+            "residence, so the residence nil-rate band has not been applied"
+        )
+    residence_value = 0.0
+    if residence:
+        mortgage = sum(
+            m.get("outstanding_balance", 0)
+            for m in user_data.get("liabilities", {}).get("mortgages", [])
+            if m.get("property_id") == residence["id"]
+        )
+        residence_value = max(0.0, residence["iht_value"] - mortgage)
+
+    result = calculate_iht(
+        valuation["net_estate"],
+        exempt=exempt,
+        residence_value=residence_value,
+        residence_to_descendants=residence_to_descendants,
+        nil_rate_band=bands.get("nil_rate_band", NIL_RATE_BAND),
+        residence_nil_rate_band=bands.get("residence_nil_rate_band", RESIDENCE_NIL_RATE_BAND),
+        rate_percent=bands.get("iht_rate_percent", IHT_RATE_PERCENT),
+        transferred_nrb_percent=details.get("transferred_nil_rate_band_percent", 0),
+        transferred_rnrb_percent=details.get("transferred_residence_nil_rate_band_percent", 0),
+    )
+    result["residence"] = residence["description"] if residence else None
+    result["residence_value"] = residence_value
+    result["notes"] = notes
+    return result
+
+
+def assess_cgt(user_data: dict) -> Dict[str, Any]:
+    """Calculates Capital Gains Tax on assets the executor sold after the death.
+
+    The gain is the sale price less costs of sale and the probate value;
+    losses offset gains, and the annual exempt amount comes off the total.
+
+    Returns:
+        dict: per-sale gains, the taxable gain and the tax due
+    """
+    details = user_data.get("tax_and_will_details", {})
+    rate_percent = details.get("cgt_tax_rate_percent", CGT_RATE_PERCENT)
+    exempt_amount = details.get("cgt_annual_exempt_amount", CGT_ANNUAL_EXEMPT_AMOUNT)
+
+    sales = []
+    for sale in user_data.get("post_death_transactions", {}).get("assets_sold", []):
+        gain = sale.get("sale_price", 0) - sale.get("costs_of_sale", 0) - sale.get("value_at_death", 0)
+        sales.append({**sale, "gain": gain})
+
+    total_gain = sum(sale["gain"] for sale in sales)
+    taxable_gain = max(0.0, total_gain - exempt_amount)
+    return {
+        "sales": sales,
+        "total_gain": total_gain,
+        "annual_exempt_amount": exempt_amount,
+        "taxable_gain": taxable_gain,
+        "cgt_rate_percent": rate_percent,
+        "cgt_due": round(taxable_gain * rate_percent / 100, 2),
+    }
+
+
+def prepare_estate_accounts(user_data: dict) -> Dict[str, Any]:
+    """Builds the estate accounts: what came in, what went out, and the residue.
+
+    Returns:
+        dict: {"receipts", "payments", "total_receipts", "total_payments",
+            "residue"}, where receipts and payments map a label to an amount
+    """
+    valuation = value_estate(user_data)
+    iht = assess_iht(user_data, valuation)
+    cgt = assess_cgt(user_data)
+    transactions = user_data.get("post_death_transactions", {})
+
+    receipts = {"Probate estate at date of death": valuation["gross_probate_estate"]}
+    if cgt["sales"]:
+        receipts["Gains on assets sold (net of costs)"] = cgt["total_gain"]
+    for source, amount in transactions.get("income_received_post_death", {}).items():
+        receipts[f"Income: {source.replace('_', ' ')}"] = amount
+
+    payments = {
+        f"Liability: {name.replace('_', ' ')}": amount
+        for name, amount in valuation["liabilities"].items()
+        if amount
+    }
+    for expense, amount in transactions.get("administration_expenses", {}).items():
+        payments[f"Administration: {expense.replace('_', ' ')}"] = amount
+    if iht["iht_due"]:
+        payments["Inheritance Tax"] = iht["iht_due"]
+    if cgt["cgt_due"]:
+        payments["Capital Gains Tax"] = cgt["cgt_due"]
+
+    total_receipts = sum(receipts.values())
+    total_payments = sum(payments.values())
+    return {
+        "receipts": receipts,
+        "payments": payments,
+        "total_receipts": total_receipts,
+        "total_payments": total_payments,
+        "residue": total_receipts - total_payments,
+    }
+
+
+# ===== Report builders (the ComputationAgent's output format) =====
+
+
+def _report(substep: dict, final_decision: str, sections: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "task_id": substep.get("id"),
+        "task_title": substep.get("title"),
+        "final_decision": final_decision,
+        "report_sections": sections,
+    }
+
+
+def _valuation_section(valuation: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "title": "Estate Valuation",
+        "type": "key_value",
+        "content": {
+            "Gross estate (IHT)": _gbp(valuation["gross_estate"]),
+            "Total liabilities": _gbp(valuation["total_liabilities"]),
+            "Net estate (IHT)": _gbp(valuation["net_estate"]),
+            "Gross probate estate": _gbp(valuation["gross_probate_estate"]),
+            "Net probate estate": _gbp(valuation["net_probate_estate"]),
+        },
+    }
+
+
+def probate_report(substep: dict, user_data: dict) -> Dict[str, Any]:
+    """Report for "calculate the estate value and assess probate need"."""
+    valuation = value_estate(user_data)
+    probate = assess_probate(user_data, valuation)
+    return _report(
+        substep,
+        "Probate IS Required" if probate["required"] else "Probate is NOT Required",
+        [
+            _valuation_section(valuation),
+            {
+                "title": "Assets",
+                "type": "list",
+                "content": [
+                    f"{asset['description']}: {_gbp(asset['value_at_death'])}"
+                    + ("" if asset["in_probate_estate"] else " (passes to surviving joint owner)")
+                    for asset in valuation["assets"]
+                ],
+            },
+            {
+                "title": "Institution Thresholds",
+                "type": "key_value",
+                "content": {
+                    key.replace("_", " ").title(): f"{_gbp(item['holding'])} held, limit {_gbp(item['threshold'])}"
+                    for key, item in probate["institutions"].items()
+                },
+            },
+            {
+                "title": "Reasons",
+                "type": "list",
+                "content": probate["reasons"] or ["No threshold is exceeded"],
+            },
+        ],
+    )
+
+
+def iht_report(substep: dict, user_data: dict) -> Dict[str, Any]:
+    """Report for "calculate Inheritance Tax"."""
+    valuation = value_estate(user_data)
+    iht = assess_iht(user_data, valuation)
+    return _report(
+        substep,
+        f"Total IHT Due: {_gbp(iht['iht_due'])}",
+        [
+            _valuation_section(valuation),
+            {
+                "title": "Calculation Details",
+                "type": "key_value",
+                "content": {
+                    "Net estate": _gbp(iht["net_estate"]),
+                    "Spouse exemption": _gbp(iht["exempt"]),
+                    "Chargeable estate": _gbp(iht["chargeable_estate"]),
+                    "Residence nil-rate band": _gbp(iht["residence_nil_rate_band"]),
+                    "Residence nil-rate band taper": _gbp(iht["residence_nil_rate_band_taper"]),
+                    "Nil-rate band": _gbp(iht["nil_rate_band"]),
+                    "Taxable estate": _gbp(iht["taxable_estate"]),
+                    "IHT rate": f"{iht['iht_rate_percent']}%",
+                    "IHT due": _gbp(iht["iht_due"]),
+                },
+            },
+            {
+                "title": "Transferable to Surviving Spouse",
+                "type": "key_value",
+                "content": {
+                    "Unused nil-rate band": f"{iht['unused_nil_rate_band_percent']}%",
+                    "Unused residence nil-rate band": f"{iht['unused_residence_nil_rate_band_percent']}%",
+                },
+            },
+            *(
+                [{"title": "Notes", "type": "list", "content": iht["notes"]}]
+                if iht["notes"]
+                else []
+            ),
+        ],
+    )
+
+
+def cgt_report(substep: dict, user_data: dict) -> Dict[str, Any]:
+    """Report for "address Capital Gains Tax on assets sold"."""
+    cgt = assess_cgt(user_data)
+    return _report(
+        substep,
+        f"Total CGT Due: {_gbp(cgt['cgt_due'])}",
+        [
+            {
+                "title": "Disposals",
+                "type": "list",
+                "content": [
+                    f"{sale.get('description', sale.get('asset_id'))}: sold for {_gbp(sale.get('sale_price', 0))}, "
+                    f"costs {_gbp(sale.get('costs_of_sale', 0))}, probate value {_gbp(sale.get('value_at_death', 0))}, "
+                    f"gain {_gbp(sale['gain'])}"
+                    for sale in cgt["sales"]
+                ] or ["No assets were sold after the death"],
+            },
+            {
+                "title": "Calculation Details",
+                "type": "key_value",
+                "content": {
+                    "Total gain": _gbp(cgt["total_gain"]),
+                    "Annual exempt amount": _gbp(cgt["annual_exempt_amount"]),
+                    "Taxable gain": _gbp(cgt["taxable_gain"]),
+                    "CGT rate": f"{cgt['cgt_rate_percent']}%",
+                    "CGT due": _gbp(cgt["cgt_due"]),
+                },
+            },
+        ],
+    )
+
+
+def accounts_report(substep: dict, user_data: dict) -> Dict[str, Any]:
+    """Report for "prepare the estate accounts"."""
+    accounts = prepare_estate_accounts(user_data)
+    return _report(
+        substep,
+        f"Residuary Estate for Distribution: {_gbp(accounts['residue'])}",
+        [
+            {
+                "title": "Receipts",
+                "type": "key_value",
+                "content": {label: _gbp(amount) for label, amount in accounts["receipts"].items()},
+            },
+            {
+                "title": "Payments",
+                "type": "key_value",
+                "content": {label: _gbp(amount) for label, amount in accounts["payments"].items()},
+            },
+            {
+                "title": "Totals",
+                "type": "key_value",
+                "content": {
+                    "Total receipts": _gbp(accounts["total_receipts"]),
+                    "Total payments": _gbp(accounts["total_payments"]),
+                    "Residue": _gbp(accounts["residue"]),
+                },
+            },
+        ],
+    )
+
+
+# Checked in order against a substep's title and description; the first match answers it
+REPORTS: List[Tuple[Tuple[str, ...], Callable[[dict, dict], Dict[str, Any]]]] = [
+    (("capital gains", "cgt"), cgt_report),
+    (("estate accounts", "estate account"), accounts_report),
+    (("inheritance tax", "iht"), iht_report),
+    (("probate", "estate value"), probate_report),
+]
+
+
+def calculate_substep(substep: dict, user_data: dict) -> Optional[Dict[str, Any]]:
+    """Answers a ComputationAgent substep without a model call, if it can.
+
+    Args:
+        substep (dict): the substep definition from the checklist
+        user_data (dict): a financial inventory shaped like
+            ``generate_random_financial_data()``
+
+    Returns:
+        dict: the report in the ComputationAgent format, or None when the
+            substep is not a calculation this module knows or ``user_data``
+            is not a financial inventory
+    """
+    if not isinstance(user_data.get("assets"), dict):
+        return None
+    text = f"{substep.get('title', '')} {substep.get('description', '')}".lower()
+    for keywords, report in REPORTS:
+        if any(re.search(rf"\b{re.escape(keyword)}\b", text) for keyword in keywords):
+            return report(substep, user_data)
+    return None
@@ -0,0 +1,111 @@
+"""
+Bounded thread-pool execution layer for blocking agent calls.
+
+The LLM-backed helpers (draft_emails, get_post_death_checklist,
+compute_figures, find_funeral) are synchronous and take seconds to run.
+Calling them directly from an ``async def`` handler blocks the event loop,
+so every other request on the worker waits. AgentExecutor runs them on a
+dedicated pool and refuses new work once the queue is full instead of
+letting latency grow without bound.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+AGENT_EXECUTOR_WORKERS = int(os.environ.get("AGENT_EXECUTOR_WORKERS", "8"))
+AGENT_EXECUTOR_QUEUE = int(os.environ.get("AGENT_EXECUTOR_QUEUE", "16"))
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when the executor already holds its maximum amount of work."""
+
+
+class AgentExecutor:
+    """Runs blocking callables on a bounded thread pool.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more
+    wait for a free worker. Anything beyond that is rejected immediately with
+    ExecutorSaturated so callers can shed load.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = AGENT_EXECUTOR_WORKERS,
+        max_queue: int = AGENT_EXECUTOR_QUEUE,
+        name: str = "agent",
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.name = name
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=name
+        )
+        # Only touched from the event loop thread, so no lock is needed.
+        self._in_flight = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs ``func(*args, **kwargs)`` on the pool and awaits its result.
+
+        Raises:
+            ExecutorSaturated: if ``capacity`` calls are already in flight
+        """
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise ExecutorSaturated(
+                f"{self.name} executor is saturated ({self._in_flight} tasks in flight)"
+            )
+
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(functools.partial(func, *args, **kwargs))
+        self._in_flight += 1
+        # A cancelled caller does not stop a call that is already running, so
+        # the slot is only freed once the pool's future itself is done.
+        future.add_done_callback(
+            lambda done: self._call_on_loop(loop, self._finished, done)
+        )
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _call_on_loop(loop: asyncio.AbstractEventLoop, callback: Callable[..., Any], *args: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The loop is already closed (shutdown); nobody reads the counters any more
+            pass
+
+    def _finished(self, future: Future) -> None:
+        self._in_flight -= 1
+        if future.cancelled():
+            self._cancelled += 1
+        elif future.exception() is not None:
+            self._failed += 1
+        else:
+            self._completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns current load figures for health checks."""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "running": min(self._in_flight, self.max_workers),
+            "queued": max(0, self._in_flight - self.max_workers),
+            "completed": self._completed,
+            "failed": self._failed,
+            "cancelled": self._cancelled,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self) -> None:
+        """Stops accepting work and cancels anything still queued."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,224 @@
+"""
+Record/replay of the HTTP traffic behind the agents' browser contexts.
+
+Each response is persisted as a HAR entry (one JSON file per request,
+keyed by a hash of method, URL and body) and served back through
+Playwright route interception, so repeated registrar lookups skip the
+network and browser runs can be benchmarked offline. Modes:
+
+- ``off``: no interception
+- ``record``: always fetch from the network and store the response
+- ``replay``: serve stored responses; fetch and re-store on a miss or
+  once an entry is older than the TTL
+- ``offline``: serve stored responses regardless of age and abort
+  anything that was never recorded
+
+Only 2xx and 3xx responses are stored. Redirects are not followed when
+fetching, so a 3xx is stored under its own URL and the browser follows
+it as it would live.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from playwright.async_api import Route
+
+BROWSER_REPLAY_MODE = os.environ.get("BROWSER_REPLAY_MODE", "off")
+BROWSER_REPLAY_DIR = Path(
+    os.environ.get("BROWSER_REPLAY_DIR", Path(__file__).with_name("browser_replay"))
+)
+BROWSER_REPLAY_TTL_S = int(os.environ.get("BROWSER_REPLAY_TTL_S", str(7 * 24 * 60 * 60)))
+REPLAY_MODES = ("off", "record", "replay", "offline")
+
+# The fetched body is already decoded, so these would no longer describe it
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _decoded_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    return {name: value for name, value in headers.items() if name.lower() not in _DROPPED_HEADERS}
+
+
+class HttpReplay:
+    """HAR-style response store plus the route handler that records and replays it."""
+
+    def __init__(
+        self,
+        mode: str = BROWSER_REPLAY_MODE,
+        path: Path = BROWSER_REPLAY_DIR,
+        ttl_s: int = BROWSER_REPLAY_TTL_S,
+    ) -> None:
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unknown replay mode {mode!r}; use one of {', '.join(REPLAY_MODES)}")
+        self.mode = mode
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._stats = {
+            "replayed": 0,
+            "recorded": 0,
+            "refreshed": 0,
+            "missed": 0,
+            "failed": 0,
+            "not_stored": 0,
+            "bytes_replayed": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @staticmethod
+    def make_key(method: str, url: str, post_data: Optional[str] = None) -> str:
+        """Returns the store key for one request."""
+        material = json.dumps([method.upper(), url, post_data or ""])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored HAR entry for ``key``, or None."""
+        try:
+            return json.loads(self._file(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(
+        self,
+        key: str,
+        method: str,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+        elapsed_s: float,
+    ) -> Dict[str, Any]:
+        """Stores one response as a HAR entry and returns it."""
+        content_type = headers.get("content-type", "")
+        entry = {
+            "startedDateTime": datetime.now(timezone.utc).isoformat(),
+            "recorded_at": time.time(),
+            "time": round(elapsed_s * 1000, 1),
+            "request": {"method": method, "url": url},
+            "response": {
+                "status": status,
+                "headers": [
+                    {"name": name, "value": value} for name, value in _decoded_headers(headers).items()
+                ],
+                "content": {
+                    "size": len(body),
+                    "mimeType": content_type,
+                    "encoding": "base64",
+                    "text": base64.b64encode(body).decode("ascii"),
+                },
+            },
+        }
+        file = self._file(key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a concurrent reader never sees half an entry
+        partial = file.with_suffix(f".{threading.get_ident()}.tmp")
+        partial.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(partial, file)
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("recorded_at", 0) < self.ttl_s
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    async def _fulfill(self, route: Route, entry: Dict[str, Any]) -> None:
+        response = entry["response"]
+        body = base64.b64decode(response["content"]["text"])
+        self._count("replayed")
+        self._count("bytes_replayed", len(body))
+        await route.fulfill(
+            status=response["status"],
+            headers={header["name"]: header["value"] for header in response["headers"]},
+            body=body,
+        )
+
+    async def handle(self, route: Route) -> None:
+        """Playwright route handler: replays, records or refreshes one request."""
+        request = route.request
+        key = self.make_key(request.method, request.url, request.post_data)
+
+        entry = None
+        if self.mode in ("replay", "offline"):
+            entry = await asyncio.to_thread(self.get, key)
+        if entry is not None and (self.mode == "offline" or self.is_fresh(entry)):
+            await self._fulfill(route, entry)
+            return
+        if self.mode == "offline":
+            self._count("missed")
+            await route.abort("internetdisconnected")
+            return
+
+        started = time.perf_counter()
+        try:
+            response = await route.fetch(max_redirects=0)
+            body = await response.body()
+        except Exception:
+            # A stale copy beats no page when the refresh fails
+            if entry is not None:
+                await self._fulfill(route, entry)
+            else:
+                self._count("failed")
+                await route.abort("failed")
+            return
+        headers = _decoded_headers(response.headers)
+        if not 200 <= response.status < 400:
+            # Errors and rate limits are passed through but never replayed
+            self._count("not_stored")
+            await route.fulfill(status=response.status, headers=headers, body=body)
+            return
+        await asyncio.to_thread(
+            self.put,
+            key,
+            request.method,
+            request.url,
+            response.status,
+            response.headers,
+            body,
+            time.perf_counter() - started,
+        )
+        self._count("refreshed" if entry is not None else "recorded")
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+    def export_har(self, path: Path) -> int:
+        """Writes every stored entry into a single .har file and returns the entry count."""
+        entries = []
+        for file in sorted(self.path.glob("*/*.json")):
+            try:
+                entry = json.loads(file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            entry.pop("recorded_at", None)
+            entries.append(entry)
+        entries.sort(key=lambda entry: entry["startedDateTime"])
+        har = {
+            "log": {
+                "version": "1.2",
+                "creator": {"name": "Afterversed", "version": "1.0"},
+                "entries": entries,
+            }
+        }
+        Path(path).write_text(json.dumps(har, indent=2), encoding="utf-8")
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns replay counters and how many entries are on disk."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mode"] = self.mode
+        stats["ttl_s"] = self.ttl_s
+        stats["entries"] = sum(1 for _ in self.path.glob("*/*.json")) if self.path.exists() else 0
+        return stats
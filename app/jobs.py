@@ -0,0 +1,123 @@
+"""
+Background job workers for long-running agent endpoints.
+
+A POST enqueues a row in the ``jobs`` table and returns immediately; a
+fixed number of worker coroutines claim queued rows, run the registered
+handler for the job's kind and store the result. Because job state lives
+in SQLite, jobs that were queued or running when the process stopped are
+picked up again on the next start.
+"""
+import asyncio
+import os
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from database import claim_next_job, create_job, finish_job, requeue_interrupted_jobs
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL_S = float(os.environ.get("JOB_POLL_INTERVAL_S", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+# Longest a worker waits before retrying after the queue itself errors (e.g. "database is locked")
+JOB_ERROR_BACKOFF_MAX_S = float(os.environ.get("JOB_ERROR_BACKOFF_MAX_S", "30"))
+
+JobHandler = Callable[[int, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobWorkerPool:
+    """Runs queued jobs with a fixed number of worker coroutines.
+
+    Args:
+        handlers: maps a job kind to ``handler(session_id, payload) -> result``
+        workers: how many jobs may run at once
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        workers: int = JOB_WORKERS,
+        poll_interval_s: float = JOB_POLL_INTERVAL_S,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> None:
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.poll_interval_s = poll_interval_s
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        """Requeue interrupted jobs and spawn the workers."""
+        requeued, failed = await requeue_interrupted_jobs(self.max_attempts)
+        if requeued:
+            print(f"Requeued {requeued} interrupted job(s)")
+        if failed:
+            print(f"❌ Failed {failed} interrupted job(s) that reached {self.max_attempts} attempts")
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers. Jobs they were running are requeued on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, session_id: int, kind: str, payload: Dict[str, Any]) -> str:
+        """Queue a job and wake an idle worker. Returns the job id."""
+        if kind not in self.handlers:
+            raise KeyError(f"Unknown job kind: {kind}")
+        job_id = await create_job(session_id, kind, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _worker(self, n: int) -> None:
+        errors = 0
+        while True:
+            try:
+                job = await claim_next_job()
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_s)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive; a job left running is requeued on the next start
+                errors += 1
+                backoff = min(self.poll_interval_s * 2 ** errors, JOB_ERROR_BACKOFF_MAX_S)
+                print(f"⚠️ Job worker {n} error ({e}); retrying in {backoff:.1f}s")
+                traceback.print_exc()
+                await asyncio.sleep(backoff)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await finish_job(job["job_id"], "failed", error=f"Unknown job kind: {job['kind']}")
+            return
+
+        try:
+            result = await handler(job["session_id"], job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            # Saturated executors are transient; put the job back and retry later
+            if getattr(e, "status_code", None) == 429 and job["attempts"] < self.max_attempts:
+                await finish_job(job["job_id"], "queued", error=error)
+                await asyncio.sleep(self.poll_interval_s)
+                return
+            print(f"❌ Job {job['job_id']} ({job['kind']}) failed: {error}")
+            traceback.print_exc()
+            await finish_job(job["job_id"], "failed", error=str(error))
+            return
+
+        await finish_job(job["job_id"], "succeeded", result=result)
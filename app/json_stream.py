@@ -0,0 +1,100 @@
+"""
+Incremental JSON parsing for streamed model output.
+
+A model streaming a large JSON document (e.g. the post-death checklist)
+emits it a few tokens at a time. IncrementalJSONParser scans each chunk as
+it arrives, tracking string and nesting state, and hands back every
+top-level member of the root object as soon as its closing bracket is
+seen, so callers can act on the first parts long before the document is
+complete.
+"""
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """Pulls completed values out of a JSON object while it is still arriving.
+
+    ``feed`` returns (key, value) for each object or array member of the
+    root object once it closes. For keys in ``item_keys`` the array is
+    reported item by item instead, one (key, item) per element as each
+    element closes. Anything before the root ``{`` (such as a ```json
+    fence) and after its closing ``}`` is ignored.
+    """
+
+    def __init__(self, item_keys: Iterable[str] = ()) -> None:
+        self.item_keys = set(item_keys)
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""
+        self._key: Optional[str] = None
+        self._value_start = 0
+        self._item_start: Optional[int] = None
+        self.complete = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+    def _decode(self, start: int, end: int) -> Any:
+        try:
+            return json.loads(self._buffer[start:end])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in streamed member '{self._key}': {e}") from e
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Adds a chunk of text and returns the members it completed.
+
+        Raises:
+            ValueError: if a completed member is not valid JSON
+        """
+        self._buffer += chunk
+        buffer = self._buffer
+        completed = []
+        pos = self._pos
+        while pos < len(buffer) and not self.complete:
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = buffer[self._string_start : pos + 1]
+            elif not self._started:
+                if char == "{":
+                    self._started = True
+                    self._stack.append(char)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":" and len(self._stack) == 1:
+                self._key = json.loads(self._last_string)
+            elif char in "{[":
+                self._stack.append(char)
+                depth = len(self._stack)
+                if depth == 2:
+                    self._value_start = pos
+                elif depth == 3 and self._key in self.item_keys and self._stack[1] == "[":
+                    self._item_start = pos
+            elif char in "}]":
+                self._stack.pop()
+                depth = len(self._stack)
+                if depth == 0:
+                    self.complete = True
+                elif depth == 1 and self._key not in self.item_keys:
+                    completed.append((self._key, self._decode(self._value_start, pos + 1)))
+                elif depth == 2 and self._item_start is not None:
+                    completed.append((self._key, self._decode(self._item_start, pos + 1)))
+                    self._item_start = None
+            pos += 1
+        self._pos = pos
+        return completed
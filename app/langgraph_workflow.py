@@ -4,29 +4,158 @@ Agent-to-agent communication system using state graph
 """
 import os
 import json
-from typing import TypedDict, Annotated, Sequence, Dict, Any, List
-from datetime import datetime
+import time
+import uuid
+import inspect
+from contextlib import nullcontext
+from typing import TypedDict, Annotated, Sequence, Dict, Any, List, Optional, AsyncIterator
+from datetime import datetime, timedelta, timezone
 import operator
 
 try:
-    from langgraph.graph import StateGraph, END
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.types import RetryPolicy, Send
     from langchain_google_genai import ChatGoogleGenerativeAI
     from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+    from langchain_core.runnables import RunnableConfig
+    from checkpointer import SQLiteCheckpointSaver
 except ImportError:
     print("Warning: LangGraph dependencies not installed. Run: pip install langgraph langchain-google-genai langchain-core")
     # Fallback to None
     StateGraph = None
+    START = None
     END = None
+    Send = None
+    RetryPolicy = None
     ChatGoogleGenerativeAI = None
     BaseMessage = None
     HumanMessage = None
     AIMessage = None
     SystemMessage = None
+    RunnableConfig = Dict[str, Any]
+    SQLiteCheckpointSaver = None
 
 from dotenv import load_dotenv
 
+from database import prune_workflow_checkpoints, save_workflow_metrics
+from estate_tax import NIL_RATE_BAND, PROBATE_THRESHOLD, calculate_iht
+from llm_cache import cached_ainvoke, recording_llm_calls, refreshing_cache
+
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+DRAFTING_MAX_CONCURRENCY = int(os.getenv("DRAFTING_MAX_CONCURRENCY", "4"))
+# Attempts per LLM-backed node before the run fails (and can be resumed)
+WORKFLOW_NODE_MAX_ATTEMPTS = int(os.getenv("WORKFLOW_NODE_MAX_ATTEMPTS", "3"))
+# Checkpoints of runs untouched for this long are deleted; they can no longer be resumed or re-run
+WORKFLOW_CHECKPOINT_TTL_S = int(os.getenv("WORKFLOW_CHECKPOINT_TTL_S", str(7 * 24 * 3600)))
+
+
+def parse_json_response(response_text: str) -> Any:
+    """Decodes a JSON model response, tolerating a ```json fence."""
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return json.loads(response_text.strip())
+
+
+# State keys that are inputs or bookkeeping rather than agent output; left out of stream events
+_STREAM_SKIPPED_KEYS = {
+    "messages", "session_id", "workflow_id", "survey_data", "estate_data",
+    "current_step", "completed_steps", "final_report", "node_timings"
+}
+
+
+def merge_outputs(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reducer for agent outputs written by parallel branches.
+    List values are concatenated (e.g. one bank letter per branch); anything else is overwritten.
+    """
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        if isinstance(value, list) and isinstance(merged.get(key), list):
+            merged[key] = merged[key] + value
+        else:
+            merged[key] = value
+    return merged
+
+
+def last_value(left: Any, right: Any) -> Any:
+    """Reducer that keeps the most recent write when parallel branches update the same key"""
+    return right
+
+
+def workflow_config(session_id: int, workflow_id: str) -> Dict[str, Any]:
+    """Checkpointer config for one workflow run; runs are keyed by session and workflow id"""
+    return {"configurable": {"thread_id": f"{session_id}:{workflow_id}"}}
+
+
+_METRIC_TOTALS = ("llm_calls", "cache_hits", "input_tokens", "output_tokens")
+
+
+def summarize_node_timings(node_timings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Summarize per-node timings into the critical path actually taken.
+
+    Nodes in the same superstep run concurrently, so the critical path is the sum
+    of each superstep's slowest node; "serial_s" is what the same work would take
+    as a linear chain. Each node's "queue_s" is how long it waited for a
+    concurrency slot after the first node of its superstep started.
+    """
+    slowest_per_step: Dict[Any, float] = {}
+    first_start_per_step: Dict[Any, float] = {}
+    branches: Dict[str, Dict[str, float]] = {}
+    for timing in node_timings:
+        step = timing["step"]
+        slowest_per_step[step] = max(slowest_per_step.get(step, 0.0), timing["elapsed_s"])
+        if "started_at" in timing:
+            first_start_per_step[step] = min(
+                first_start_per_step.get(step, timing["started_at"]), timing["started_at"]
+            )
+        # Fan-out copies of a node (e.g. one per bank) overlap, so count the slowest
+        branch_nodes = branches.setdefault(timing["branch"], {})
+        branch_nodes[timing["node"]] = max(branch_nodes.get(timing["node"], 0.0), timing["elapsed_s"])
+    
+    nodes = [
+        {
+            **timing,
+            "queue_s": round(timing["started_at"] - first_start_per_step[timing["step"]], 3)
+        } if "started_at" in timing else timing
+        for timing in node_timings
+    ]
+    return {
+        "critical_path_s": round(sum(slowest_per_step.values()), 3),
+        "serial_s": round(sum(timing["elapsed_s"] for timing in node_timings), 3),
+        "branches": {
+            branch: round(sum(branch_nodes.values()), 3)
+            for branch, branch_nodes in branches.items()
+        },
+        "totals": {
+            **{key: sum(timing.get(key, 0) for timing in node_timings) for key in _METRIC_TOTALS},
+            "retries": sum(max(timing.get("attempts", 1) - 1, 0) for timing in node_timings)
+        },
+        "nodes": nodes
+    }
+
+
+def agent_metrics(node_timings: List[Dict[str, Any]], nodes: Sequence[str]) -> Dict[str, Any]:
+    """
+    Measured cost of one agent's nodes: wall time from the first start to the
+    last finish (parallel copies overlap), plus LLM usage and retries.
+    """
+    timings = [timing for timing in node_timings if timing["node"] in nodes and "started_at" in timing]
+    if not timings:
+        return {"duration_s": 0.0, **{key: 0 for key in _METRIC_TOTALS}, "retries": 0}
+    return {
+        "duration_s": round(
+            max(timing["started_at"] + timing["elapsed_s"] for timing in timings)
+            - min(timing["started_at"] for timing in timings),
+            3
+        ),
+        **{key: sum(timing.get(key, 0) for timing in timings) for key in _METRIC_TOTALS},
+        "retries": sum(max(timing.get("attempts", 1) - 1, 0) for timing in timings)
+    }
 
 
 # Define the state that flows between agents
@@ -34,40 +163,78 @@ class AgentState(TypedDict):
     """State that gets passed between agents in the workflow"""
     messages: Annotated[Sequence[BaseMessage], operator.add]
     session_id: int
+    workflow_id: str
     survey_data: Dict[str, Any]
     estate_data: Dict[str, Any]
     
-    # Agent outputs
+    # Agent outputs (drafting and submission are written by several branches)
+    estate_assessment: Dict[str, Any]
     search_results: Dict[str, Any]
-    drafted_documents: Dict[str, Any]
-    submission_results: Dict[str, Any]
+    drafted_documents: Annotated[Dict[str, Any], merge_outputs]
+    submission_results: Annotated[Dict[str, Any], merge_outputs]
     validation_results: Dict[str, Any]
     final_report: Dict[str, Any]
     
     # Workflow metadata
-    current_step: str
-    completed_steps: List[str]
-    errors: List[str]
+    current_step: Annotated[str, last_value]
+    completed_steps: Annotated[List[str], operator.add]
+    errors: Annotated[List[str], operator.add]
+    node_timings: Annotated[List[Dict[str, Any]], operator.add]
+
+
+class BankTaskState(TypedDict):
+    """Input for a single bank branch, sent by the search node's fan-out"""
+    bank: Dict[str, Any]
+    session_id: int
+    survey_data: Dict[str, Any]
+
+
+def _new_llm() -> Any:
+    if ChatGoogleGenerativeAI is None:
+        raise ImportError("LangGraph dependencies not installed")
+    
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-exp",
+        google_api_key=GEMINI_API_KEY,
+        temperature=0.3
+    )
+
+
+_shared_llm = None
+
+
+def get_shared_llm() -> Any:
+    """Process-wide chat model, so every run reuses one client and its open connections"""
+    global _shared_llm
+    if _shared_llm is None:
+        _shared_llm = _new_llm()
+    return _shared_llm
 
 
 class LangGraphWorkflow:
     """
     Multi-agent workflow orchestrator using LangGraph
+    
+    Holds no per-run state (runs are keyed by the checkpointer config), so one
+    instance and its compiled graph serve every request.
     """
     
-    def __init__(self):
-        if ChatGoogleGenerativeAI is None:
-            raise ImportError("LangGraph dependencies not installed")
-            
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            google_api_key=GEMINI_API_KEY,
-            temperature=0.3
-        )
+    def __init__(self, llm: Any = None):
+        self.llm = llm or get_shared_llm()
+        self._app = None
+        # Attempts so far per in-flight task, so node retries show up in its metrics
+        self._attempts: Dict[str, Dict[str, Any]] = {}
+    
+    @property
+    def app(self) -> Any:
+        """The compiled graph, built on first use"""
+        if self._app is None:
+            self._app = self.create_workflow()
+        return self._app
     
     # ===== AGENT NODES =====
     
-    def search_agent_node(self, state: AgentState) -> AgentState:
+    async def search_agent_node(self, state: AgentState) -> Dict[str, Any]:
         """
         SearchAgent: Find banks and government offices
         """
@@ -112,18 +279,9 @@ Use real UK institutions. Be specific with addresses and contact details.
             HumanMessage(content=prompt)
         ]
         
-        response = self.llm.invoke(messages)
-        
         # Parse the JSON response
         try:
-            response_text = response.content.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            
-            search_results = json.loads(response_text)
+            search_results = await cached_ainvoke(self.llm, messages, parse=parse_json_response)
         except json.JSONDecodeError:
             # Fallback to structured data
             search_results = {
@@ -147,71 +305,142 @@ Use real UK institutions. Be specific with addresses and contact details.
         print(f"   ✓ Found {len(search_results.get('government_offices', []))} government offices")
         
         return {
-            **state,
             "search_results": search_results,
             "current_step": "search",
-            "completed_steps": state["completed_steps"] + ["search"],
-            "messages": state["messages"] + [
+            "completed_steps": ["search"],
+            "messages": [
                 AIMessage(content=f"SearchAgent completed: Found institutions in {location}")
             ]
         }
     
-    def drafting_agent_node(self, state: AgentState) -> AgentState:
+    def route_banks(self, state: AgentState) -> List[Any]:
         """
-        DraftingAgent: Generate formal letters and forms
+        Fan out one bank branch per institution found, so each letter is drafted
+        and submitted without waiting for the others
         """
-        print("\n✍️ DraftingAgent: Generating documents...")
-        
-        search_results = state["search_results"]
+        if not state["search_results"].get("banks"):
+            return ["join_banks"]
+        return [
+            Send("notify_bank", {
+                "bank": bank,
+                "session_id": state["session_id"],
+                "survey_data": state["survey_data"]
+            })
+            for bank in state["search_results"].get("banks", [])
+        ]
+    
+    def join_banks_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Fan-in point for the bank branches; runs once after all of them finish
+        """
+        return {}
+    
+    async def bank_agent_node(self, state: BankTaskState) -> Dict[str, Any]:
+        """
+        DraftingAgent + FormAgent for a single bank: draft the death notification
+        letter, then submit it (simulated). Runs once per bank, in parallel.
+        """
+        bank = state["bank"]
         survey_data = state["survey_data"]
-        estate_data = state["estate_data"]
+        print(f"\n✍️ DraftingAgent: Drafting letter to {bank['name']}...")
         
-        deceased_name = survey_data.get("deceased_name", "the deceased")
-        date_of_death = survey_data.get("date_of_death", "recent")
-        relationship = survey_data.get("relationship", "family member")
-        executor_name = survey_data.get("executor_name", "the executor")
+        messages = self._bank_letter_messages(
+            bank,
+            survey_data.get("deceased_name", "the deceased"),
+            survey_data.get("date_of_death", "recent"),
+            survey_data.get("executor_name", "the executor"),
+            survey_data.get("relationship", "family member")
+        )
+        letter = {
+            "institution": bank["name"],
+            "address": bank["address"],
+            "letter_type": "death_notification",
+            "letter_content": await cached_ainvoke(self.llm, messages),
+            "generated_at": datetime.now().isoformat()
+        }
+        response = self._submit_bank_letter(letter, state["session_id"])
         
-        # Generate bank notification letters
-        bank_letters = []
-        for bank in search_results.get("banks", [])[:2]:  # Limit to 2 for speed
-            prompt = f"""
-You are a DraftingAgent specialized in UK legal correspondence.
-
-Draft a formal death notification letter to: {bank["name"]}
-
-Details:
-- Deceased: {deceased_name}
-- Date of death: {date_of_death}
-- Sender: {executor_name} ({relationship})
-- Bank address: {bank["address"]}
-
-The letter should:
-1. Notify of the death (include date)
-2. Request account freeze
-3. Request balance statement
-4. State that probate documentation will follow
-5. Include return address and contact details
-
-Format: Professional UK business letter with proper formatting.
-Return the complete letter text.
-"""
-            
-            messages = [
-                SystemMessage(content="You are a professional letter writer. Write formal UK business letters."),
-                HumanMessage(content=prompt)
+        print(f"   ✓ Notified {bank['name']}")
+        
+        return {
+            "drafted_documents": {"bank_letters": [letter]},
+            "submission_results": {"bank_responses": [response]},
+            "current_step": "bank_notification",
+            "completed_steps": [f"bank_notification:{bank['name']}"],
+            "messages": [
+                AIMessage(content=f"DraftingAgent/FormAgent completed: Letter drafted and submitted to {bank['name']}")
             ]
-            
-            response = self.llm.invoke(messages)
-            
-            bank_letters.append({
-                "institution": bank["name"],
-                "address": bank["address"],
-                "letter_type": "death_notification",
-                "letter_content": response.content,
-                "generated_at": datetime.now().isoformat()
+        }
+    
+    def assess_estate_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Cheap up-front estate assessment from the submitted figures (no LLM),
+        used to decide which guidance branches are worth running
+        """
+        print("\n⚖️ Assessing estate thresholds...")
+        
+        estate_data = state["estate_data"]
+        net_estate = (
+            estate_data.get("property_value", 0) +
+            estate_data.get("bank_balances", 0) +
+            estate_data.get("investments", 0) -
+            estate_data.get("debts", 0) -
+            estate_data.get("funeral_costs", 3500)
+        )
+        
+        pruned = []
+        iht_guidance_required = net_estate > NIL_RATE_BAND
+        if not iht_guidance_required:
+            pruned.append({
+                "node": "iht_guidance",
+                "reason": f"Estimated net estate £{net_estate:,.2f} is within the £{NIL_RATE_BAND:,} nil-rate band"
+            })
+        probate_guidance_required = net_estate > PROBATE_THRESHOLD
+        if not probate_guidance_required:
+            pruned.append({
+                "node": "probate_guidance",
+                "reason": f"Estimated net estate £{net_estate:,.2f} is below the £{PROBATE_THRESHOLD:,} probate threshold"
             })
         
-        # Generate IHT400 form guidance
+        for branch in pruned:
+            print(f"   ↷ Skipping {branch['node']}: {branch['reason']}")
+        
+        return {
+            "estate_assessment": {
+                "estimated_net_estate": net_estate,
+                "iht_guidance_required": iht_guidance_required,
+                "probate_guidance_required": probate_guidance_required,
+                "pruned_branches": pruned
+            },
+            "current_step": "assessment",
+            "completed_steps": ["assessment"]
+        }
+    
+    def route_after_assessment(self, state: AgentState) -> List[str]:
+        """
+        Always search; only draft the guidance the assessment says is relevant,
+        going straight to submission when none is
+        """
+        assessment = state["estate_assessment"]
+        routes = ["search"]
+        if assessment["iht_guidance_required"]:
+            routes.append("iht_guidance")
+        if assessment["probate_guidance_required"]:
+            routes.append("probate_guidance")
+        if len(routes) == 1:
+            routes.append("submit_government")
+        return routes
+    
+    async def iht_guidance_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        DraftingAgent: Generate IHT400 guidance
+        
+        Needs only the estate data, so it runs alongside the search branch.
+        """
+        print("\n✍️ DraftingAgent: Generating IHT400 guidance...")
+        
+        estate_data = state["estate_data"]
+        
         iht_prompt = f"""
 You are a DraftingAgent specialized in UK tax forms.
 
@@ -233,21 +462,43 @@ Provide:
 Format: Clear, structured guidance document.
 """
         
-        messages = [
+        iht_messages = [
             SystemMessage(content="You are a tax form specialist. Provide clear, accurate guidance."),
             HumanMessage(content=iht_prompt)
         ]
         
-        iht_response = self.llm.invoke(messages)
-        
         government_forms = [{
             "form_type": "IHT400",
             "purpose": "Inheritance Tax Declaration",
-            "content": iht_response.content,
+            "content": await cached_ainvoke(self.llm, iht_messages),
             "generated_at": datetime.now().isoformat()
         }]
         
-        # Generate probate application guidance
+        print(f"   ✓ Drafted {len(government_forms)} government forms")
+        
+        return {
+            "drafted_documents": {"government_forms": government_forms},
+            "current_step": "iht_guidance",
+            "completed_steps": ["iht_guidance"],
+            "messages": [
+                AIMessage(content="DraftingAgent completed: Generated IHT400 guidance")
+            ]
+        }
+    
+    async def probate_guidance_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        DraftingAgent: Generate PA1P probate application guidance
+        
+        Needs only the survey data, so it runs alongside the search branch.
+        """
+        print("\n✍️ DraftingAgent: Generating PA1P guidance...")
+        
+        survey_data = state["survey_data"]
+        
+        deceased_name = survey_data.get("deceased_name", "the deceased")
+        date_of_death = survey_data.get("date_of_death", "recent")
+        executor_name = survey_data.get("executor_name", "the executor")
+        
         probate_prompt = f"""
 You are a DraftingAgent specialized in UK probate applications.
 
@@ -268,69 +519,97 @@ Provide:
 Format: Clear, step-by-step guide.
 """
         
-        messages = [
+        probate_messages = [
             SystemMessage(content="You are a probate specialist. Guide users through the application process."),
             HumanMessage(content=probate_prompt)
         ]
         
-        probate_response = self.llm.invoke(messages)
-        
         probate_application = {
             "form_type": "PA1P",
             "purpose": "Grant of Probate Application",
-            "content": probate_response.content,
+            "content": await cached_ainvoke(self.llm, probate_messages),
             "generated_at": datetime.now().isoformat()
         }
         
-        drafted_documents = {
-            "bank_letters": bank_letters,
-            "government_forms": government_forms,
-            "probate_application": probate_application
-        }
-        
-        print(f"   ✓ Drafted {len(bank_letters)} bank letters")
-        print(f"   ✓ Drafted {len(government_forms)} government forms")
         print(f"   ✓ Drafted probate application")
         
         return {
-            **state,
-            "drafted_documents": drafted_documents,
-            "current_step": "drafting",
-            "completed_steps": state["completed_steps"] + ["drafting"],
-            "messages": state["messages"] + [
-                AIMessage(content=f"DraftingAgent completed: Generated {len(bank_letters)} letters and {len(government_forms) + 1} forms")
+            "drafted_documents": {"probate_application": probate_application},
+            "current_step": "probate_guidance",
+            "completed_steps": ["probate_guidance"],
+            "messages": [
+                AIMessage(content="DraftingAgent completed: Generated PA1P guidance")
             ]
         }
     
-    def form_agent_node(self, state: AgentState) -> AgentState:
+    def _bank_letter_messages(
+        self,
+        bank: Dict[str, Any],
+        deceased_name: str,
+        date_of_death: str,
+        executor_name: str,
+        relationship: str
+    ) -> List[Any]:
+        """Build the prompt for one bank's death notification letter"""
+        prompt = f"""
+You are a DraftingAgent specialized in UK legal correspondence.
+
+Draft a formal death notification letter to: {bank["name"]}
+
+Details:
+- Deceased: {deceased_name}
+- Date of death: {date_of_death}
+- Sender: {executor_name} ({relationship})
+- Bank address: {bank["address"]}
+
+The letter should:
+1. Notify of the death (include date)
+2. Request account freeze
+3. Request balance statement
+4. State that probate documentation will follow
+5. Include return address and contact details
+
+Format: Professional UK business letter with proper formatting.
+Return the complete letter text.
+"""
+        return [
+            SystemMessage(content="You are a professional letter writer. Write formal UK business letters."),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _submit_bank_letter(self, letter: Dict[str, Any], session_id: int) -> Dict[str, Any]:
+        """
+        FormAgent: Simulate submitting one bank letter and the bank's response
+        In production, this would integrate with actual APIs
+        """
+        return {
+            "institution": letter["institution"],
+            "response_date": datetime.now().isoformat(),
+            "status": "acknowledged",
+            "reference_number": f"EST-{session_id}-{datetime.now().strftime('%Y%m%d')}",
+            "account_frozen": True,
+            "balance_statement": {
+                "current_balance": 12500.00 + (hash(letter["institution"]) % 10000),  # Simulated
+                "pending_transactions": 0,
+                "last_transaction_date": "2025-10-15",
+                "account_type": "Current Account"
+            },
+            "next_steps": "Awaiting Grant of Probate to release funds",
+            "contact_person": "Estate Services Team",
+            "contact_email": f"estates@{letter['institution'].lower().replace(' ', '')}.co.uk"
+        }
+    
+    def government_submission_node(self, state: AgentState) -> Dict[str, Any]:
         """
-        FormAgent: Simulate form submission and generate responses
+        FormAgent: Simulate IHT400 and PA1P submission and generate responses
         In production, this would integrate with actual APIs
+        
+        Only forms whose guidance branch ran are submitted; pruned ones are not.
         """
-        print("\n📤 FormAgent: Submitting forms (simulated)...")
-        
-        drafted_documents = state["drafted_documents"]
-        
-        # Simulate bank responses
-        bank_responses = []
-        for letter in drafted_documents.get("bank_letters", []):
-            response = {
-                "institution": letter["institution"],
-                "response_date": datetime.now().isoformat(),
-                "status": "acknowledged",
-                "reference_number": f"EST-{state['session_id']}-{datetime.now().strftime('%Y%m%d')}",
-                "account_frozen": True,
-                "balance_statement": {
-                    "current_balance": 12500.00 + (hash(letter["institution"]) % 10000),  # Simulated
-                    "pending_transactions": 0,
-                    "last_transaction_date": "2025-10-15",
-                    "account_type": "Current Account"
-                },
-                "next_steps": "Awaiting Grant of Probate to release funds",
-                "contact_person": "Estate Services Team",
-                "contact_email": f"estates@{letter['institution'].lower().replace(' ', '')}.co.uk"
-            }
-            bank_responses.append(response)
+        print("\n📤 FormAgent: Submitting government forms (simulated)...")
+        
+        assessment = state["estate_assessment"]
+        drafted = state["drafted_documents"]
         
         # Simulate HMRC response
         total_estate = (
@@ -346,10 +625,10 @@ Format: Clear, step-by-step guide.
             "reference_number": f"IHT-{state['session_id']}-2025",
             "status": "received",
             "estate_value_declared": total_estate,
-            "estimated_iht": max(0, (total_estate - 325000) * 0.4) if total_estate > 325000 else 0,
-            "nil_rate_band": 325000,
+            "estimated_iht": max(0, (total_estate - NIL_RATE_BAND) * 0.4) if total_estate > NIL_RATE_BAND else 0,
+            "nil_rate_band": NIL_RATE_BAND,
             "payment_due_date": "2026-06-30",
-            "notes": "Under nil-rate band threshold - no IHT due" if total_estate <= 325000 else "IHT calculation pending verification"
+            "notes": "Under nil-rate band threshold - no IHT due" if total_estate <= NIL_RATE_BAND else "IHT calculation pending verification"
         }
         
         # Simulate Probate Registry response
@@ -370,31 +649,30 @@ Format: Clear, step-by-step guide.
             "contact_office": "Principal Registry of the Family Division"
         }
         
-        submission_results = {
-            "bank_responses": bank_responses,
-            "government_responses": [hmrc_response, probate_response],
-            "submission_summary": {
-                "total_submissions": len(bank_responses) + 2,
-                "successful": len(bank_responses) + 2,
-                "failed": 0,
-                "timestamp": datetime.now().isoformat()
-            }
-        }
+        government_responses = []
+        submitted = []
+        if assessment.get("iht_guidance_required") and drafted.get("government_forms"):
+            government_responses.append(hmrc_response)
+            submitted.append("IHT400 to HMRC")
+        if assessment.get("probate_guidance_required") and drafted.get("probate_application"):
+            government_responses.append(probate_response)
+            submitted.append("PA1P to the Probate Registry")
         
-        print(f"   ✓ Submitted {len(bank_responses)} bank notifications")
-        print(f"   ✓ Submitted 2 government forms")
+        print(f"   ✓ Submitted {len(government_responses)} government forms")
         
         return {
-            **state,
-            "submission_results": submission_results,
-            "current_step": "submission",
-            "completed_steps": state["completed_steps"] + ["submission"],
-            "messages": state["messages"] + [
-                AIMessage(content=f"FormAgent completed: Submitted forms to {len(bank_responses)} banks and 2 government offices")
+            "submission_results": {"government_responses": government_responses},
+            "current_step": "government_submission",
+            "completed_steps": ["government_submission"],
+            "messages": [
+                AIMessage(
+                    content=f"FormAgent completed: Submitted {' and '.join(submitted)}"
+                    if submitted else "FormAgent completed: No government forms needed"
+                )
             ]
         }
     
-    def compute_agent_node(self, state: AgentState) -> AgentState:
+    def compute_agent_node(self, state: AgentState) -> Dict[str, Any]:
         """
         ComputeAgent: Validate financial calculations and tax compliance
         """
@@ -406,7 +684,7 @@ Format: Clear, step-by-step guide.
         # Aggregate bank balances from responses
         total_bank_balance = sum(
             resp["balance_statement"]["current_balance"]
-            for resp in submission_results["bank_responses"]
+            for resp in submission_results.get("bank_responses", [])
         )
         
         # Calculate total estate
@@ -418,16 +696,15 @@ Format: Clear, step-by-step guide.
         gross_estate = property_value + total_bank_balance + investments
         net_estate = gross_estate - debts - funeral_costs
         
-        # IHT calculation
-        nil_rate_band = 325000
-        iht_threshold = 325000
-        
         # Check if probate required (threshold £5,000 in England & Wales)
-        probate_required = net_estate > 5000
+        probate_required = net_estate > PROBATE_THRESHOLD
         
-        # Calculate IHT
-        taxable_estate = max(0, net_estate - nil_rate_band)
-        iht_due = taxable_estate * 0.4
+        # Calculate IHT; the flat estate figures carry no spouse or residence
+        # details, so only the nil-rate band applies
+        iht = calculate_iht(net_estate)
+        nil_rate_band = iht["nil_rate_band"]
+        taxable_estate = iht["taxable_estate"]
+        iht_due = iht["iht_due"]
         
         # Get HMRC's calculation
         hmrc_response = next(
@@ -437,9 +714,9 @@ Format: Clear, step-by-step guide.
         
         hmrc_estimated_iht = hmrc_response.get("estimated_iht", 0)
         
-        # Validate calculations match
+        # Validate calculations match (nothing to compare when IHT400 was not submitted)
         discrepancies = []
-        if abs(iht_due - hmrc_estimated_iht) > 100:  # Allow £100 tolerance
+        if hmrc_response and abs(iht_due - hmrc_estimated_iht) > 100:  # Allow £100 tolerance
             discrepancies.append({
                 "type": "IHT calculation mismatch",
                 "our_calculation": iht_due,
@@ -462,12 +739,12 @@ Format: Clear, step-by-step guide.
                 "nil_rate_band": nil_rate_band,
                 "taxable_estate": taxable_estate,
                 "iht_due": iht_due,
-                "iht_rate": 0.4,
+                "iht_rate": iht["iht_rate_percent"] / 100,
                 "hmrc_match": len(discrepancies) == 0
             },
             "probate_assessment": {
                 "required": probate_required,
-                "threshold": 5000,
+                "threshold": PROBATE_THRESHOLD,
                 "reason": "Estate exceeds £5,000" if probate_required else "Estate below threshold"
             },
             "validation_status": {
@@ -482,17 +759,27 @@ Format: Clear, step-by-step guide.
         print(f"   ✓ Probate required: {probate_required}")
         print(f"   ✓ Validation: {'PASSED' if len(discrepancies) == 0 else 'DISCREPANCIES FOUND'}")
         
+        # Both submission branches have joined by now
+        submission_count = len(submission_results.get("bank_responses", [])) + len(submission_results["government_responses"])
+        
         return {
-            **state,
             "validation_results": validation_results,
+            "submission_results": {
+                "submission_summary": {
+                    "total_submissions": submission_count,
+                    "successful": submission_count,
+                    "failed": 0,
+                    "timestamp": datetime.now().isoformat()
+                }
+            },
             "current_step": "validation",
-            "completed_steps": state["completed_steps"] + ["validation"],
-            "messages": state["messages"] + [
+            "completed_steps": ["validation"],
+            "messages": [
                 AIMessage(content=f"ComputeAgent completed: Net estate £{net_estate:,.2f}, IHT £{iht_due:,.2f}, {'No discrepancies' if len(discrepancies) == 0 else f'{len(discrepancies)} discrepancies found'}")
             ]
         }
     
-    def report_generator_node(self, state: AgentState) -> AgentState:
+    def report_generator_node(self, state: AgentState) -> Dict[str, Any]:
         """
         Generate comprehensive final report
         """
@@ -500,16 +787,77 @@ Format: Clear, step-by-step guide.
         
         validation = state["validation_results"]
         submission = state["submission_results"]
+        drafted = state["drafted_documents"]
+        pruned = state["estate_assessment"].get("pruned_branches", [])
+        pruned_nodes = {branch["node"] for branch in pruned}
+        
+        drafting_outputs = [f"Drafted {len(drafted.get('bank_letters', []))} bank notification letters"]
+        if drafted.get("government_forms"):
+            drafting_outputs.append("Drafted IHT400 form guidance")
+        if drafted.get("probate_application"):
+            drafting_outputs.append("Drafted PA1P probate application guidance")
+        guidance_count = len(drafted.get("government_forms", [])) + (1 if drafted.get("probate_application") else 0)
+        
+        # Only forms that were actually submitted get references and deadlines
+        responses = {r["form_type"]: r for r in submission.get("government_responses", [])}
+        hmrc = responses.get("IHT400")
+        probate = responses.get("PA1P")
+        form_outputs = [f"Submitted to {len(submission.get('bank_responses', []))} banks"]
+        if hmrc:
+            form_outputs.append("Submitted IHT400 to HMRC")
+        if probate:
+            form_outputs.append("Submitted PA1P to Probate Registry")
+        if not responses:
+            form_outputs.append("No government forms submitted")
+        form_actions = []
+        key_deadlines = []
+        if hmrc:
+            form_actions.append(f"Track HMRC reference: {hmrc['reference_number']}")
+            key_deadlines.append({
+                "date": hmrc["payment_due_date"],
+                "task": "IHT payment due (if applicable)",
+                "priority": "high"
+            })
+        if probate:
+            form_actions += [
+                "Gather original documents listed in probate requirements",
+                f"Track Probate reference: {probate['reference_number']}",
+                f"Await Grant of Probate (estimated: {probate['processing_time_weeks']} weeks)"
+            ]
+            key_deadlines.append({
+                "date": probate["estimated_grant_date"],
+                "task": "Expected Grant of Probate",
+                "priority": "medium"
+            })
+        
+        timings = state["node_timings"]
+        metrics = {
+            agent: agent_metrics(timings, nodes)
+            for agent, nodes in (
+                ("SearchAgent", ["search"]),
+                ("DraftingAgent", ["notify_bank", "iht_guidance", "probate_guidance"]),
+                ("FormAgent", ["submit_government"]),
+                ("ComputeAgent", ["validate"])
+            )
+        }
+        
+        # The assessment used the submitted figures; flag any guidance that the
+        # validated figures show was needed after all
+        follow_up_actions = []
+        if "iht_guidance" in pruned_nodes and validation["tax_calculations"]["iht_due"] > 0:
+            follow_up_actions.append("Re-run the workflow for IHT400 guidance: validated estate exceeds the nil-rate band")
+        if "probate_guidance" in pruned_nodes and validation["probate_assessment"]["required"]:
+            follow_up_actions.append("Re-run the workflow for PA1P guidance: validated estate exceeds the probate threshold")
         
         final_report = {
-            "workflow_id": f"workflow_{state['session_id']}_{int(datetime.now().timestamp())}",
+            "workflow_id": state["workflow_id"],
             "status": "completed",
             "execution_date": datetime.now().isoformat(),
             
             "executive_summary": {
                 "title": "Legal & Financial Workflow Completed",
                 "description": f"Successfully processed estate with net value of £{validation['estate_summary']['net_estate']:,.2f}. "
-                              f"All institutions notified, forms submitted, and finances validated.",
+                              f"All institutions notified, {'forms submitted' if responses else 'no government forms needed'}, and finances validated.",
                 "key_findings": [
                     f"Total net estate: £{validation['estate_summary']['net_estate']:,.2f}",
                     f"Inheritance Tax due: £{validation['tax_calculations']['iht_due']:,.2f}",
@@ -523,7 +871,8 @@ Format: Clear, step-by-step guide.
                     "step": 1,
                     "agent": "SearchAgent",
                     "status": "completed",
-                    "duration": "simulated",
+                    "duration": f"{metrics['SearchAgent']['duration_s']}s",
+                    "metrics": metrics["SearchAgent"],
                     "outputs": [
                         f"Found {len(state['search_results'].get('banks', []))} banks",
                         f"Found {len(state['search_results'].get('government_offices', []))} government offices"
@@ -533,29 +882,34 @@ Format: Clear, step-by-step guide.
                     "step": 2,
                     "agent": "DraftingAgent",
                     "status": "completed",
-                    "duration": "simulated",
-                    "outputs": [
-                        f"Drafted {len(state['drafted_documents'].get('bank_letters', []))} bank notification letters",
-                        "Drafted IHT400 form guidance",
-                        "Drafted PA1P probate application guidance"
-                    ]
+                    "duration": f"{metrics['DraftingAgent']['duration_s']}s",
+                    "metrics": metrics["DraftingAgent"],
+                    "outputs": drafting_outputs
                 },
+                *[
+                    {
+                        "step": 2,
+                        "agent": f"DraftingAgent ({branch['node']})",
+                        "status": "skipped",
+                        "duration": "0s",
+                        "outputs": [branch["reason"]]
+                    }
+                    for branch in pruned
+                ],
                 {
                     "step": 3,
                     "agent": "FormAgent",
                     "status": "completed",
-                    "duration": "simulated",
-                    "outputs": [
-                        f"Submitted to {len(submission['bank_responses'])} banks",
-                        "Submitted IHT400 to HMRC",
-                        "Submitted PA1P to Probate Registry"
-                    ]
+                    "duration": f"{metrics['FormAgent']['duration_s']}s",
+                    "metrics": metrics["FormAgent"],
+                    "outputs": form_outputs
                 },
                 {
                     "step": 4,
                     "agent": "ComputeAgent",
                     "status": "completed",
-                    "duration": "simulated",
+                    "duration": f"{metrics['ComputeAgent']['duration_s']}s",
+                    "metrics": metrics["ComputeAgent"],
                     "outputs": [
                         f"Calculated net estate: £{validation['estate_summary']['net_estate']:,.2f}",
                         f"Validated IHT: £{validation['tax_calculations']['iht_due']:,.2f}",
@@ -570,98 +924,141 @@ Format: Clear, step-by-step guide.
             
             "next_actions": [
                 "Review all drafted letters before sending to banks",
-                "Gather original documents listed in probate requirements",
                 "Monitor bank account freeze confirmations",
-                f"Track HMRC reference: {submission['government_responses'][0]['reference_number']}",
-                f"Track Probate reference: {submission['government_responses'][1]['reference_number']}",
-                "Await Grant of Probate (estimated: 8 weeks)"
+                *form_actions,
+                *follow_up_actions
             ],
             
-            "key_deadlines": [
-                {
-                    "date": submission['government_responses'][0]['payment_due_date'],
-                    "task": "IHT payment due (if applicable)",
-                    "priority": "high"
-                },
-                {
-                    "date": submission['government_responses'][1]['estimated_grant_date'],
-                    "task": "Expected Grant of Probate",
-                    "priority": "medium"
-                }
-            ],
+            "key_deadlines": key_deadlines,
             
             "documents_generated": {
-                "bank_letters": len(state['drafted_documents'].get('bank_letters', [])),
-                "government_forms": len(state['drafted_documents'].get('government_forms', [])) + 1,
-                "total": len(state['drafted_documents'].get('bank_letters', [])) + len(state['drafted_documents'].get('government_forms', [])) + 1
+                "bank_letters": len(drafted.get('bank_letters', [])),
+                "government_forms": guidance_count,
+                "total": len(drafted.get('bank_letters', [])) + guidance_count
             },
             
-            "validation_status": validation["validation_status"]
+            "pruned_branches": pruned,
+            
+            "validation_status": validation["validation_status"],
+            
+            "performance": summarize_node_timings(timings)
         }
         
         print(f"   ✓ Final report generated")
         print(f"   ✓ Status: {final_report['status'].upper()}")
         
         return {
-            **state,
             "final_report": final_report,
             "current_step": "complete",
-            "completed_steps": state["completed_steps"] + ["report"],
-            "messages": state["messages"] + [
+            "completed_steps": ["report"],
+            "messages": [
                 AIMessage(content="Workflow completed successfully. Final report generated.")
             ]
         }
     
+    def _timed(self, name: str, branch: str, node: Any) -> Any:
+        """
+        Wrap a node so its update also records how long it ran (including any
+        retries), in which superstep and on which branch of the graph, and the
+        LLM calls it made: count, cache hits and tokens
+        """
+        async def run(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+            # A node being re-run on request must not be answered from the LLM cache
+            rerun = config["configurable"].get("rerun_node") == name
+            # The task namespace ("node:task_id") is the same for every retry of a task
+            task_ns = config["metadata"].get("langgraph_checkpoint_ns", name)
+            attempt_key = f"{config['configurable'].get('thread_id')}|{task_ns}"
+            attempt = self._attempts.setdefault(attempt_key, {"count": 0, "started_at": time.time()})
+            attempt["count"] += 1
+            
+            with recording_llm_calls() as calls:
+                with refreshing_cache() if rerun else nullcontext():
+                    update = node(state)
+                    if inspect.isawaitable(update):
+                        update = await update
+            del self._attempts[attempt_key]
+            
+            return {
+                **update,
+                "node_timings": [{
+                    "node": name,
+                    "branch": branch,
+                    "task_id": task_ns.rpartition(":")[2],
+                    "step": config["metadata"].get("langgraph_step"),
+                    "started_at": round(attempt["started_at"], 3),
+                    "elapsed_s": round(time.time() - attempt["started_at"], 3),
+                    "attempts": attempt["count"],
+                    "llm_calls": len(calls),
+                    "cache_hits": sum(1 for call in calls if call["cache_hit"]),
+                    "input_tokens": sum(call["input_tokens"] for call in calls),
+                    "output_tokens": sum(call["output_tokens"] for call in calls),
+                    "llm_elapsed_s": round(sum(call["elapsed_s"] for call in calls), 3)
+                }]
+            }
+        return run
+    
     def create_workflow(self) -> Any:
         """
         Build the LangGraph workflow
+        
+        A cheap assessment decides which guidance is needed, then the branches
+        run together and join at validation:
+        
+                     ┌──▶ search ──▶ notify_bank (one per bank) ──▶ join_banks ───┐
+            assess ──┼──▶ iht_guidance     (above nil-rate band) ──┐            ├──▶ validate ──▶ report
+                     └──▶ probate_guidance (above £5,000) ─────────┴▶ submit_government
         """
         if StateGraph is None:
             raise ImportError("LangGraph not installed")
         
         workflow = StateGraph(AgentState)
+        # Transient LLM failures are retried per node; each attempt is counted in node_timings
+        llm_retry = RetryPolicy(max_attempts=WORKFLOW_NODE_MAX_ATTEMPTS)
         
         # Add agent nodes
-        workflow.add_node("search", self.search_agent_node)
-        workflow.add_node("draft", self.drafting_agent_node)
-        workflow.add_node("submit", self.form_agent_node)
-        workflow.add_node("validate", self.compute_agent_node)
-        workflow.add_node("report", self.report_generator_node)
+        workflow.add_node("assess", self._timed("assess", "assessment", self.assess_estate_node))
+        workflow.add_node("search", self._timed("search", "institutions", self.search_agent_node), retry_policy=llm_retry)
+        workflow.add_node("notify_bank", self._timed("notify_bank", "institutions", self.bank_agent_node), retry_policy=llm_retry)
+        workflow.add_node("iht_guidance", self._timed("iht_guidance", "estate_forms", self.iht_guidance_node), retry_policy=llm_retry)
+        workflow.add_node("probate_guidance", self._timed("probate_guidance", "estate_forms", self.probate_guidance_node), retry_policy=llm_retry)
+        workflow.add_node("submit_government", self._timed("submit_government", "estate_forms", self.government_submission_node))
+        workflow.add_node("join_banks", self.join_banks_node)
+        workflow.add_node("validate", self._timed("validate", "finalise", self.compute_agent_node))
+        workflow.add_node("report", self._timed("report", "finalise", self.report_generator_node))
         
         # Define the flow
-        workflow.set_entry_point("search")
-        workflow.add_edge("search", "draft")
-        workflow.add_edge("draft", "submit")
-        workflow.add_edge("submit", "validate")
+        workflow.add_edge(START, "assess")
+        workflow.add_conditional_edges(
+            "assess",
+            self.route_after_assessment,
+            ["search", "iht_guidance", "probate_guidance", "submit_government"]
+        )
+        workflow.add_conditional_edges("search", self.route_banks, ["notify_bank", "join_banks"])
+        workflow.add_edge("notify_bank", "join_banks")
+        workflow.add_edge("iht_guidance", "submit_government")
+        workflow.add_edge("probate_guidance", "submit_government")
+        # Wait for both branches; each runs exactly once however many banks or guidance nodes ran
+        workflow.add_edge(["join_banks", "submit_government"], "validate")
         workflow.add_edge("validate", "report")
         workflow.add_edge("report", END)
         
-        return workflow.compile()
+        # Checkpoint after every step so a failed run can resume instead of restarting
+        return workflow.compile(checkpointer=SQLiteCheckpointSaver())
     
-    async def execute(
-        self, 
-        session_id: int, 
+    def _initial_state(
+        self,
+        session_id: int,
+        workflow_id: str,
         survey_data: Dict[str, Any],
         estate_data: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """
-        Execute the complete multi-agent workflow
-        """
-        print(f"\n{'='*60}")
-        print(f"🚀 Starting LangGraph Multi-Agent Workflow")
-        print(f"   Session ID: {session_id}")
-        print(f"   Estate Value: £{estate_data.get('property_value', 0) + estate_data.get('bank_balances', 0):,.2f}")
-        print(f"{'='*60}\n")
-        
-        # Create workflow
-        app = self.create_workflow()
-        
-        # Initial state
-        initial_state: AgentState = {
+    ) -> AgentState:
+        return {
             "messages": [],
             "session_id": session_id,
+            "workflow_id": workflow_id,
             "survey_data": survey_data,
             "estate_data": estate_data,
+            "estate_assessment": {},
             "search_results": {},
             "drafted_documents": {},
             "submission_results": {},
@@ -669,19 +1066,191 @@ Format: Clear, step-by-step guide.
             "final_report": {},
             "current_step": "initialized",
             "completed_steps": [],
-            "errors": []
+            "errors": [],
+            "node_timings": []
+        }
+    
+    async def stream(
+        self,
+        session_id: int,
+        survey_data: Dict[str, Any],
+        estate_data: Dict[str, Any],
+        workflow_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute the workflow, yielding progress events as each node starts and finishes.
+        
+        Every step is checkpointed under (session_id, workflow_id). Passing the
+        workflow_id of an earlier run resumes it from its last completed step, so
+        nodes that already succeeded are not run (or paid for) again; survey_data
+        and estate_data are then ignored in favour of the checkpointed state.
+        Runs last checkpointed more than WORKFLOW_CHECKPOINT_TTL_S ago are
+        pruned and start afresh.
+
+        Events (the "event" key):
+        - workflow_start: once, before the first node {"workflow_id", "resumed"}
+        - node_start: {"node", "step", "timestamp"}
+        - node_end: {"node", "step", "elapsed_s", "error", "summary", "output"} where
+          "output" holds the node's own update (parallel branches each report theirs)
+        - workflow_complete: {"workflow_id", "completed_steps", "elapsed_s", "report"}
+        """
+        app = self.app
+        workflow_id = workflow_id or uuid.uuid4().hex
+        config = workflow_config(session_id, workflow_id)
+        
+        snapshot = await app.aget_state(config)
+        resumed = bool(snapshot.values)
+        if resumed:
+            graph_input = None
+            values = snapshot.values
+        else:
+            graph_input = values = self._initial_state(session_id, workflow_id, survey_data, estate_data)
+        
+        async for event in self._run(app, graph_input, config, values, resumed):
+            yield event
+    
+    async def rerun_node(
+        self,
+        session_id: int,
+        workflow_id: str,
+        node: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Re-run one node of a checkpointed workflow and everything downstream of it.
+        
+        Execution forks from the last checkpoint before the node ran. The node's
+        LLM calls bypass the response cache; other nodes in the same step are
+        replayed from the cache, so only the requested node does fresh work.
+        Yields the same events as stream().
+        
+        Raises:
+            ValueError: if the workflow has no checkpoint where the node was scheduled
+        """
+        app = self.app
+        config = workflow_config(session_id, workflow_id)
+        
+        async for snapshot in app.aget_state_history(config):
+            if node in snapshot.next:
+                fork_config = {
+                    "configurable": {**snapshot.config["configurable"], "rerun_node": node}
+                }
+                async for event in self._run(app, None, fork_config, snapshot.values, True):
+                    yield event
+                return
+        raise ValueError(f"Node '{node}' was never scheduled in workflow {workflow_id}")
+    
+    async def _run(
+        self,
+        app: Any,
+        graph_input: Optional[Dict[str, Any]],
+        config: Dict[str, Any],
+        values: Dict[str, Any],
+        resumed: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        workflow_started = time.perf_counter()
+        yield {
+            "event": "workflow_start",
+            "session_id": values["session_id"],
+            "workflow_id": values["workflow_id"],
+            "resumed": resumed,
+            "timestamp": datetime.now().isoformat()
         }
         
+        node_started: Dict[str, float] = {}
+        latest_values: Dict[str, Any] = dict(values)
+        try:
+            async for mode, chunk in app.astream(
+                graph_input,
+                stream_mode=["debug", "values"],
+                config={**config, "max_concurrency": DRAFTING_MAX_CONCURRENCY}
+            ):
+                if mode == "values":
+                    latest_values = chunk
+                    continue
+                
+                payload = chunk["payload"]
+                if chunk["type"] == "task":
+                    node_started[payload["id"]] = time.perf_counter()
+                    yield {
+                        "event": "node_start",
+                        "node": payload["name"],
+                        "step": chunk["step"],
+                        "timestamp": chunk["timestamp"]
+                    }
+                elif chunk["type"] == "task_result":
+                    started = node_started.pop(payload["id"], workflow_started)
+                    node_output = dict(payload.get("result") or {})
+                    new_messages = node_output.get("messages") or []
+                    yield {
+                        "event": "node_end",
+                        "node": payload["name"],
+                        "step": chunk["step"],
+                        "elapsed_s": round(time.perf_counter() - started, 3),
+                        "error": payload.get("error"),
+                        "summary": new_messages[-1].content if new_messages else None,
+                        "output": {
+                            key: value
+                            for key, value in node_output.items()
+                            if key not in _STREAM_SKIPPED_KEYS
+                        }
+                    }
+        finally:
+            # Drop retry counters of tasks that gave up, and keep the metrics of
+            # whatever ran, including the nodes of a failed run; then expire old runs
+            thread_prefix = f"{config['configurable']['thread_id']}|"
+            for key in [key for key in self._attempts if key.startswith(thread_prefix)]:
+                del self._attempts[key]
+            try:
+                await save_workflow_metrics(
+                    values["session_id"], values["workflow_id"], latest_values.get("node_timings", [])
+                )
+            except Exception as e:
+                print(f"⚠️ Could not save workflow metrics: {e}")
+            try:
+                cutoff = datetime.now(timezone.utc) - timedelta(seconds=WORKFLOW_CHECKPOINT_TTL_S)
+                pruned = await prune_workflow_checkpoints(cutoff.isoformat())
+                if pruned:
+                    print(f"🧹 Pruned checkpoints of {pruned} expired workflow run(s)")
+            except Exception as e:
+                print(f"⚠️ Could not prune workflow checkpoints: {e}")
+        
+        yield {
+            "event": "workflow_complete",
+            "workflow_id": latest_values.get("workflow_id"),
+            "completed_steps": latest_values.get("completed_steps", []),
+            "elapsed_s": round(time.perf_counter() - workflow_started, 3),
+            "report": latest_values.get("final_report", {})
+        }
+    
+    async def execute(
+        self, 
+        session_id: int, 
+        survey_data: Dict[str, Any],
+        estate_data: Dict[str, Any],
+        workflow_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute the complete multi-agent workflow, resuming workflow_id if given
+        """
+        print(f"\n{'='*60}")
+        print(f"🚀 Starting LangGraph Multi-Agent Workflow")
+        print(f"   Session ID: {session_id}")
+        print(f"   Estate Value: £{estate_data.get('property_value', 0) + estate_data.get('bank_balances', 0):,.2f}")
+        print(f"{'='*60}\n")
+        
         # Execute workflow
         try:
-            result = await app.ainvoke(initial_state)
+            result = {}
+            async for event in self.stream(session_id, survey_data, estate_data, workflow_id):
+                if event["event"] == "workflow_complete":
+                    result = event
             
             print(f"\n{'='*60}")
             print(f"✅ Workflow Completed Successfully")
             print(f"   Completed Steps: {', '.join(result['completed_steps'])}")
             print(f"{'='*60}\n")
             
-            return result["final_report"]
+            return result["report"]
             
         except Exception as e:
             print(f"\n{'='*60}")
@@ -690,16 +1259,55 @@ Format: Clear, step-by-step guide.
             raise
 
 
+_workflow: Optional[LangGraphWorkflow] = None
+
+
 # Factory function
 def create_langgraph_workflow() -> LangGraphWorkflow:
-    """Create a new LangGraph workflow instance"""
-    return LangGraphWorkflow()
+    """Return the process-wide LangGraph workflow, creating and compiling it on first use"""
+    global _workflow
+    if _workflow is None:
+        _workflow = LangGraphWorkflow()
+    return _workflow
+
+
+def benchmark_setup(iterations: int = 20) -> Dict[str, float]:
+    """
+    Micro-benchmark of per-request setup: a new LLM client and freshly compiled
+    graph per request (the old behaviour) against the shared workflow.
+    
+    Returns:
+        Dict[str, float]: mean milliseconds per request for each approach
+    """
+    started = time.perf_counter()
+    for _ in range(iterations):
+        LangGraphWorkflow(llm=_new_llm()).create_workflow()
+    per_request_ms = (time.perf_counter() - started) * 1000 / iterations
+    
+    create_langgraph_workflow().app
+    started = time.perf_counter()
+    for _ in range(iterations):
+        create_langgraph_workflow().app
+    shared_ms = (time.perf_counter() - started) * 1000 / iterations
+    
+    return {
+        "per_request_setup_ms": round(per_request_ms, 3),
+        "shared_setup_ms": round(shared_ms, 6),
+        "iterations": iterations
+    }
 
 
 # For testing
 if __name__ == "__main__":
+    import sys
     import asyncio
     
+    from database import close_pool, init_db
+    
+    if "--benchmark" in sys.argv:
+        print(json.dumps(benchmark_setup(), indent=2))
+        sys.exit(0)
+    
     workflow = create_langgraph_workflow()
     
     test_survey_data = {
@@ -719,6 +1327,13 @@ if __name__ == "__main__":
         "funeral_costs": 3500
     }
     
-    result = asyncio.run(workflow.execute(1, test_survey_data, test_estate_data))
+    async def main():
+        await init_db()
+        try:
+            return await workflow.execute(1, test_survey_data, test_estate_data)
+        finally:
+            await close_pool()
+    
+    result = asyncio.run(main())
     print("\nFinal Report:")
     print(json.dumps(result, indent=2))
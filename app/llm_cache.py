@@ -0,0 +1,483 @@
+"""
+Content-addressed cache for LLM responses.
+
+Responses are keyed by a hash of (model id, system prompt, contents,
+temperature) and kept in two tiers: a bounded in-memory LRU for hot
+prompts and a SQLite table that survives restarts. Both tiers honour a
+TTL, and the SQLite tier evicts least-recently-used rows once it grows
+past a byte budget. The async helpers do their cache I/O on a worker
+thread so the event loop never waits on SQLite.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+LLM_CACHE_PATH = Path(
+    os.environ.get("LLM_CACHE_PATH", Path(__file__).with_name("llm_cache.db"))
+)
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_TTL_S = int(os.environ.get("LLM_CACHE_TTL_S", str(24 * 60 * 60)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Rows dropped per eviction round once the byte budget is exceeded
+LLM_CACHE_EVICT_BATCH = int(os.environ.get("LLM_CACHE_EVICT_BATCH", "32"))
+
+
+def make_key(
+    model: str,
+    system_prompt: Optional[str],
+    contents: Any,
+    temperature: Optional[float] = None,
+) -> str:
+    """Returns the cache key for a single model call."""
+    material = json.dumps(
+        {
+            "model": model,
+            "system": system_prompt or "",
+            "contents": contents,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + SQLite) response cache. Safe to share across threads."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = LLM_CACHE_PATH,
+        ttl_s: int = LLM_CACHE_TTL_S,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Running total of size_bytes on disk, so a put never has to sum the table
+        self._disk_bytes = 0
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache(expires_at)"
+            )
+            self._conn.commit()
+            (self._disk_bytes,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+            ).fetchone()
+        return self._conn
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for ``key`` or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return response
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            db = self._db()
+            if db is not None:
+                row = db.execute(
+                    "SELECT response, expires_at, size_bytes FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, expires_at, size_bytes = row
+                    if expires_at > now:
+                        db.execute(
+                            "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                            (now, key),
+                        )
+                        db.commit()
+                        self._remember(key, response, expires_at)
+                        self._stats["disk_hits"] += 1
+                        return response
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    db.commit()
+                    self._disk_bytes -= size_bytes
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(
+        self,
+        key: str,
+        response: str,
+        ttl_s: Optional[int] = None,
+        model: Optional[str] = None,
+    ) -> None:
+        """Stores ``response`` under ``key`` in both tiers."""
+        now = time.time()
+        expires_at = now + (self.ttl_s if ttl_s is None else ttl_s)
+        with self._lock:
+            self._remember(key, response, expires_at)
+            db = self._db()
+            if db is not None:
+                size_bytes = len(response.encode("utf-8"))
+                replaced = db.execute(
+                    "SELECT size_bytes FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                db.execute(
+                    """
+                    INSERT OR REPLACE INTO llm_cache
+                        (key, model, response, size_bytes, created_at, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, model, response, size_bytes, now, expires_at, now),
+                )
+                self._disk_bytes += size_bytes - (replaced[0] if replaced else 0)
+                self._evict(db, now)
+                db.commit()
+            self._stats["stores"] += 1
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        """Drops expired rows, then least-recently-used rows until under ``max_bytes``.
+
+        Both go through an index and touch only the rows they remove.
+        """
+        expired, expired_bytes = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache WHERE expires_at <= ?",
+            (now,),
+        ).fetchone()
+        if expired:
+            db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._disk_bytes -= expired_bytes
+            self._stats["expired"] += expired
+        while self._disk_bytes > self.max_bytes:
+            rows = db.execute(
+                "SELECT key, size_bytes FROM llm_cache ORDER BY last_access ASC LIMIT ?",
+                (LLM_CACHE_EVICT_BATCH,),
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            evicted = []
+            for key, size_bytes in rows:
+                if self._disk_bytes <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                self._disk_bytes -= size_bytes
+            db.executemany("DELETE FROM llm_cache WHERE key = ?", evicted)
+            for (key,) in evicted:
+                self._memory.pop(key, None)
+            self._stats["evictions"] += len(evicted)
+
+    def clear(self) -> None:
+        """Empties both tiers."""
+        with self._lock:
+            self._memory.clear()
+            db = self._db()
+            if db is not None:
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and tier sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            db = self._db()
+            if db is not None:
+                (stats["disk_entries"],) = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+                stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        )
+        return stats
+
+
+llm_cache = LLMCache()
+
+# Set while re-running work on purpose: lookups miss, fresh responses are stored
+_refreshing: ContextVar[bool] = ContextVar("llm_cache_refreshing", default=False)
+
+
+@contextmanager
+def refreshing_cache() -> Iterator[None]:
+    """Ignores cached responses for calls made inside the block, replacing them with fresh ones."""
+    token = _refreshing.set(True)
+    try:
+        yield
+    finally:
+        _refreshing.reset(token)
+
+
+# Set while a caller wants a record of each model call made inside the block
+_call_log: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_call_log", default=None)
+
+
+@contextmanager
+def recording_llm_calls() -> Iterator[List[Dict[str, Any]]]:
+    """Collects one record per model call made inside the block.
+
+    Each record is {"model", "cache_hit", "elapsed_s", "input_tokens",
+    "output_tokens"}. Cache hits cost no tokens.
+    """
+    calls: List[Dict[str, Any]] = []
+    token = _call_log.set(calls)
+    try:
+        yield calls
+    finally:
+        _call_log.reset(token)
+
+
+def _record(
+    model: str,
+    cache_hit: bool,
+    started: float,
+    input_tokens: Optional[int] = None,
+    output_tokens: Optional[int] = None,
+) -> None:
+    calls = _call_log.get()
+    if calls is None:
+        return
+    calls.append(
+        {
+            "model": model,
+            "cache_hit": cache_hit,
+            "elapsed_s": round(time.perf_counter() - started, 3),
+            "input_tokens": input_tokens or 0,
+            "output_tokens": output_tokens or 0,
+        }
+    )
+
+
+def _message_usage(message: Any) -> Tuple[Optional[int], Optional[int]]:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), usage.get("output_tokens")
+
+
+def _lookup(key: str) -> Optional[str]:
+    if not LLM_CACHE_ENABLED or _refreshing.get():
+        return None
+    return llm_cache.get(key)
+
+
+async def _alookup(key: str) -> Optional[str]:
+    if not LLM_CACHE_ENABLED or _refreshing.get():
+        return None
+    return await asyncio.to_thread(llm_cache.get, key)
+
+
+async def _astore(key: str, text: str, ttl_s: Optional[int], model: str) -> None:
+    await asyncio.to_thread(llm_cache.put, key, text, ttl_s, model)
+
+
+def _content_config(system_instruction: Optional[str], temperature: Optional[float]) -> Any:
+    from google.genai import types
+
+    if system_instruction is None and temperature is None:
+        return None
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction, temperature=temperature
+    )
+
+
+def cached_generate_content(
+    client: Any,
+    model: str,
+    contents: Any,
+    system_instruction: Optional[str] = None,
+    temperature: Optional[float] = None,
+    parse: Optional[Callable[[str], Any]] = None,
+    ttl_s: Optional[int] = None,
+) -> Any:
+    """Calls ``client.models.generate_content`` through the cache.
+
+    Args:
+        client: a google.genai Client
+        model (str): the model id
+        contents: the request contents
+        system_instruction (str, optional): the system prompt
+        temperature (float, optional): the sampling temperature
+        parse (Callable, optional): applied to the response text before it is
+            returned. A response is only cached if ``parse`` succeeds, so
+            malformed output is never replayed.
+        ttl_s (int, optional): overrides the default TTL
+
+    Returns:
+        the response text, or ``parse(text)`` when ``parse`` is given
+    """
+    started = time.perf_counter()
+    key = make_key(model, system_instruction, contents, temperature)
+    text = _lookup(key)
+    if text is not None:
+        _record(model, True, started)
+        return parse(text) if parse else text
+
+    response = client.models.generate_content(
+        model=model,
+        config=_content_config(system_instruction, temperature),
+        contents=contents,
+    )
+    usage = response.usage_metadata
+    _record(
+        model,
+        False,
+        started,
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "candidates_token_count", None),
+    )
+    text = response.text
+    if not isinstance(text, str):
+        raise ValueError(f"Gemini API did not return a string. Got: {type(text)} - {text}")
+
+    result = parse(text) if parse else text
+    if LLM_CACHE_ENABLED:
+        llm_cache.put(key, text, ttl_s=ttl_s, model=model)
+    return result
+
+
+async def cached_agenerate_content_stream(
+    client: Any,
+    model: str,
+    contents: Any,
+    system_instruction: Optional[str] = None,
+    temperature: Optional[float] = None,
+    parse: Optional[Callable[[str], Any]] = None,
+    ttl_s: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """Streams ``client.aio.models.generate_content_stream`` text through the cache.
+
+    Shares cache entries with ``cached_generate_content``. A cached response
+    is replayed as a single chunk; a streamed one is stored once it is
+    complete, and only if ``parse`` accepts it.
+
+    Yields:
+        str: the response text, chunk by chunk
+    """
+    started = time.perf_counter()
+    key = make_key(model, system_instruction, contents, temperature)
+    text = await _alookup(key)
+    if text is not None:
+        _record(model, True, started)
+        yield text
+        return
+
+    parts = []
+    usage = None
+    async for chunk in await client.aio.models.generate_content_stream(
+        model=model,
+        config=_content_config(system_instruction, temperature),
+        contents=contents,
+    ):
+        usage = chunk.usage_metadata or usage
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+    _record(
+        model,
+        False,
+        started,
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "candidates_token_count", None),
+    )
+
+    text = "".join(parts)
+    if not LLM_CACHE_ENABLED:
+        return
+    if parse:
+        try:
+            parse(text)
+        except Exception:
+            return
+    await _astore(key, text, ttl_s, model)
+
+
+def _split_messages(messages: Any) -> Tuple[str, list]:
+    system = "\n".join(m.content for m in messages if m.type == "system")
+    contents = [[m.type, m.content] for m in messages if m.type != "system"]
+    return system, contents
+
+
+def _invoke_key(llm: Any, messages: Any) -> Tuple[str, str]:
+    system, contents = _split_messages(messages)
+    model = getattr(llm, "model", None) or type(llm).__name__
+    return model, make_key(model, system, contents, getattr(llm, "temperature", None))
+
+
+async def cached_ainvoke(
+    llm: Any,
+    messages: Any,
+    parse: Optional[Callable[[str], Any]] = None,
+    ttl_s: Optional[int] = None,
+) -> Any:
+    """Calls ``await llm.ainvoke(messages)`` on a LangChain chat model through the cache.
+
+    Returns:
+        the response content, or ``parse(content)`` when ``parse`` is given
+    """
+    started = time.perf_counter()
+    model, key = _invoke_key(llm, messages)
+    text = await _alookup(key)
+    if text is not None:
+        _record(model, True, started)
+        return parse(text) if parse else text
+
+    message = await llm.ainvoke(messages)
+    _record(model, False, started, *_message_usage(message))
+    text = message.content
+    result = parse(text) if parse else text
+    if LLM_CACHE_ENABLED and isinstance(text, str):
+        await _astore(key, text, ttl_s, model)
+    return result
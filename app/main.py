@@ -1,27 +1,51 @@
+import asyncio
 import json
 import os
 import pathlib
-from typing import Any, Dict, Optional
+import uuid
+from typing import Any, Dict, List, Optional
 
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
-from draft_email import draft_emails
+from draft_email import draft_emails_with_report
 from random_data import generate_random_estate_data
 from database import (
+    close_pool,
     create_session,
+    get_checklist,
+    get_job,
     get_session,
     init_db,
+    list_checklist_versions,
+    list_task_statuses,
+    list_workflow_metrics,
+    open_pool,
+    save_checklist,
     save_survey_data,
     update_task_status,
+    update_task_statuses,
+)
+from browser_pool import BROWSER_POOL_WARM, browser_pool
+from agents import (
+    CHECKLIST_PARALLEL,
+    checklist_fingerprint,
+    get_post_death_checklist,
+    get_post_death_checklist_parallel,
+    stream_post_death_checklist,
 )
-from agents import get_post_death_checklist
 from compute_agent import compute_figures
+from executor import AgentExecutor, ExecutorSaturated
+from jobs import JobWorkerPool
+from llm_cache import llm_cache
+from registrar_index import registrar_index
+from scenarios import run_scenarios
 from search import search_agent
-from langgraph_workflow import create_langgraph_workflow
+from langgraph_workflow import create_langgraph_workflow, summarize_node_timings
 
 load_dotenv()
 
@@ -29,6 +53,9 @@ ANAM_API_KEY = os.environ.get("ANAM_API_KEY")
 
 app = FastAPI()
 
+# Blocking LLM calls run here so they never stall the event loop
+agent_executor = AgentExecutor()
+
 # IMPORTANT: CORS middleware must be added BEFORE any routes
 origins_env = os.environ.get("FRONTEND_ORIGINS")
 if origins_env:
@@ -70,12 +97,40 @@ class SessionDetailResponse(BaseModel):
 
 class DraftEmailResponse(BaseModel):
     drafts: list = Field(..., description="List of drafted email templates")
+    tasks: list = Field(
+        default_factory=list,
+        description="Per-substep timing and failure report from the DraftingAgent",
+    )
     updated_at: Optional[str] = None
+    checklist_version: Optional[int] = Field(
+        None,
+        description="Stored checklist version the drafts were made from; null for the bundled sample",
+    )
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
+    await open_pool()
     await init_db()
+    if BROWSER_POOL_WARM:
+        browser_pool.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    agent_executor.shutdown()
+    browser_pool.close()
+    await close_pool()
+
+
+async def run_agent(func, *args, **kwargs):
+    """Run a blocking agent call on the executor, mapping saturation to a 429."""
+    try:
+        return await agent_executor.run(func, *args, **kwargs)
+    except ExecutorSaturated as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "5"}
+        )
 
 
 @app.get("/", tags=["health"])
@@ -83,6 +138,29 @@ async def read_root() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/health/executor", tags=["health"])
+async def executor_health() -> Dict[str, int]:
+    return agent_executor.stats()
+
+
+@app.get("/health/browser-pool", tags=["health"])
+async def browser_pool_health() -> Dict[str, Any]:
+    # Off the event loop: the replay stats count the entries on disk
+    return await asyncio.to_thread(browser_pool.stats)
+
+
+@app.get("/health/llm-cache", tags=["health"])
+async def llm_cache_health() -> Dict[str, Any]:
+    # Not via run_agent: a probe must not queue behind (or be refused by) busy model calls
+    return await asyncio.to_thread(llm_cache.stats)
+
+
+@app.get("/health/registrar-index", tags=["health"])
+async def registrar_index_health() -> Dict[str, Any]:
+    # Not via run_agent, like /health/llm-cache
+    return await asyncio.to_thread(registrar_index.stats)
+
+
 @app.post("/sessions", response_model=SessionCreateResponse, tags=["sessions"])
 async def create_session_endpoint() -> SessionCreateResponse:
     session_id = await create_session()
@@ -158,13 +236,27 @@ async def get_draft_emails(session_id: int) -> DraftEmailResponse:
 
         # Use the answers from survey_data if available, otherwise use the whole survey_data
         user_data = survey_data.get("answers", survey_data)
-        with open(str(pathlib.Path(__file__).parent / "temp.txt")) as f:
-            drafts = draft_emails(
-                json.load(f),
-                generate_random_estate_data(),
-            )
+        # Draft against the session's stored checklist; the bundled sample is
+        # only used until one has been generated
+        stored = await get_checklist(session_id)
+        if stored:
+            checklist = stored["checklist"]
+        else:
+            with open(str(pathlib.Path(__file__).parent / "temp.txt")) as f:
+                checklist = json.load(f)
+        drafts, tasks = await run_agent(
+            draft_emails_with_report,
+            checklist,
+            generate_random_estate_data(),
+        )
         # drafts = draft_emails(formatted_data, user_data)
-        return DraftEmailResponse(drafts=drafts)
+        return DraftEmailResponse(
+            drafts=drafts,
+            tasks=tasks,
+            checklist_version=stored["version"] if stored else None,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -183,13 +275,10 @@ class TaskStatusResponse(BaseModel):
 )
 async def get_task_statuses(session_id: int) -> TaskStatusResponse:
     """Get the status of all tasks for a session"""
-    session = await get_session(session_id)
-    if not session:
+    task_statuses = await list_task_statuses(session_id)
+    if task_statuses is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    survey_data = session.get("survey_data", {})
-    task_statuses = survey_data.get("task_statuses", {})
-
     return TaskStatusResponse(session_id=session_id, task_statuses=task_statuses)
 
 
@@ -197,26 +286,41 @@ class ChecklistGenerateRequest(BaseModel):
     location: str = "UK"
     relationship: str = "Family member"
     additional_context: str = ""
+    parallel: bool = Field(
+        CHECKLIST_PARALLEL,
+        description="Plan the steps first, then write every step's substeps concurrently",
+    )
+    regenerate: bool = Field(
+        False,
+        description="Generate a new version even if the survey answers have not changed",
+    )
 
 
 class ChecklistResponse(BaseModel):
     checklist: Dict[str, Any]
     message: str
+    version: Optional[int] = None
 
 
-@app.post(
-    "/sessions/{session_id}/generate-checklist",
-    response_model=ChecklistResponse,
-    tags=["automation"],
-)
-async def generate_checklist_endpoint(
-    session_id: int, request: ChecklistGenerateRequest
-) -> ChecklistResponse:
-    """Generate an automated checklist based on survey answers"""
-    session = await get_session(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+class ChecklistRecordResponse(BaseModel):
+    session_id: int
+    version: int
+    fingerprint: str
+    checklist: Dict[str, Any]
+    created_at: str
+    versions: list = Field(
+        default_factory=list,
+        description="Every stored version as {version, fingerprint, created_at}",
+    )
+
 
+CHECKLIST_JURISDICTION_TERMS = "Tell Us Once, MCCD, Green Form, HMCTS Probate, Coroner"
+
+
+def _checklist_context(
+    session: Dict[str, Any], request: ChecklistGenerateRequest
+) -> str:
+    """Build the checklist prompt's additional context from the survey answers."""
     if not session.get("survey_data") or not session["survey_data"].get("answers"):
         raise HTTPException(status_code=400, detail="Survey not completed")
 
@@ -243,28 +347,157 @@ async def generate_checklist_endpoint(
         additional_context = "; ".join(context_parts) + (
             f"; {additional_context}" if additional_context else ""
         )
+    return additional_context
+
+
+def _checklist_inputs(
+    session: Dict[str, Any], request: ChecklistGenerateRequest
+) -> Dict[str, str]:
+    """Everything the checklist is generated from; its fingerprint decides when to regenerate."""
+    return {
+        "location": request.location,
+        "relationship": request.relationship,
+        "jurisdiction_terms": CHECKLIST_JURISDICTION_TERMS,
+        "additional_context": _checklist_context(session, request),
+    }
+
+
+@app.post(
+    "/sessions/{session_id}/generate-checklist",
+    response_model=ChecklistResponse,
+    tags=["automation"],
+)
+async def generate_checklist_endpoint(
+    session_id: int, request: ChecklistGenerateRequest
+) -> ChecklistResponse:
+    """
+    Generate an automated checklist based on survey answers. The checklist is
+    stored as a new version for the session; if the survey-derived inputs are
+    unchanged since the latest version, that version is returned instead.
+    """
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    inputs = _checklist_inputs(session, request)
+    fingerprint = checklist_fingerprint(**inputs, parallel=request.parallel)
+    stored = await get_checklist(session_id)
+    if stored and stored["fingerprint"] == fingerprint and not request.regenerate:
+        return ChecklistResponse(
+            checklist=stored["checklist"],
+            message=f"Survey unchanged; returning stored checklist version {stored['version']}",
+            version=stored["version"],
+        )
 
     # Generate checklist using AI agent
     try:
-        checklist = get_post_death_checklist(
-            location=request.location,
-            relationship=request.relationship,
-            jurisdiction_terms="Tell Us Once, MCCD, Green Form, HMCTS Probate, Coroner",
-            additional_context=additional_context,
+        checklist = await run_agent(
+            (
+                get_post_death_checklist_parallel
+                if request.parallel
+                else get_post_death_checklist
+            ),
+            **inputs,
         )
+        stored = await save_checklist(session_id, fingerprint, checklist)
+        if not stored:
+            raise HTTPException(status_code=404, detail="Session not found")
 
         return ChecklistResponse(
-            checklist=checklist, message="Checklist generated successfully"
+            checklist=checklist,
+            message=f"Checklist version {stored['version']} generated successfully",
+            version=stored["version"],
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to generate checklist: {str(e)}"
         )
 
 
+@app.post(
+    "/sessions/{session_id}/generate-checklist/stream",
+    tags=["automation"],
+)
+async def stream_checklist_endpoint(
+    session_id: int, request: ChecklistGenerateRequest
+) -> StreamingResponse:
+    """
+    Generate the checklist and stream it as Server-Sent Events: a meta event,
+    one step event per step as soon as the model finishes it, then a complete
+    event carrying the same checklist and version as /generate-checklist, or
+    a single error event. An unchanged survey replays the stored version.
+    """
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    inputs = _checklist_inputs(session, request)
+    # Streaming always uses the single-call prompt
+    fingerprint = checklist_fingerprint(**inputs, parallel=False)
+    stored = await get_checklist(session_id)
+    if stored and (stored["fingerprint"] != fingerprint or request.regenerate):
+        stored = None
+
+    async def replay():
+        checklist = stored["checklist"]
+        yield {"event": "meta", "meta": checklist.get("meta"), "elapsed_s": 0.0}
+        for step in checklist.get("steps", []):
+            yield {"event": "step", "step": step, "elapsed_s": 0.0}
+        yield {"event": "complete", "checklist": checklist, "elapsed_s": 0.0}
+
+    async def events():
+        try:
+            source = replay() if stored else stream_post_death_checklist(**inputs)
+            async for event in source:
+                if event["event"] == "complete":
+                    record = stored or await save_checklist(
+                        session_id, fingerprint, event["checklist"]
+                    )
+                    event["version"] = record["version"] if record else None
+                yield _sse(event)
+        except Exception as e:
+            print(f"❌ Checklist stream failed for session {session_id}: {e}")
+            yield _sse({
+                "event": "error",
+                "detail": f"Failed to generate checklist: {str(e)}",
+            })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get(
+    "/sessions/{session_id}/checklist",
+    response_model=ChecklistRecordResponse,
+    tags=["automation"],
+)
+async def get_checklist_endpoint(
+    session_id: int, version: Optional[int] = None
+) -> ChecklistRecordResponse:
+    """Return the session's stored checklist, the latest version unless one is given"""
+    record = await get_checklist(session_id, version)
+    if not record:
+        raise HTTPException(status_code=404, detail="Checklist not found")
+    return ChecklistRecordResponse(
+        **record, versions=await list_checklist_versions(session_id)
+    )
+
+
 class ComputationRequest(BaseModel):
     user_data: Dict[str, Any]
-    task_data: Dict[str, Any]
+    task_data: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Checklist to compute; defaults to the session's stored checklist",
+    )
+    narrative: bool = Field(
+        False,
+        description="Add a model-written summary to each calculated result",
+    )
 
 
 class ComputationResponse(BaseModel):
@@ -285,27 +518,99 @@ async def compute_endpoint(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    task_data = request.task_data
+    if task_data is None:
+        stored = await get_checklist(session_id)
+        if not stored:
+            raise HTTPException(
+                status_code=400,
+                detail="No checklist stored for this session; generate one first",
+            )
+        task_data = stored["checklist"]
+
     try:
-        results = compute_figures(request.task_data, request.user_data)
-
-        # Update task statuses in the database
-        for result in results:
-            task_id = result.get("task_id")
-            if task_id:
-                await update_task_status(
-                    session_id=session_id,
-                    task_id=task_id,
-                    status="completed",
-                    results=result,
-                )
+        results = await run_agent(
+            compute_figures,
+            task_data,
+            request.user_data,
+            narrative=request.narrative,
+        )
 
-        return ComputationResponse(
-            results=results, message=f"Completed {len(results)} computations"
+        # Update task statuses in the database; failed substeps stay pending
+        await update_task_statuses(
+            session_id,
+            {
+                result.get("task_id") or result["id"]: (
+                    "completed" if result.get("status", "ok") == "ok" else "pending",
+                    result,
+                )
+                for result in results
+                if result.get("task_id") or result.get("id")
+            },
         )
+
+        failed = sum(1 for result in results if result.get("status") == "failed")
+        message = f"Completed {len(results) - failed} computations"
+        if failed:
+            message += f", {failed} failed"
+        return ComputationResponse(results=results, message=message)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to compute: {str(e)}")
 
 
+class ScenarioRequest(BaseModel):
+    base: Dict[str, Any] = Field(
+        ...,
+        description="Flat estate figures (the langgraph-workflow fields) or a full financial inventory",
+    )
+    grid: Dict[str, List[float]] = Field(
+        default_factory=dict,
+        description="Values to try per parameter; every combination is evaluated",
+    )
+    include_rows: bool = Field(
+        False, description="Also return one row per combination (capped)"
+    )
+
+
+class ScenarioResponse(BaseModel):
+    base: Dict[str, Any]
+    scenarios: int
+    parameters: List[str]
+    summary: Dict[str, Any]
+    sensitivity: Dict[str, Any]
+    ranking: list
+    rows: Optional[list] = None
+
+
+@app.post(
+    "/sessions/{session_id}/scenarios",
+    response_model=ScenarioResponse,
+    tags=["automation"],
+)
+async def scenarios_endpoint(
+    session_id: int, request: ScenarioRequest
+) -> ScenarioResponse:
+    """
+    Evaluate IHT and probate need across every combination of the grid values
+    ("what if the house sells for X", "what if we include the gifts") and
+    return a sensitivity table. Calculated in-process; no model is called.
+    """
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        # Not via run_agent: a few ms of NumPy must not wait for (or be refused by) busy model calls
+        result = await asyncio.to_thread(
+            run_scenarios, request.base, request.grid, request.include_rows
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ScenarioResponse(**result)
+
+
 class FinancialAssessmentRequest(BaseModel):
     """Request to assess if user needs legal/financial assistance"""
 
@@ -417,7 +722,7 @@ async def search_funeral_endpoint(
         from search import find_funeral
 
         # Call find_funeral directly with location
-        results = find_funeral(request.location)
+        results = await run_agent(find_funeral, request.location)
 
         # Update task status
         await update_task_status(
@@ -428,6 +733,8 @@ async def search_funeral_endpoint(
         )
 
         return FuneralSearchResponse(**results)
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
 
@@ -445,6 +752,10 @@ class LangGraphWorkflowRequest(BaseModel):
     investments: float = Field(default=0, description="Investment value in GBP")
     debts: float = Field(default=0, description="Total debts in GBP")
     funeral_costs: float = Field(default=3500, description="Funeral costs in GBP")
+    workflow_id: Optional[str] = Field(
+        default=None,
+        description="Resume this earlier run from its last completed step instead of starting over",
+    )
 
 
 class LangGraphWorkflowResponse(BaseModel):
@@ -461,6 +772,18 @@ class LangGraphWorkflowResponse(BaseModel):
     key_deadlines: list
     documents_generated: Dict[str, Any]
     validation_status: Dict[str, Any]
+    pruned_branches: list = []
+    performance: Dict[str, Any] = {}
+
+
+def _estate_data_from_request(request: LangGraphWorkflowRequest) -> Dict[str, Any]:
+    return {
+        "property_value": request.property_value,
+        "bank_balances": request.bank_balances,
+        "investments": request.investments,
+        "debts": request.debts,
+        "funeral_costs": request.funeral_costs
+    }
 
 
 @app.post(
@@ -474,37 +797,33 @@ async def execute_langgraph_workflow(
     """
     Execute LangGraph multi-agent workflow for Financial & Legal Matters
     Pipeline: SearchAgent → DraftingAgent → FormAgent → ComputeAgent → Report
+    
+    Runs are checkpointed; on failure the X-Workflow-Id header names the run,
+    and sending it back as workflow_id resumes from the last completed step.
     """
     session = await get_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    workflow_id = request.workflow_id or uuid.uuid4().hex
     try:
         # Create workflow
         workflow = create_langgraph_workflow()
         
         # Prepare estate data
-        estate_data = {
-            "property_value": request.property_value,
-            "bank_balances": request.bank_balances,
-            "investments": request.investments,
-            "debts": request.debts,
-            "funeral_costs": request.funeral_costs
-        }
+        estate_data = _estate_data_from_request(request)
         
         # Get survey data
-        survey_data = session.get("survey_data", {})
+        survey_data = session.get("survey_data") or {}
         
         # Execute workflow
         print(f"\n🚀 Executing LangGraph workflow for session {session_id}")
-        result = await workflow.execute(session_id, survey_data, estate_data)
+        result = await workflow.execute(session_id, survey_data, estate_data, workflow_id)
         
         # Update task status
-        await update_task_status(
-            session_id=session_id,
-            task_id="legal_financial_workflow",
-            status="completed",
-            results=result
+        await update_task_statuses(
+            session_id,
+            {"legal_financial_workflow": ("completed", result)},
         )
         
         print(f"✅ Workflow completed for session {session_id}")
@@ -519,5 +838,253 @@ async def execute_langgraph_workflow(
         import traceback
         error_detail = f"Workflow failed: {str(e)}\n{traceback.format_exc()}"
         print(f"❌ {error_detail}")
-        raise HTTPException(status_code=500, detail=f"Workflow failed: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Workflow failed: {str(e)}",
+            headers={"X-Workflow-Id": workflow_id},
+        )
+
+
+@app.post(
+    "/sessions/{session_id}/langgraph-workflow/{workflow_id}/nodes/{node}/rerun",
+    response_model=LangGraphWorkflowResponse,
+    tags=["automation"],
+)
+async def rerun_langgraph_node(
+    session_id: int, workflow_id: str, node: str
+) -> LangGraphWorkflowResponse:
+    """
+    Re-run a single node of a checkpointed workflow (bypassing the LLM cache for
+    that node) and the steps downstream of it, returning the refreshed report.
+    """
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        workflow = create_langgraph_workflow()
+        result = None
+        async for event in workflow.rerun_node(session_id, workflow_id, node):
+            if event["event"] == "workflow_complete":
+                result = event["report"]
+    except ImportError:
+        raise HTTPException(
+            status_code=500,
+            detail="LangGraph dependencies not installed. Run: pip install langgraph langchain-google-genai langchain-core",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"❌ Re-running {node} failed for workflow {workflow_id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Workflow failed: {str(e)}",
+            headers={"X-Workflow-Id": workflow_id},
+        )
+
+    await update_task_statuses(
+        session_id,
+        {"legal_financial_workflow": ("completed", result)},
+    )
+    return LangGraphWorkflowResponse(**result)
+
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    """Format a workflow event as a Server-Sent Events frame."""
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@app.post(
+    "/sessions/{session_id}/langgraph-workflow/stream",
+    tags=["automation"],
+)
+async def stream_langgraph_workflow(
+    session_id: int, request: LangGraphWorkflowRequest
+) -> StreamingResponse:
+    """
+    Execute the LangGraph workflow and stream progress as Server-Sent Events.
+    Emits workflow_start, node_start, node_end (with timing and partial output),
+    then workflow_complete carrying the same report as /langgraph-workflow,
+    or a single error event carrying the workflow_id to resume with.
+    """
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        workflow = create_langgraph_workflow()
+    except ImportError:
+        raise HTTPException(
+            status_code=500,
+            detail="LangGraph dependencies not installed. Run: pip install langgraph langchain-google-genai langchain-core",
+        )
+
+    estate_data = _estate_data_from_request(request)
+    survey_data = session.get("survey_data") or {}
+    workflow_id = request.workflow_id or uuid.uuid4().hex
+
+    async def events():
+        try:
+            async for event in workflow.stream(session_id, survey_data, estate_data, workflow_id):
+                if event["event"] == "workflow_complete":
+                    await update_task_statuses(
+                        session_id,
+                        {"legal_financial_workflow": ("completed", event["report"])},
+                    )
+                yield _sse(event)
+        except Exception as e:
+            print(f"❌ Workflow stream failed for session {session_id}: {e}")
+            yield _sse({
+                "event": "error",
+                "detail": f"Workflow failed: {str(e)}",
+                "workflow_id": workflow_id,
+            })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class WorkflowMetricsResponse(BaseModel):
+    session_id: int
+    workflows: Dict[str, Any] = Field(
+        ...,
+        description="Per workflow id: critical path, LLM usage totals and per-node metrics",
+    )
+
+
+@app.get(
+    "/sessions/{session_id}/workflow-metrics",
+    response_model=WorkflowMetricsResponse,
+    tags=["automation"],
+)
+async def get_workflow_metrics(
+    session_id: int, workflow_id: Optional[str] = None
+) -> WorkflowMetricsResponse:
+    """
+    Get the recorded node metrics (wall time, queue time, attempts, LLM calls,
+    cache hits and tokens) of the session's LangGraph runs, including failed ones.
+    """
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    by_workflow: Dict[str, list] = {}
+    for metrics in await list_workflow_metrics(session_id, workflow_id):
+        by_workflow.setdefault(metrics.pop("workflow_id"), []).append(metrics)
+    return WorkflowMetricsResponse(
+        session_id=session_id,
+        workflows={
+            run_id: summarize_node_timings(nodes) for run_id, nodes in by_workflow.items()
+        },
+    )
+
+
+# ===== Background Jobs =====
+
+def _job_handler(request_model, endpoint):
+    """Adapt an automation endpoint into a job handler returning a JSON-able dict."""
+
+    async def handler(session_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = await endpoint(session_id, request_model(**payload))
+        return response.dict()
+
+    return handler
+
+
+JOB_REQUEST_MODELS = {
+    "generate-checklist": ChecklistGenerateRequest,
+    "compute": ComputationRequest,
+    "search-funeral": FuneralSearchRequest,
+    "langgraph-workflow": LangGraphWorkflowRequest,
+}
+
+job_workers = JobWorkerPool(
+    {
+        "generate-checklist": _job_handler(
+            ChecklistGenerateRequest, generate_checklist_endpoint
+        ),
+        "compute": _job_handler(ComputationRequest, compute_endpoint),
+        "search-funeral": _job_handler(FuneralSearchRequest, search_funeral_endpoint),
+        "langgraph-workflow": _job_handler(
+            LangGraphWorkflowRequest, execute_langgraph_workflow
+        ),
+    }
+)
+
+
+@app.on_event("startup")
+async def start_job_workers() -> None:
+    await job_workers.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers() -> None:
+    await job_workers.stop()
+
+
+class JobCreateRequest(BaseModel):
+    """Request to run an automation endpoint in the background"""
+
+    kind: str = Field(
+        ...,
+        description="One of: generate-checklist, compute, search-funeral, langgraph-workflow",
+    )
+    payload: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="The request body the matching endpoint would accept",
+    )
+
+
+class JobResponse(BaseModel):
+    """Status and, once finished, result of a background job"""
+
+    job_id: str
+    session_id: int
+    kind: str
+    status: str
+    attempts: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+@app.post(
+    "/sessions/{session_id}/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    tags=["jobs"],
+)
+async def create_job_endpoint(session_id: int, request: JobCreateRequest) -> JobResponse:
+    """Queue an agent run and return its job id immediately"""
+    request_model = JOB_REQUEST_MODELS.get(request.kind)
+    if request_model is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown job kind '{request.kind}'. Expected one of: {', '.join(JOB_REQUEST_MODELS)}",
+        )
+    try:
+        payload = request_model(**request.payload).dict()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    job_id = await job_workers.enqueue(session_id, request.kind, payload)
+    return JobResponse(**await get_job(job_id))
+
 
+@app.get("/jobs/{job_id}", response_model=JobResponse, tags=["jobs"])
+async def get_job_endpoint(job_id: str) -> JobResponse:
+    """Poll the status of a background job"""
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job)
@@ -0,0 +1,71 @@
+"""
+Bounded, order-preserving parallel execution for per-substep agent calls
+
+Every fan-out runs inside an agent_executor worker, so one limit per call
+would multiply with the executor size. AGENT_FANOUT_LIMIT caps the calls
+in flight across all fan-outs in the process; items beyond it wait.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+DEFAULT_MAX_WORKERS = int(os.environ.get("AGENT_MAX_WORKERS", "4"))
+AGENT_FANOUT_LIMIT = int(os.environ.get("AGENT_FANOUT_LIMIT", "16"))
+
+# Shared by every run_ordered call, whichever thread it runs on
+_fanout_slots = threading.BoundedSemaphore(max(1, AGENT_FANOUT_LIMIT))
+
+
+def run_ordered(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[Dict[str, Any]]:
+    """Runs ``func`` over ``items`` with at most ``max_workers`` calls in flight.
+
+    Each call also holds one of the process-wide AGENT_FANOUT_LIMIT slots.
+    Each call succeeds or fails on its own; an exception in one item never
+    cancels the others.
+
+    Args:
+        func (Callable): the per-item worker
+        items (Iterable): the inputs, typically checklist substeps
+        max_workers (int, optional): the concurrency limit. 1 runs serially.
+
+    Returns:
+        list: one outcome per item, in input order, shaped as
+            {"ok", "result", "error", "error_type", "elapsed_s"}
+    """
+    items = list(items)
+
+    def timed(item: Any) -> Dict[str, Any]:
+        with _fanout_slots:
+            return run(item)
+
+    def run(item: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = func(item)
+            return {
+                "ok": True,
+                "result": result,
+                "error": None,
+                "error_type": None,
+                "elapsed_s": round(time.perf_counter() - start, 3),
+            }
+        except Exception as e:
+            return {
+                "ok": False,
+                "result": None,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "elapsed_s": round(time.perf_counter() - start, 3),
+            }
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [timed(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(timed, items))
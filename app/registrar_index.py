@@ -0,0 +1,278 @@
+"""
+Postcode district -> register office index.
+
+Finding the booking page for a death registration takes the search agent
+a dozen or more model-driven browser steps, yet the answer depends only on
+the postcode district (the outward code, e.g. "WC2E" of "WC2E 8AA"). This
+index remembers the registrar page and booking URL per outward code. It is
+filled from successful ``register_death`` runs and can be bulk-loaded from
+a CSV; the whole table is held in memory, so a lookup is a dict access,
+and every write goes through to SQLite so it survives restarts.
+
+An agent result is only indexed if its booking URL is on a council
+``*.gov.uk`` host and a form was actually seen there during the run.
+Entries older than REGISTRAR_INDEX_TTL_S count as misses, so councils
+that move their booking pages are re-resolved by the agent.
+"""
+import csv
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+from urllib.parse import urlparse
+
+REGISTRAR_INDEX_PATH = Path(
+    os.environ.get("REGISTRAR_INDEX_PATH", Path(__file__).with_name("registrar_index.db"))
+)
+REGISTRAR_INDEX_ENABLED = os.environ.get("REGISTRAR_INDEX_ENABLED", "1") != "0"
+REGISTRAR_INDEX_TTL_S = int(os.environ.get("REGISTRAR_INDEX_TTL_S", str(30 * 24 * 3600)))
+
+_OUTWARD_RE = re.compile(r"^[A-Z]{1,2}[0-9][A-Z0-9]?$")
+_INWARD_RE = re.compile(r"[0-9][A-Z]{2}$")
+
+
+def outward_code(postcode: Optional[str]) -> Optional[str]:
+    """Returns the outward code of a UK postcode or district, or None if it is not one.
+
+    "wc2e 8aa", "WC2E8AA" and "WC2E" all give "WC2E".
+    """
+    if not postcode:
+        return None
+    compact = postcode.replace(" ", "").upper()
+    if len(compact) > 4 and _INWARD_RE.search(compact):
+        compact = compact[:-3]
+    return compact if _OUTWARD_RE.match(compact) else None
+
+
+class RegistrarIndex:
+    """In-memory outward code index backed by a SQLite table. Safe to share across threads."""
+
+    def __init__(self, path: Optional[Path] = REGISTRAR_INDEX_PATH, ttl_s: int = REGISTRAR_INDEX_TTL_S) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0}
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS registrar_index (
+                    outward_code TEXT PRIMARY KEY,
+                    registrar_page TEXT,
+                    booking_url TEXT NOT NULL,
+                    page_title TEXT,
+                    source TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        # Read the table once; every later lookup is served from memory
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    entries = {}
+                    db = self._db()
+                    if db is not None:
+                        for row in db.execute(
+                            "SELECT outward_code, registrar_page, booking_url, page_title, source, updated_at"
+                            " FROM registrar_index"
+                        ):
+                            entries[row[0]] = self._entry(*row)
+                    self._entries = entries
+        return self._entries
+
+    @staticmethod
+    def _entry(
+        code: str,
+        registrar_page: Optional[str],
+        booking_url: str,
+        page_title: Optional[str],
+        source: str,
+        updated_at: float,
+    ) -> Dict[str, Any]:
+        return {
+            "outward_code": code,
+            "registrar_page": registrar_page,
+            "booking_url": booking_url,
+            "page_title": page_title,
+            "source": source,
+            "updated_at": updated_at,
+        }
+
+    def get(self, postcode: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Returns the entry for the postcode's district, or None on a miss or once it has expired."""
+        code = outward_code(postcode)
+        entry = self._load().get(code) if code else None
+        if entry is not None and time.time() - entry["updated_at"] > self.ttl_s:
+            # Kept until the agent's fresh result replaces it
+            self._stats["expired"] += 1
+            entry = None
+        self._stats["hits" if entry is not None else "misses"] += 1
+        return entry
+
+    def put(
+        self,
+        postcode: str,
+        booking_url: str,
+        registrar_page: Optional[str] = None,
+        page_title: Optional[str] = None,
+        source: str = "agent",
+    ) -> Dict[str, Any]:
+        """Stores (or replaces) the entry for the postcode's district and returns it.
+
+        Raises:
+            ValueError: if ``postcode`` is not a UK postcode or outward code
+        """
+        code = outward_code(postcode)
+        if code is None:
+            raise ValueError(f"Not a UK postcode or outward code: {postcode!r}")
+        entries = self._load()
+        entry = self._entry(code, registrar_page, booking_url, page_title, source, time.time())
+        with self._lock:
+            db = self._db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO registrar_index VALUES (?, ?, ?, ?, ?, ?)",
+                    tuple(entry.values()),
+                )
+                db.commit()
+            entries[code] = entry
+            self._stats["stores"] += 1
+        return entry
+
+    def record_result(self, postcode: Optional[str], result: Dict[str, Any], form_urls: Sequence[str]) -> bool:
+        """Indexes a ``register_death`` agent result if it reached a booking form.
+
+        The agent's own ``form_detected`` is not trusted on its own: the
+        booking URL must be on a council ``*.gov.uk`` host (not www.gov.uk)
+        and be one of ``form_urls``, the pages where form fields were seen.
+
+        Returns:
+            bool: whether the result was stored
+        """
+        booking_url = result.get("navigated_url")
+        if not result.get("form_detected") or not booking_url or outward_code(postcode) is None:
+            return False
+        host = (urlparse(booking_url).hostname or "").lower()
+        if not host.endswith(".gov.uk") or host == "www.gov.uk" or booking_url not in form_urls:
+            return False
+        self.put(
+            postcode,
+            booking_url,
+            registrar_page=result.get("registrar_page"),
+            page_title=result.get("page_title"),
+        )
+        return True
+
+    def load_csv(self, path: Path) -> int:
+        """Bulk-loads entries from a CSV file and returns how many were stored.
+
+        The file needs a header row with ``outward_code`` (or ``postcode``)
+        and ``booking_url`` columns, and may have ``registrar_page`` and
+        ``page_title``. Rows without a valid code or a booking URL are skipped.
+        """
+        now = time.time()
+        loaded = {}
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                code = outward_code(row.get("outward_code") or row.get("postcode"))
+                booking_url = (row.get("booking_url") or "").strip()
+                if code is None or not booking_url:
+                    continue
+                loaded[code] = self._entry(
+                    code,
+                    (row.get("registrar_page") or "").strip() or None,
+                    booking_url,
+                    (row.get("page_title") or "").strip() or None,
+                    "csv",
+                    now,
+                )
+        entries = self._load()
+        with self._lock:
+            db = self._db()
+            if db is not None:
+                db.executemany(
+                    "INSERT OR REPLACE INTO registrar_index VALUES (?, ?, ?, ?, ?, ?)",
+                    [tuple(entry.values()) for entry in loaded.values()],
+                )
+                db.commit()
+            entries.update(loaded)
+            self._stats["stores"] += len(loaded)
+        return len(loaded)
+
+    def remove(self, postcode: str) -> bool:
+        """Drops the entry for the postcode's district, e.g. once its booking URL has moved."""
+        code = outward_code(postcode)
+        entries = self._load()
+        with self._lock:
+            if code is None or entries.pop(code, None) is None:
+                return False
+            db = self._db()
+            if db is not None:
+                db.execute("DELETE FROM registrar_index WHERE outward_code = ?", (code,))
+                db.commit()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the number of indexed districts."""
+        stats = dict(self._stats)
+        stats["entries"] = len(self._load())
+        stats["ttl_s"] = self.ttl_s
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+registrar_index = RegistrarIndex()
+
+
+def indexed_registrar(user_inputs: dict) -> Optional[Dict[str, Any]]:
+    """Returns a ``register_death`` result from the index for ``user_inputs``, or None on a miss."""
+    if not REGISTRAR_INDEX_ENABLED:
+        return None
+    entry = registrar_index.get(user_inputs.get("postcode"))
+    if entry is None:
+        return None
+    return {
+        "navigated_url": entry["booking_url"],
+        "page_title": entry["page_title"],
+        "form_detected": True,
+        "next_action_advice": "This is the booking form for your register office. Proceed to fill it out.",
+        "screenshot_path": None,
+        "registrar_page": entry["registrar_page"],
+        "outward_code": entry["outward_code"],
+        "source": "registrar_index",
+    }
+
+
+def remember_registrar(user_inputs: dict, result: Dict[str, Any], form_urls: Sequence[str]) -> None:
+    """Indexes a successful agent result so the next lookup for its district skips the agent.
+
+    ``form_urls`` are the pages where the run actually saw form fields.
+    """
+    if not REGISTRAR_INDEX_ENABLED:
+        return
+    if registrar_index.record_result(user_inputs.get("postcode"), result, form_urls):
+        print(f"📇 Indexed register office for {outward_code(user_inputs.get('postcode'))}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python registrar_index.py <registrars.csv>")
+    print(f"📇 Loaded {registrar_index.load_csv(Path(sys.argv[1]))} districts into {REGISTRAR_INDEX_PATH}")
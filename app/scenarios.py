@@ -0,0 +1,292 @@
+"""
+What-if scenarios for Inheritance Tax and probate.
+
+Takes a base estate and a grid of values for any of its parameters, and
+evaluates every combination at once with NumPy broadcasting: each grid
+parameter gets its own array axis, so nothing is looped over in Python
+and no model is called. The IHT rules mirror ``estate_tax.calculate_iht``.
+"""
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+
+from estate_tax import (
+    IHT_RATE_PERCENT,
+    MAX_TRANSFERRED_BAND_PERCENT,
+    NIL_RATE_BAND,
+    PROBATE_THRESHOLD,
+    RESIDENCE_NIL_RATE_BAND,
+    RNRB_TAPER_THRESHOLD,
+    assess_iht,
+    value_estate,
+)
+
+SCENARIO_MAX_COMBINATIONS = int(os.environ.get("SCENARIO_MAX_COMBINATIONS", "250000"))
+SCENARIO_MAX_ROWS = int(os.environ.get("SCENARIO_MAX_ROWS", "1000"))
+
+# Every parameter a scenario can vary, with its default
+PARAMETERS: Dict[str, float] = {
+    "property_value": 0,
+    "bank_balances": 0,
+    "investments": 0,
+    "other_assets": 0,
+    "debts": 0,
+    "funeral_costs": 3500,
+    # Gifts made in the 7 years before death use up the nil-rate band first
+    "gifts": 0,
+    # The deceased's share of joint assets passing by survivorship (in the IHT estate, not the probate estate)
+    "joint_assets": 0,
+    "spouse_exempt_percent": 0,
+    # The deceased's net interest in their home; follows property_value unless given
+    "residence_value": np.nan,
+    # What the home is worth less than property_value (other property, its mortgage)
+    # while residence_value follows property_value
+    "residence_deductions": 0,
+    "residence_to_descendants": 0,
+    "transferred_nrb_percent": 0,
+    "transferred_rnrb_percent": 0,
+    "nil_rate_band": NIL_RATE_BAND,
+    "residence_nil_rate_band": RESIDENCE_NIL_RATE_BAND,
+    "iht_rate_percent": IHT_RATE_PERCENT,
+    "probate_threshold": PROBATE_THRESHOLD,
+}
+
+def base_from_financial_data(user_data: dict) -> Dict[str, float]:
+    """Reduces a full financial inventory to scenario parameters."""
+    valuation = value_estate(user_data)
+    iht = assess_iht(user_data, valuation)
+    details = user_data.get("tax_and_will_details", {})
+    bands = details.get("iht_thresholds", {})
+
+    by_category: Dict[str, float] = {}
+    for asset in valuation["assets"]:
+        by_category[asset["category"]] = by_category.get(asset["category"], 0) + asset["iht_value"]
+    liabilities = valuation["liabilities"]
+
+    property_value = by_category.get("real_estate", 0)
+    if iht["residence"] is None:
+        # No flagged home, so no residence band whatever the property is worth
+        residence = {"residence_value": 0}
+    else:
+        # Keep the home tied to property_value, so a property grid moves the residence band too
+        residence = {"residence_deductions": property_value - iht["residence_value"]}
+
+    return {
+        "property_value": property_value,
+        "bank_balances": by_category.get("bank_accounts", 0),
+        "investments": by_category.get("investments", 0),
+        "other_assets": by_category.get("personal_chattels", 0),
+        "debts": valuation["total_liabilities"] - liabilities["funeral_costs"],
+        "funeral_costs": liabilities["funeral_costs"],
+        "joint_assets": sum(
+            asset["iht_value"] for asset in valuation["assets"] if not asset["in_probate_estate"]
+        ),
+        "spouse_exempt_percent": (
+            100 * iht["exempt"] / valuation["net_estate"] if valuation["net_estate"] else 0
+        ),
+        **residence,
+        "residence_to_descendants": float(
+            bool(details.get("will_summary", {}).get("residence_to_direct_descendants"))
+        ),
+        "transferred_nrb_percent": details.get("transferred_nil_rate_band_percent", 0),
+        "transferred_rnrb_percent": details.get("transferred_residence_nil_rate_band_percent", 0),
+        "nil_rate_band": bands.get("nil_rate_band", NIL_RATE_BAND),
+        "residence_nil_rate_band": bands.get("residence_nil_rate_band", RESIDENCE_NIL_RATE_BAND),
+        "iht_rate_percent": bands.get("iht_rate_percent", IHT_RATE_PERCENT),
+        "probate_threshold": details.get("probate_thresholds", {}).get("hmcts", PROBATE_THRESHOLD),
+    }
+
+
+def evaluate(params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Calculates IHT and probate need for arrays of parameters.
+
+    Args:
+        params (dict): every name in ``PARAMETERS``, each a scalar or an
+            array; arrays must broadcast against each other
+
+    Returns:
+        dict: one broadcast array per output, plus "probate_required".
+            "total_iht" is the IHT on the estate plus the IHT on gifts
+    """
+    p = {name: np.asarray(value, dtype=float) for name, value in params.items()}
+
+    gross_estate = p["property_value"] + p["bank_balances"] + p["investments"] + p["other_assets"]
+    net_estate = np.maximum(gross_estate - p["debts"] - p["funeral_costs"], 0.0)
+    probate_estate = gross_estate - p["joint_assets"]
+
+    transferred_nrb = np.minimum(p["transferred_nrb_percent"], MAX_TRANSFERRED_BAND_PERCENT)
+    transferred_rnrb = np.minimum(p["transferred_rnrb_percent"], MAX_TRANSFERRED_BAND_PERCENT)
+    nrb_total = p["nil_rate_band"] * (1 + transferred_nrb / 100)
+    # Gifts take the nil-rate band first; only what is left shelters the estate
+    nrb_estate = np.maximum(nrb_total - p["gifts"], 0.0)
+    iht_on_gifts = np.maximum(p["gifts"] - nrb_total, 0.0) * p["iht_rate_percent"] / 100
+
+    residence_value = np.where(
+        np.isnan(p["residence_value"]),
+        np.maximum(p["property_value"] - p["residence_deductions"], 0.0),
+        p["residence_value"],
+    )
+    rnrb_before_taper = p["residence_nil_rate_band"] * (1 + transferred_rnrb / 100)
+    rnrb_taper = np.maximum((net_estate - RNRB_TAPER_THRESHOLD) / 2, 0.0)
+    rnrb_after_taper = np.maximum(rnrb_before_taper - rnrb_taper, 0.0)
+    rnrb_available = np.where(
+        p["residence_to_descendants"] > 0, np.minimum(rnrb_after_taper, residence_value), 0.0
+    )
+
+    chargeable_estate = np.maximum(net_estate * (1 - p["spouse_exempt_percent"] / 100), 0.0)
+    rnrb_used = np.minimum(rnrb_available, chargeable_estate)
+    nrb_used = np.minimum(nrb_estate, chargeable_estate - rnrb_used)
+    taxable_estate = chargeable_estate - rnrb_used - nrb_used
+    iht_due = np.round(taxable_estate * p["iht_rate_percent"] / 100, 2)
+    total_iht = iht_due + np.round(iht_on_gifts, 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        effective_rate = np.where(net_estate > 0, 100 * iht_due / net_estate, 0.0)
+
+    return {
+        "net_estate": net_estate,
+        "taxable_estate": taxable_estate,
+        "iht_due": iht_due,
+        "iht_on_gifts": iht_on_gifts,
+        "total_iht": total_iht,
+        "effective_rate_percent": np.round(effective_rate, 2),
+        "probate_required": probate_estate > p["probate_threshold"],
+    }
+
+
+def _scalar_result(outputs: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    return {
+        name: bool(value) if name == "probate_required" else float(value)
+        for name, value in outputs.items()
+    }
+
+
+def run_scenarios(
+    base: Dict[str, Any],
+    grid: Dict[str, List[float]],
+    include_rows: bool = False,
+    max_rows: int = SCENARIO_MAX_ROWS,
+) -> Dict[str, Any]:
+    """Evaluates every combination of the grid values against a base estate.
+
+    Args:
+        base (dict): flat estate figures (any of ``PARAMETERS``, e.g. the
+            LangGraph workflow request fields) or a full financial inventory
+            shaped like ``generate_random_financial_data()``
+        grid (dict): parameter name -> values to try
+        include_rows (bool, optional): also return one row per combination
+        max_rows (int, optional): the most rows to return
+
+    Raises:
+        ValueError: for an unknown base figure, an unknown or empty grid
+            parameter, a non-finite base or grid value, or a grid with more
+            than SCENARIO_MAX_COMBINATIONS combinations
+
+    Returns:
+        dict: {"base", "scenarios", "parameters", "summary", "sensitivity",
+            "ranking", "rows"?}. "summary" and "sensitivity" report the total
+            IHT (estate plus gifts): "sensitivity" holds, per grid parameter
+            and value, its min/mean/max over every other combination and the
+            share of them that need probate; "ranking" orders the grid
+            parameters by how far they move the mean total IHT
+    """
+    if isinstance(base.get("assets"), dict):
+        base_params = base_from_financial_data(base)
+    else:
+        unknown = sorted(name for name, value in base.items() if name not in PARAMETERS and value is not None)
+        if unknown:
+            raise ValueError(f"Unknown scenario parameters: {', '.join(unknown)}")
+        base_params = {name: base[name] for name in PARAMETERS if base.get(name) is not None}
+    params: Dict[str, Any] = {**PARAMETERS, **base_params}
+
+    unknown = sorted(set(grid) - set(PARAMETERS))
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters: {', '.join(unknown)}")
+    empty = sorted(name for name, values in grid.items() if not values)
+    if empty:
+        raise ValueError(f"No values given for: {', '.join(empty)}")
+    # NaN or infinity would only come back as a figure that cannot be sent as JSON
+    non_finite = sorted(
+        name
+        for name, values in [*base_params.items(), *grid.items()]
+        if not np.isfinite(np.asarray(values, dtype=float)).all()
+    )
+    if non_finite:
+        raise ValueError(f"Values must be finite numbers: {', '.join(non_finite)}")
+
+    names = list(grid)
+    shape = tuple(len(grid[name]) for name in names)
+    combinations = int(np.prod(shape, dtype=np.int64)) if names else 1
+    if combinations > SCENARIO_MAX_COMBINATIONS:
+        raise ValueError(
+            f"{combinations:,} combinations requested; the limit is {SCENARIO_MAX_COMBINATIONS:,}"
+        )
+
+    base_result = _scalar_result(evaluate(params))
+
+    # Give each grid parameter its own axis so the arrays broadcast to the full grid
+    for axis, name in enumerate(names):
+        axis_shape = [1] * len(names)
+        axis_shape[axis] = shape[axis]
+        params[name] = np.asarray(grid[name], dtype=float).reshape(axis_shape)
+    outputs = {
+        name: np.broadcast_to(value, shape) for name, value in evaluate(params).items()
+    }
+    total_iht = outputs["total_iht"]
+    probate = outputs["probate_required"]
+
+    sensitivity = {}
+    swing = {}
+    for axis, name in enumerate(names):
+        others = tuple(i for i in range(len(names)) if i != axis)
+        mean_iht = total_iht.mean(axis=others)
+        sensitivity[name] = [
+            {
+                "value": value,
+                "iht_min": float(low),
+                "iht_mean": round(float(mean), 2),
+                "iht_max": float(high),
+                "probate_required_share": round(float(share), 4),
+            }
+            for value, low, mean, high, share in zip(
+                grid[name],
+                total_iht.min(axis=others),
+                mean_iht,
+                total_iht.max(axis=others),
+                probate.mean(axis=others),
+            )
+        ]
+        swing[name] = round(float(mean_iht.max() - mean_iht.min()), 2)
+
+    result: Dict[str, Any] = {
+        "base": {"parameters": base_params, **base_result},
+        "scenarios": combinations,
+        "parameters": names,
+        "summary": {
+            "iht_min": float(total_iht.min()),
+            "iht_mean": round(float(total_iht.mean()), 2),
+            "iht_max": float(total_iht.max()),
+            "iht_due_share": round(float((total_iht > 0).mean()), 4),
+            "probate_required_share": round(float(probate.mean()), 4),
+        },
+        "sensitivity": sensitivity,
+        "ranking": [
+            {"parameter": name, "iht_mean_swing": swing[name]}
+            for name in sorted(swing, key=swing.get, reverse=True)
+        ],
+    }
+
+    if include_rows:
+        rows = []
+        for index in np.ndindex(shape):
+            if len(rows) >= max_rows:
+                break
+            rows.append(
+                {
+                    **{name: grid[name][i] for name, i in zip(names, index)},
+                    **_scalar_result({key: value[index] for key, value in outputs.items()}),
+                }
+            )
+        result["rows"] = rows
+    return result
@@ -1,18 +1,19 @@
 # search.py
+import asyncio
 import os
 import json
-import threading
-from typing import Optional
+from contextvars import ContextVar
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from strands import Agent, tool
 from strands.models.gemini import GeminiModel
 from string import Template
 
-from playwright.sync_api import (
-    sync_playwright, Page, Browser, BrowserContext,
-    TimeoutError as PWTimeout
-)
+from playwright.async_api import Page, TimeoutError as PWTimeout
+
+from browser_pool import browser_pool
+from registrar_index import indexed_registrar, remember_registrar
 
 import re
 
@@ -29,84 +30,29 @@ model = GeminiModel(
 )
 
 # -------------------------------------------------------------------
-# Shared headful Playwright browser
-# -------------------------------------------------------------------
-class SharedBrowser:
-    _lock = threading.Lock()
-    _playwright = None
-    _browser: Optional[Browser] = None
-    _context: Optional[BrowserContext] = None
-    _page: Optional[Page] = None
-
-    @classmethod
-    def get_page(cls, headless: bool = False) -> Page:
-        with cls._lock:
-            if cls._playwright is None:
-                cls._playwright = sync_playwright().start()
-            if cls._browser is None:
-                cls._browser = cls._playwright.chromium.launch(headless=headless)
-            if cls._context is None:
-                cls._context = cls._browser.new_context(viewport={"width": 1280, "height": 900})
-            if cls._page is None or cls._page.is_closed():
-                cls._page = cls._context.new_page()
-            return cls._page
-
-    @classmethod
-    def close(cls):
-        # Call from the same thread where it was opened
-        with cls._lock:
-            try:
-                if cls._context:
-                    cls._context.close()
-                if cls._browser:
-                    cls._browser.close()
-                if cls._playwright:
-                    cls._playwright.stop()
-            finally:
-                cls._context = None
-                cls._browser = None
-                cls._playwright = None
-
-# -------------------------------------------------------------------
-# Minimal navigation tools (NO form filling)
+# Page actions
 # -------------------------------------------------------------------
-@tool
-def browser_open(url: str, headless: bool = False, timeout_ms: int = 15000) -> str:
-    """
-    Open a URL. Returns: {"ok": bool, "url": "...", "title": "..."}
-    """
-    page = SharedBrowser.get_page(headless=headless)
+# Each coroutine runs on browser_pool's driver loop against one page and
+# returns the tool's JSON. The tools below only wrap them.
+async def _open(page: Page, url: str, timeout_ms: int) -> str:
     try:
-        page.goto(url, timeout=timeout_ms, wait_until="domcontentloaded")
-        return json.dumps({"ok": True, "url": page.url, "title": page.title()})
+        navigation = await browser_pool.navigate(page, url, timeout_ms)
+        return json.dumps({"ok": True, "url": page.url, "title": await page.title(), "navigation": navigation})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
-    
-@tool
-def browser_click_role_button(name_regex: str, timeout_ms: int = 15000) -> str:
-    """
-    Click a <button> by its accessible name using a regex (case-insensitive).
-    Example: browser_click_role_button("find.*register office")
-    """
-    page = SharedBrowser.get_page()
+
+async def _click_role(page: Page, role: str, name_regex: str, timeout_ms: int) -> str:
     try:
-        loc = page.get_by_role("button", name=re.compile(name_regex, re.I))
-        loc.first.click(timeout=timeout_ms)
-        return json.dumps({"ok": True, "selector": f"role=button name~/{name_regex}/i", "url": page.url})
+        loc = page.get_by_role(role, name=re.compile(name_regex, re.I))
+        await loc.first.click(timeout=timeout_ms)
+        return json.dumps({"ok": True, "selector": f"role={role} name~/{name_regex}/i", "url": page.url})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
 
-
-@tool
-def browser_query_links(max_links: int = 100, only_gov_uk: bool = True) -> str:
-    """
-    Return visible links: {"ok": true, "links":[{"text":"..","href":".."}]}
-    If only_gov_uk=True, filters to *.gov.uk domains.
-    """
+async def _query_links(page: Page, max_links: int, only_gov_uk: bool) -> str:
     from urllib.parse import urlparse
-    page = SharedBrowser.get_page()
     try:
-        links = page.eval_on_selector_all(
+        links = await page.eval_on_selector_all(
             "a",
             "els => els.map(e => ({text:(e.innerText||'').trim(), href:e.href||''}))"
         )
@@ -122,133 +68,189 @@ def browser_query_links(max_links: int = 100, only_gov_uk: bool = True) -> str:
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
 
-@tool
-def browser_click(selector: str, timeout_ms: int = 15000) -> str:
-    """
-    Click a CSS selector. Returns: {"ok": bool, "selector": "...", "url": "..."}
-    """
-    page = SharedBrowser.get_page()
+async def _click(page: Page, selector: str, timeout_ms: int) -> str:
     try:
-        page.wait_for_selector(selector, timeout=timeout_ms)
-        page.click(selector)
+        await page.wait_for_selector(selector, timeout=timeout_ms)
+        await page.click(selector)
         return json.dumps({"ok": True, "selector": selector, "url": page.url})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
 
-@tool
-def browser_click_text(text: str, exact: bool = False, timeout_ms: int = 15000) -> str:
-    """
-    Click by visible text. Returns: {"ok": bool, "selector": "text=...", "url": "..."}
-    """
-    page = SharedBrowser.get_page()
+async def _click_text(page: Page, text: str, exact: bool, timeout_ms: int) -> str:
     try:
         sel = f'text={"="+text if exact else text}'
-        page.wait_for_selector(sel, timeout=timeout_ms)
-        page.click(sel)
+        await page.wait_for_selector(sel, timeout=timeout_ms)
+        await page.click(sel)
         return json.dumps({"ok": True, "selector": sel, "url": page.url})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
 
-@tool
-def browser_wait(selector: str, state: str = "visible", timeout_ms: int = 15000) -> str:
-    """
-    Wait for selector state: visible|attached|detached|hidden.
-    Returns: {"ok": bool, "selector": "..."}
-    """
-    page = SharedBrowser.get_page()
+async def _wait(page: Page, selector: str, state: str, timeout_ms: int) -> str:
     try:
-        page.wait_for_selector(selector, state=state, timeout=timeout_ms)
+        await page.wait_for_selector(selector, state=state, timeout=timeout_ms)
         return json.dumps({"ok": True, "selector": selector})
     except PWTimeout:
         return json.dumps({"ok": False, "error": f"Timeout waiting for {selector} [{state}]"})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
 
-@tool
-def browser_scroll(pixels: int = 800, repeats: int = 1, delay_ms: int = 200) -> str:
-    """
-    Scroll down by pixels, repeats. Returns: {"ok": true, "scrolls": n}
-    """
-    import time
-    page = SharedBrowser.get_page()
+async def _scroll(page: Page, pixels: int, repeats: int, delay_ms: int) -> str:
     try:
         for _ in range(max(1, repeats)):
-            page.evaluate("window.scrollBy(0, arguments[0]);", pixels)
-            time.sleep(delay_ms/1000.0)
+            await page.evaluate("(px) => window.scrollBy(0, px)", pixels)
+            await asyncio.sleep(delay_ms/1000.0)
         return json.dumps({"ok": True, "scrolls": max(1, repeats)})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
 
-@tool
-def browser_current_url() -> str:
-    """Return {"ok": true, "url": "...", "title": "..."}"""
-    page = SharedBrowser.get_page()
-    return json.dumps({"ok": True, "url": page.url, "title": page.title()})
+async def _current_url(page: Page) -> str:
+    return json.dumps({"ok": True, "url": page.url, "title": await page.title()})
 
-@tool
-def browser_screenshot(path: str = "page.png", full_page: bool = False) -> str:
-    """Return {"ok": bool, "path": "..."}"""
-    page = SharedBrowser.get_page()
+async def _screenshot(page: Page, path: str, full_page: bool) -> str:
     try:
-        page.screenshot(path=path, full_page=full_page)
+        await page.screenshot(path=path, full_page=full_page)
         return json.dumps({"ok": True, "path": os.path.abspath(path)})
     except Exception as e:
         return json.dumps({"ok": False, "error": str(e)})
-    
-@tool 
-def browser_fill(selector: str, value: str) -> str:
-    """ Fill a text input/textarea identified by CSS/XPath selector. Returns: {"ok": bool, "selector": "...", "value_len": int} """ 
-    page = SharedBrowser.get_page() 
+
+async def _fill(page: Page, selector: str, value: str) -> str:
     try: 
-        page.fill(selector, value) 
+        await page.fill(selector, value) 
         return json.dumps({"ok": True, "selector": selector, "value_len": len(value)}) 
     except Exception as e: 
         return json.dumps({"ok": False, "error": str(e)})
 
+async def _click_any_text(page: Page, texts_pipe: str, timeout_ms: int) -> str:
+    tried = []
+    for t in [s.strip() for s in texts_pipe.split("|") if s.strip()]:
+        tried.append(t)
+        try:
+            sel = f"text={t}"
+            await page.wait_for_selector(sel, timeout=min(3000, timeout_ms))
+            await page.click(sel)
+            return json.dumps({"ok": True, "selector": sel, "clicked_text": t, "url": page.url})
+        except Exception:
+            continue
+    return json.dumps({"ok": False, "error": f"No clickable text among: {tried}"})
+
+async def _has_form_fields(page: Page, timeout_ms: int, form_urls: Optional[List[str]]) -> str:
+    try:
+        await page.wait_for_selector("input, select, textarea", state="visible", timeout=timeout_ms)
+        if form_urls is not None:
+            form_urls.append(page.url)
+        return json.dumps({"ok": True, "has_fields": True})
+    except Exception:
+        return json.dumps({"ok": True, "has_fields": False})
+
+# Set during a register_death run: the pages where browser_has_form_fields saw a form
+_form_urls: ContextVar[Optional[List[str]]] = ContextVar("registrar_form_urls", default=None)
+
+# -------------------------------------------------------------------
+# Minimal navigation tools (NO form filling)
+# -------------------------------------------------------------------
+# Each tool runs against the page of the browser_pool context leased by the
+# current agent run (see register_death), so concurrent runs don't collide.
+# The agent awaits the pool's driver loop instead of parking a thread per
+# tool call, so many concurrent navigations share one event loop.
+@tool
+async def browser_open(url: str, headless: bool = False, timeout_ms: int = 15000) -> str:
+    """
+    Open a URL. Returns: {"ok": bool, "url": "...", "title": "...", "navigation": {...}}
+    The pool's BROWSER_HEADLESS setting decides headless mode; the argument is kept for compatibility.
+    """
+    return await browser_pool.acall(lambda page: _open(page, url, timeout_ms))
+
+@tool
+async def browser_click_role_button(name_regex: str, timeout_ms: int = 15000) -> str:
+    """
+    Click a <button> by its accessible name using a regex (case-insensitive).
+    Example: browser_click_role_button("find.*register office")
+    """
+    return await browser_pool.acall(lambda page: _click_role(page, "button", name_regex, timeout_ms))
+
+@tool
+async def browser_query_links(max_links: int = 100, only_gov_uk: bool = True) -> str:
+    """
+    Return visible links: {"ok": true, "links":[{"text":"..","href":".."}]}
+    If only_gov_uk=True, filters to *.gov.uk domains.
+    """
+    return await browser_pool.acall(lambda page: _query_links(page, max_links, only_gov_uk))
+
+@tool
+async def browser_click(selector: str, timeout_ms: int = 15000) -> str:
+    """
+    Click a CSS selector. Returns: {"ok": bool, "selector": "...", "url": "..."}
+    """
+    return await browser_pool.acall(lambda page: _click(page, selector, timeout_ms))
+
+@tool
+async def browser_click_text(text: str, exact: bool = False, timeout_ms: int = 15000) -> str:
+    """
+    Click by visible text. Returns: {"ok": bool, "selector": "text=...", "url": "..."}
+    """
+    return await browser_pool.acall(lambda page: _click_text(page, text, exact, timeout_ms))
+
+@tool
+async def browser_wait(selector: str, state: str = "visible", timeout_ms: int = 15000) -> str:
+    """
+    Wait for selector state: visible|attached|detached|hidden.
+    Returns: {"ok": bool, "selector": "..."}
+    """
+    return await browser_pool.acall(lambda page: _wait(page, selector, state, timeout_ms))
+
 @tool
-def browser_click_role_link(name_regex: str, timeout_ms: int = 15000) -> str:
+async def browser_scroll(pixels: int = 800, repeats: int = 1, delay_ms: int = 200) -> str:
+    """
+    Scroll down by pixels, repeats. Returns: {"ok": true, "scrolls": n}
+    """
+    return await browser_pool.acall(lambda page: _scroll(page, pixels, repeats, delay_ms))
+
+@tool
+async def browser_current_url() -> str:
+    """Return {"ok": true, "url": "...", "title": "..."}"""
+    return await browser_pool.acall(_current_url)
+
+@tool
+async def browser_screenshot(path: str = "page.png", full_page: bool = False) -> str:
+    """Return {"ok": bool, "path": "..."}"""
+    return await browser_pool.acall(lambda page: _screenshot(page, path, full_page))
+
+@tool
+async def browser_fill(selector: str, value: str) -> str:
+    """ Fill a text input/textarea identified by CSS/XPath selector. Returns: {"ok": bool, "selector": "...", "value_len": int} """
+    return await browser_pool.acall(lambda page: _fill(page, selector, value))
+
+@tool
+async def browser_click_role_link(name_regex: str, timeout_ms: int = 15000) -> str:
     """
     Click an <a> by its accessible name (regex, case-insensitive).
     Example: browser_click_role_link("book.*(appointment|online)")
     """
-    page = SharedBrowser.get_page()
-    try:
-        loc = page.get_by_role("link", name=re.compile(name_regex, re.I))
-        loc.first.click(timeout=timeout_ms)
-        return json.dumps({"ok": True, "selector": f"role=link name~/{name_regex}/i", "url": page.url})
-    except Exception as e:
-        return json.dumps({"ok": False, "error": str(e)})
+    return await browser_pool.acall(lambda page: _click_role(page, "link", name_regex, timeout_ms))
 
 @tool
-def browser_click_any_text(texts_pipe: str, timeout_ms: int = 15000) -> str:
+async def browser_click_any_text(texts_pipe: str, timeout_ms: int = 15000) -> str:
     """
     Try multiple visible text targets (pipe-separated) and click the first that works.
     Example: browser_click_any_text("Start|Continue|Next|Book online|Book now")
     """
-    page = SharedBrowser.get_page()
-    tried = []
-    for t in [s.strip() for s in texts_pipe.split("|") if s.strip()]:
-        tried.append(t)
-        try:
-            sel = f"text={t}"
-            page.wait_for_selector(sel, timeout=min(3000, timeout_ms))
-            page.click(sel)
-            return json.dumps({"ok": True, "selector": sel, "clicked_text": t, "url": page.url})
-        except Exception:
-            continue
-    return json.dumps({"ok": False, "error": f"No clickable text among: {tried}"})
+    return await browser_pool.acall(lambda page: _click_any_text(page, texts_pipe, timeout_ms))
 
 @tool
-def browser_has_form_fields(timeout_ms: int = 8000) -> str:
+async def browser_has_form_fields(timeout_ms: int = 8000) -> str:
     """
     Returns {"ok": true, "has_fields": bool}. True when any input/select/textarea is visible.
     """
-    page = SharedBrowser.get_page()
-    try:
-        page.wait_for_selector("input, select, textarea", state="visible", timeout=timeout_ms)
-        return json.dumps({"ok": True, "has_fields": True})
-    except Exception:
-        return json.dumps({"ok": True, "has_fields": False})
+    # Read here: the page action runs on the pool's loop, outside this context
+    form_urls = _form_urls.get()
+    return await browser_pool.acall(lambda page: _has_form_fields(page, timeout_ms, form_urls))
+
+BROWSER_TOOLS = [
+    browser_open, browser_query_links, browser_click, browser_click_text,
+    browser_wait, browser_scroll, browser_current_url, browser_screenshot,
+    browser_fill, browser_click_role_button,
+    browser_click_role_link, browser_click_any_text, browser_has_form_fields
+]
 
 # -------------------------------------------------------------------
 # Task template (use ${} to avoid str.format brace collisions)
@@ -320,16 +322,7 @@ def build_general_task(user_inputs: dict, config: dict) -> str:
 # -------------------------------------------------------------------
 # Orchestrator
 # -------------------------------------------------------------------
-@tool
-def register_death(user_inputs: dict):
-    """
-    user_inputs example:
-    {
-      "death_location": "Covent Garden, London, UK",
-      "postcode": "WC2E 8AA",
-      "preferred_borough": "Camden"     # optional
-    }
-    """
+def build_registrar_config(user_inputs: dict) -> dict:
     # Build a query that avoids filling forms: we push the query via URL parameters.
     location = user_inputs.get("death_location", "")
     borough_filter = f" site:.gov.uk"
@@ -377,16 +370,10 @@ def register_death(user_inputs: dict):
             "phrases_any": ["register a death", "book an appointment", "certificate for burial or cremation"]
         }
     }
+    return config
 
-    tools = [
-        browser_open, browser_query_links, browser_click, browser_click_text,
-        browser_wait, browser_scroll, browser_current_url, browser_screenshot,
-        browser_fill, browser_click_role_button,
-        browser_click_role_link, browser_click_any_text, browser_has_form_fields
-    ]
-    agent = Agent(tools=tools, model=model)
-    task = build_general_task(user_inputs, config)
-    result = agent(task)
+
+def parse_agent_json(result) -> dict:
     # Extract the plain text (what the model produced)
     text = getattr(result, "text", str(result)).strip()
 
@@ -396,8 +383,36 @@ def register_death(user_inputs: dict):
     if text.endswith("```"):
         text = text[:-3]
     text = text.strip()
-    data = json.loads(text)
-    return data
+    return json.loads(text)
+
+@tool
+async def register_death(user_inputs: dict):
+    """
+    user_inputs example:
+    {
+      "death_location": "Covent Garden, London, UK",
+      "postcode": "WC2E 8AA",
+      "preferred_borough": "Camden"     # optional
+    }
+    """
+    # The register office only depends on the postcode district; the agent runs on a miss
+    indexed = indexed_registrar(user_inputs)
+    if indexed is not None:
+        return indexed
+    config = build_registrar_config(user_inputs)
+    agent = Agent(tools=BROWSER_TOOLS, model=model)
+    task = build_general_task(user_inputs, config)
+    # Runs entirely on the caller's event loop; only the page work happens on the pool's loop
+    form_urls: List[str] = []
+    token = _form_urls.set(form_urls)
+    try:
+        async with browser_pool.alease():
+            result = await agent.invoke_async(task)
+    finally:
+        _form_urls.reset(token)
+    resolved = parse_agent_json(result)
+    await asyncio.to_thread(remember_registrar, user_inputs, resolved, form_urls)
+    return resolved
 
 # Finds funeral homes in a location
 @tool
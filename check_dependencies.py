@@ -11,7 +11,8 @@ required_packages = {
     'python-dotenv': 'dotenv',
     'aiosqlite': 'aiosqlite',
     'bcrypt': 'bcrypt',
-    'google-genai': 'google.genai'
+    'google-genai': 'google.genai',
+    'numpy': 'numpy'
 }
 
 missing_packages = []
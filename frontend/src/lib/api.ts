@@ -80,11 +80,31 @@ export interface ChecklistRequest {
   location?: string;
   relationship?: string;
   additional_context?: string;
+  // Generate a new version even if the survey answers have not changed
+  regenerate?: boolean;
 }
 
 export interface ChecklistResponse {
   checklist: any;
   message: string;
+  version?: number | null;
+}
+
+export interface ChecklistRecord {
+  session_id: number;
+  version: number;
+  fingerprint: string;
+  checklist: any;
+  created_at: string;
+  versions: Array<{ version: number; fingerprint: string; created_at: string }>;
+}
+
+export async function getChecklist(
+  sessionId: number,
+  version?: number,
+): Promise<ChecklistRecord> {
+  const query = version === undefined ? "" : `?version=${version}`;
+  return request<ChecklistRecord>(`/sessions/${sessionId}/checklist${query}`);
 }
 
 export async function generateChecklist(
@@ -97,17 +117,27 @@ export async function generateChecklist(
       location: data.location || "UK",
       relationship: data.relationship || "Family member",
       additional_context: data.additional_context || "",
+      regenerate: data.regenerate || false,
     }),
   });
 }
 
 export interface ComputationRequest {
   user_data: any;
-  task_data: any;
+  // Defaults to the session's stored checklist
+  task_data?: any;
+  // Add a model-written summary to each calculated result
+  narrative?: boolean;
 }
 
 export interface ComputationResponse {
-  results: Array<{ id: string; body: string }>;
+  results: Array<{
+    id: string;
+    body: string;
+    status?: "ok" | "failed";
+    elapsed_s?: number;
+    error?: { type: string; message: string };
+  }>;
   message: string;
 }
 
@@ -121,6 +151,60 @@ export async function runComputations(
   });
 }
 
+export interface ScenarioRequest {
+  // Flat estate figures (LangGraphWorkflowRequest fields) or a full financial inventory
+  base: Record<string, any>;
+  // Values to try per parameter, e.g. { property_value: [400000, 500000], gifts: [0, 50000] }
+  grid: Record<string, number[]>;
+  include_rows?: boolean;
+}
+
+export interface ScenarioOutcome {
+  net_estate: number;
+  taxable_estate: number;
+  iht_due: number;
+  iht_on_gifts: number;
+  // iht_due + iht_on_gifts; what summary, sensitivity and ranking report
+  total_iht: number;
+  effective_rate_percent: number;
+  probate_required: boolean;
+}
+
+export interface ScenarioResponse {
+  base: ScenarioOutcome & { parameters: Record<string, number> };
+  scenarios: number;
+  parameters: string[];
+  summary: {
+    iht_min: number;
+    iht_mean: number;
+    iht_max: number;
+    iht_due_share: number;
+    probate_required_share: number;
+  };
+  sensitivity: Record<
+    string,
+    Array<{
+      value: number;
+      iht_min: number;
+      iht_mean: number;
+      iht_max: number;
+      probate_required_share: number;
+    }>
+  >;
+  ranking: Array<{ parameter: string; iht_mean_swing: number }>;
+  rows?: Array<ScenarioOutcome & Record<string, number | boolean>> | null;
+}
+
+export async function runScenarios(
+  sessionId: number,
+  data: ScenarioRequest,
+): Promise<ScenarioResponse> {
+  return request<ScenarioResponse>(`/sessions/${sessionId}/scenarios`, {
+    method: "POST",
+    body: JSON.stringify(data),
+  });
+}
+
 export interface FinancialAssessmentResponse {
   needs_probate_check: boolean;
   needs_iht_calculation: boolean;
@@ -216,6 +300,16 @@ export interface LangGraphWorkflowRequest {
   investments: number;
   debts: number;
   funeral_costs: number;
+  // Resume an earlier (failed) run from its last completed step
+  workflow_id?: string;
+}
+
+export interface WorkflowUsage {
+  llm_calls: number;
+  cache_hits: number;
+  input_tokens: number;
+  output_tokens: number;
+  retries: number;
 }
 
 export interface WorkflowStep {
@@ -223,9 +317,34 @@ export interface WorkflowStep {
   agent: string;
   status: string;
   duration: string;
+  metrics?: WorkflowUsage & { duration_s: number };
   outputs: string[];
 }
 
+export interface WorkflowNodeMetrics {
+  node: string;
+  branch: string;
+  task_id?: string;
+  step: number;
+  started_at?: number;
+  elapsed_s: number;
+  queue_s?: number;
+  attempts?: number;
+  llm_calls?: number;
+  cache_hits?: number;
+  input_tokens?: number;
+  output_tokens?: number;
+  llm_elapsed_s?: number;
+}
+
+export interface WorkflowPerformance {
+  critical_path_s: number;
+  serial_s: number;
+  branches: Record<string, number>;
+  totals?: WorkflowUsage;
+  nodes: WorkflowNodeMetrics[];
+}
+
 export interface LangGraphWorkflowResponse {
   workflow_id: string;
   status: string;
@@ -273,6 +392,8 @@ export interface LangGraphWorkflowResponse {
     discrepancies: any[];
     timestamp: string;
   };
+  pruned_branches?: Array<{ node: string; reason: string }>;
+  performance?: WorkflowPerformance;
 }
 
 export async function executeLangGraphWorkflow(
@@ -288,3 +409,169 @@ export async function executeLangGraphWorkflow(
   );
 }
 
+export async function rerunLangGraphNode(
+  sessionId: number,
+  workflowId: string,
+  node: string,
+): Promise<LangGraphWorkflowResponse> {
+  return request<LangGraphWorkflowResponse>(
+    `/sessions/${sessionId}/langgraph-workflow/${workflowId}/nodes/${node}/rerun`,
+    { method: "POST" }
+  );
+}
+
+export interface WorkflowMetricsResponse {
+  session_id: number;
+  workflows: Record<string, WorkflowPerformance>;
+}
+
+export async function getWorkflowMetrics(
+  sessionId: number,
+  workflowId?: string,
+): Promise<WorkflowMetricsResponse> {
+  const query = workflowId ? `?workflow_id=${encodeURIComponent(workflowId)}` : "";
+  return request<WorkflowMetricsResponse>(`/sessions/${sessionId}/workflow-metrics${query}`);
+}
+
+
+export type WorkflowStreamEvent =
+  | {
+      event: "workflow_start";
+      session_id: number;
+      workflow_id: string;
+      resumed: boolean;
+      timestamp: string;
+    }
+  | { event: "node_start"; node: string; step: number; timestamp: string }
+  | {
+      event: "node_end";
+      node: string;
+      step: number;
+      elapsed_s: number;
+      error: string | null;
+      summary: string | null;
+      output: Record<string, unknown>;
+    }
+  | {
+      event: "workflow_complete";
+      workflow_id: string;
+      completed_steps: string[];
+      elapsed_s: number;
+      report: LangGraphWorkflowResponse;
+    }
+  | { event: "error"; detail: string; workflow_id: string };
+
+/**
+ * POSTs to a Server-Sent Events endpoint and yields each event's JSON payload
+ * as it arrives.
+ */
+async function* postEventStream<E>(path: string, body: unknown): AsyncGenerator<E> {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok || !response.body) {
+    const message = await response.text();
+    throw new Error(message || `Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      const dataLine = frame.split("\n").find((line) => line.startsWith("data:"));
+      if (!dataLine) continue;
+
+      yield JSON.parse(dataLine.slice(5).trim()) as E;
+    }
+  }
+}
+
+/**
+ * Runs the LangGraph workflow and reports real progress as the server streams
+ * Server-Sent Events. Resolves with the final report.
+ */
+export async function streamLangGraphWorkflow(
+  sessionId: number,
+  data: LangGraphWorkflowRequest,
+  onEvent: (event: WorkflowStreamEvent) => void,
+): Promise<LangGraphWorkflowResponse> {
+  for await (const event of postEventStream<WorkflowStreamEvent>(
+    `/sessions/${sessionId}/langgraph-workflow/stream`,
+    data,
+  )) {
+    onEvent(event);
+    if (event.event === "error") {
+      throw new Error(event.detail);
+    }
+    if (event.event === "workflow_complete") {
+      return event.report;
+    }
+  }
+
+  throw new Error("Workflow stream ended before completion");
+}
+
+export type ChecklistStreamEvent =
+  | { event: "meta"; meta: any; elapsed_s: number }
+  | { event: "step"; step: any; elapsed_s: number }
+  | { event: "complete"; checklist: any; elapsed_s: number; version: number | null }
+  | { event: "error"; detail: string };
+
+/**
+ * Generates the checklist, calling onEvent with each step as soon as the model
+ * finishes it. Resolves with the complete checklist.
+ */
+export async function streamChecklist(
+  sessionId: number,
+  data: ChecklistRequest,
+  onEvent: (event: ChecklistStreamEvent) => void,
+): Promise<any> {
+  for await (const event of postEventStream<ChecklistStreamEvent>(
+    `/sessions/${sessionId}/generate-checklist/stream`,
+    {
+      location: data.location || "UK",
+      relationship: data.relationship || "Family member",
+      additional_context: data.additional_context || "",
+      regenerate: data.regenerate || false,
+    },
+  )) {
+    onEvent(event);
+    if (event.event === "error") {
+      throw new Error(event.detail);
+    }
+    if (event.event === "complete") {
+      return event.checklist;
+    }
+  }
+
+  throw new Error("Checklist stream ended before completion");
+}
+
+// Position of each workflow node in the agent pipeline shown by the UI (1-based).
+// Branches run in parallel, so several nodes can share a position.
+export const WORKFLOW_NODE_STEPS: Record<string, number> = {
+  search: 1,
+  iht_guidance: 2,
+  probate_guidance: 2,
+  notify_bank: 3,
+  submit_government: 3,
+  validate: 4,
+  report: 5,
+};
@@ -4,9 +4,9 @@ import { useToast } from "@/components/ui/use-toast";
 import {
   getFinancialAssessment,
   runComputations,
-  fetchSurveySession,
   getTaskStatuses,
-  executeLangGraphWorkflow,
+  streamLangGraphWorkflow,
+  WORKFLOW_NODE_STEPS,
   type LangGraphWorkflowResponse,
 } from "@/lib/api";
 import { SESSION_STORAGE_KEY } from "@/lib/config";
@@ -174,14 +174,6 @@ const FinancialProcedure = () => {
       if (showAllAgents) {
         // === NEW: Use LangGraph Multi-Agent Workflow ===
         
-        // Simulate step-by-step progress for UI
-        const stepInterval = setInterval(() => {
-          setCurrentAgentStep(prev => {
-            if (prev < 4) return prev + 1;
-            return prev;
-          });
-        }, 2500);
-        
         // Extract estate values from example data
         const estateData = {
           property_value: useExampleData ? 450000 : 0,
@@ -191,10 +183,13 @@ const FinancialProcedure = () => {
           funeral_costs: useExampleData ? 4500 : 3500
         };
         
-        // Execute LangGraph workflow
-        const workflowResponse = await executeLangGraphWorkflow(sessionId, estateData);
+        // Execute LangGraph workflow, advancing the UI as each agent finishes
+        const workflowResponse = await streamLangGraphWorkflow(sessionId, estateData, (event) => {
+          if (event.event === "node_end" && WORKFLOW_NODE_STEPS[event.node]) {
+            setCurrentAgentStep(prev => Math.max(prev, WORKFLOW_NODE_STEPS[event.node]));
+          }
+        });
         
-        clearInterval(stepInterval);
         setCurrentAgentStep(5);
         setWorkflowResult(workflowResponse);
         
@@ -227,7 +222,7 @@ const FinancialProcedure = () => {
         
         toast({
           title: "✅ Multi-Agent Workflow Complete",
-          description: `All ${workflowResponse.timeline.length} agents completed successfully`,
+          description: `All ${workflowResponse.timeline.filter(t => t.status === "completed").length} agents completed successfully`,
         });
         
       } else {
@@ -286,8 +281,7 @@ const FinancialProcedure = () => {
         const taskStatuses = await getTaskStatuses(sessionId);
         console.log("Task statuses updated:", taskStatuses);
         
-        // Update localStorage with the latest session data including task statuses
-        const updatedSession = await fetchSurveySession(sessionId);
+        // Update localStorage with the latest task statuses
         localStorage.setItem(
           `session_${sessionId}_tasks`,
           JSON.stringify(taskStatuses.task_statuses)
@@ -1,6 +1,10 @@
 import { useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { executeLangGraphWorkflow, type LangGraphWorkflowResponse } from "@/lib/api";
+import {
+  streamLangGraphWorkflow,
+  WORKFLOW_NODE_STEPS,
+  type LangGraphWorkflowResponse,
+} from "@/lib/api";
 import { SESSION_STORAGE_KEY } from "@/lib/config";
 import { useToast } from "@/hooks/use-toast";
 
@@ -35,20 +39,17 @@ const LegalFinancialWorkflow = () => {
     setWorkflowResult(null);
 
     try {
-      // Simulate step-by-step progress
-      const stepInterval = setInterval(() => {
-        setCurrentStep(prev => {
-          if (prev < 4) return prev + 1;
-          return prev;
-        });
-      }, 2000);
-
-      const result = await executeLangGraphWorkflow(
+      // Advance the pipeline as the server reports each agent finishing
+      const result = await streamLangGraphWorkflow(
         parseInt(sessionId),
-        estateData
+        estateData,
+        (event) => {
+          if (event.event === "node_end" && WORKFLOW_NODE_STEPS[event.node]) {
+            setCurrentStep(prev => Math.max(prev, WORKFLOW_NODE_STEPS[event.node]));
+          }
+        }
       );
 
-      clearInterval(stepInterval);
       setCurrentStep(5);
       setWorkflowResult(result);
       
@@ -273,7 +274,11 @@ const LegalFinancialWorkflow = () => {
                         ))}
                       </ul>
                     </div>
-                    <div className="text-green-600 text-2xl">✓</div>
+                    {item.status === "skipped" ? (
+                      <div className="text-gray-400 text-2xl">⏭</div>
+                    ) : (
+                      <div className="text-green-600 text-2xl">✓</div>
+                    )}
                   </div>
                 ))}
               </div>
@@ -6,7 +6,7 @@ import {
   createSurveySession,
   fetchSurveySession,
   submitSurveyResults,
-  generateChecklist,
+  streamChecklist,
   getFinancialAssessment,
   type SurveyPayload,
 } from "@/lib/api";
@@ -493,13 +493,24 @@ const Survey = () => {
 
     setIsGeneratingChecklist(true);
     try {
-      const result = await generateChecklist(sessionId, {
-        location: answers.place_of_death ? `${answers.place_of_death}, UK` : "UK",
-        relationship: "Family member",
-        additional_context: "",
-      });
+      // Show each step as soon as it is generated
+      const checklist = await streamChecklist(
+        sessionId,
+        {
+          location: answers.place_of_death ? `${answers.place_of_death}, UK` : "UK",
+          relationship: "Family member",
+          additional_context: "",
+        },
+        (event) => {
+          if (event.event === "meta") {
+            setGeneratedChecklist((prev: any) => ({ ...prev, meta: event.meta, steps: prev?.steps ?? [] }));
+          } else if (event.event === "step") {
+            setGeneratedChecklist((prev: any) => ({ ...prev, steps: [...(prev?.steps ?? []), event.step] }));
+          }
+        },
+      );
       
-      setGeneratedChecklist(result.checklist);
+      setGeneratedChecklist(checklist);
       toast({
         title: "Checklist Generated!",
         description: "Your personalized action plan is ready.",